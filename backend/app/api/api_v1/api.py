@@ -1,7 +1,12 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import beaches, surf_data
+from app.api.api_v1.endpoints import beaches, surf_data, archive, export, subscriptions, search, admin
 
 api_router = APIRouter()
 
 api_router.include_router(beaches.router, prefix="/beaches", tags=["beaches"])
-api_router.include_router(surf_data.router, prefix="/surf-data", tags=["surf-data"]) 
\ No newline at end of file
+api_router.include_router(surf_data.router, prefix="/surf-data", tags=["surf-data"])
+api_router.include_router(archive.router, prefix="/archive", tags=["archive"])
+api_router.include_router(export.router, prefix="/export", tags=["export"])
+api_router.include_router(subscriptions.router, prefix="/subscribe", tags=["subscriptions"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
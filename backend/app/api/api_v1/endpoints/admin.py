@@ -0,0 +1,157 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.beach import Beach
+from app.schemas.admin import (
+    CacheDataType,
+    CacheEntry,
+    CacheEntryList,
+    CacheKeyStat,
+    CacheSelection,
+    CacheStats,
+    InvalidateResult,
+    RefreshResult,
+)
+from app.services.admin_service import AdminService
+from app.services.auth_service import AuthService
+from app.services.export_service import DATA_TYPES
+
+router = APIRouter()
+
+def _beach_ids(db: Session, beach_names: List[str], station_ids: List[str]) -> Optional[List[int]]:
+    beaches = AdminService.select_beaches(db, beach_names, station_ids)
+    return [beach.id for beach in beaches] if beaches is not None else None
+
+def _beach_names(db: Session, beach_ids: List[int]) -> Dict[int, str]:
+    if not beach_ids:
+        return {}
+    rows = db.query(Beach.id, Beach.beach_name).filter(Beach.id.in_(beach_ids)).all()
+    return {row.id: row.beach_name for row in rows}
+
+@router.get("/cache", response_model=CacheEntryList)
+async def list_cache_entries(
+    beach: List[str] = Query([]),
+    station: List[str] = Query([]),
+    data_type: List[CacheDataType] = Query([]),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_admin_api_key)
+):
+    """List cache entries with their size, age and expiry
+    
+    Filter with repeated `beach`, `station` and `data_type` parameters.
+    """
+    beach_ids = _beach_ids(db, beach, station)
+    entries, total = AdminService.list_entries(db, beach_ids, list(data_type) or None, limit=limit, offset=offset)
+    names = _beach_names(db, list({entry.beach_id for entry in entries}))
+    
+    now = datetime.now(timezone.utc)
+    return CacheEntryList(total=total, entries=[
+        CacheEntry(
+            beach_id=entry.beach_id,
+            beach_name=names.get(entry.beach_id),
+            data_type=entry.data_type,
+            size_bytes=entry.size_bytes,
+            stored_at=entry.stored_at,
+            age_seconds=(now - entry.stored_at).total_seconds() if entry.stored_at else None,
+            expires_at=entry.expires_at,
+            expired=entry.expires_at <= now,
+            content_hash=entry.content_hash
+        )
+        for entry in entries
+    ])
+
+@router.post("/cache/invalidate", response_model=InvalidateResult)
+async def invalidate_cache(
+    selection: CacheSelection,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_admin_api_key)
+):
+    """Delete cache entries by beach, station and/or data type
+    
+    Invalidating a station's tides also drops its stored tide predictions,
+    so they are refetched on next use.
+    """
+    if not selection.beach_names and not selection.station_ids and not selection.data_types:
+        raise HTTPException(status_code=400, detail="Give beach_names, station_ids or data_types")
+    
+    beach_ids = _beach_ids(db, selection.beach_names, selection.station_ids)
+    deleted, tide_days = AdminService.invalidate(
+        db,
+        beach_ids=beach_ids,
+        data_types=list(selection.data_types) or None,
+        station_ids=selection.station_ids
+    )
+    return InvalidateResult(deleted=deleted, tide_days_deleted=tide_days)
+
+@router.post("/cache/refresh", response_model=RefreshResult, status_code=202)
+async def refresh_cache(
+    selection: CacheSelection,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_admin_api_key)
+):
+    """Refetch upstream data for some beaches in the background
+    
+    Current entries keep being served until they are replaced. Parsed
+    forecasts aren't fetched; they are rebuilt from fresh wind and wave data.
+    """
+    if not selection.beach_names and not selection.station_ids:
+        raise HTTPException(status_code=400, detail="Give beach_names or station_ids to refresh")
+    
+    beach_ids = _beach_ids(db, selection.beach_names, selection.station_ids)
+    if not beach_ids:
+        raise HTTPException(status_code=404, detail="No matching beaches")
+    if len(beach_ids) > settings.ADMIN_REFRESH_MAX_BEACHES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ADMIN_REFRESH_MAX_BEACHES} beaches can be refreshed at once"
+        )
+    
+    data_types = [data_type for data_type in DATA_TYPES if not selection.data_types or data_type in selection.data_types]
+    if data_types:
+        background_tasks.add_task(
+            AdminService.refresh,
+            db.get_bind(),
+            beach_ids,
+            data_types,
+            concurrency=settings.ADMIN_REFRESH_CONCURRENCY
+        )
+    return RefreshResult(beaches=len(beach_ids), data_types=data_types)
+
+@router.get("/cache/stats", response_model=CacheStats)
+async def get_cache_stats(
+    beach: List[str] = Query([]),
+    station: List[str] = Query([]),
+    data_type: List[CacheDataType] = Query([]),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_admin_api_key)
+):
+    """Cache hit, stale and miss counts per data type and per entry
+    
+    Counts are kept by each worker since it started, so with several
+    workers each reports its own share.
+    """
+    beach_ids = _beach_ids(db, beach, station)
+    keys = AdminService.hit_stats(beach_ids, list(data_type) or None, limit=limit)
+    names = _beach_names(db, list({beach_id for beach_id, _, _ in keys}))
+    return CacheStats(
+        totals=AdminService.lookup_totals(),
+        keys=[
+            CacheKeyStat(
+                beach_id=beach_id,
+                beach_name=names.get(beach_id),
+                data_type=key_type,
+                hits=counts["hit"],
+                stale=counts["stale"],
+                misses=counts["miss"],
+                hit_ratio=round(counts["hit"] / max(1, sum(counts.values())), 4)
+            )
+            for beach_id, key_type, counts in keys
+        ]
+    )
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Literal
+from datetime import datetime
+from app.core.config import settings
+from app.core.timing import span
+from app.db.database import get_db
+from app.schemas.archive import ArchiveSeries
+from app.services.archive_service import get_archive
+from app.services.cache_service import CacheService
+from app.services.auth_service import AuthService
+
+router = APIRouter()
+
+@router.get("/{beach_name}/{data_type}", response_model=ArchiveSeries)
+async def get_archived_series(
+    beach_name: str,
+    data_type: Literal["wind_data", "wave_data", "tide_data", "temp_data"],
+    start: datetime,
+    end: datetime,
+    all_runs: bool = Query(False, description="Return every archived forecast instead of only the latest per time"),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Get archived wind, wave, tide or temperature history for a beach
+    
+    `start` and `end` are beach-local wall-clock times; only the day
+    partitions inside the range are read.
+    """
+    archive = get_archive()
+    if archive is None:
+        raise HTTPException(status_code=404, detail="Archive is disabled")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if (end - start).days > settings.ARCHIVE_MAX_QUERY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {settings.ARCHIVE_MAX_QUERY_DAYS} days")
+    
+    beach = CacheService.get_beach_by_name(db, beach_name)
+    if not beach:
+        raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
+    
+    with span("archive_read"):
+        series = archive.query(beach.id, data_type, start, end, latest_only=not all_runs)
+    return ArchiveSeries(beach_name=beach_name, data_type=data_type, start=start, end=end, series=series)
@@ -1,21 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional, Union
+from app.core.config import settings
 from app.db.database import get_db
-from app.schemas.beach import Beach, BeachList
+from app.schemas.beach import Beach, BeachList, BeachSummary, BeachSummaryList, CatalogDelta
 from app.services.cache_service import CacheService
+from app.services.catalog_service import CatalogService
 from app.services.auth_service import AuthService
+import base64
+import binascii
 
 router = APIRouter()
 
-@router.get("/", response_model=BeachList)
+def _encode_cursor(beach_name: str) -> str:
+    return base64.urlsafe_b64encode(beach_name.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=Union[BeachList, BeachSummaryList])
 async def get_beaches(
+    state: Optional[str] = None,
+    town: Optional[str] = None,
+    limit: int = Query(settings.BEACHES_PAGE_SIZE, ge=1, le=settings.BEACHES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Get a page of beaches ordered by name, optionally filtered by state and town
+    
+    Pass the returned `next_cursor` as `cursor` to get the next page.
+    `view=summary` returns only name, town and coordinates.
+    """
+    beaches, last_name = CacheService.list_beaches(
+        db,
+        state=state,
+        town=town,
+        after=_decode_cursor(cursor) if cursor else None,
+        limit=limit,
+        summary=view == "summary"
+    )
+    next_cursor = _encode_cursor(last_name) if last_name else None
+    
+    if view == "summary":
+        return BeachSummaryList(
+            beaches=[BeachSummary.model_validate(beach) for beach in beaches],
+            next_cursor=next_cursor
+        )
+    return BeachList(beaches=beaches, next_cursor=next_cursor)
+
+@router.get("/changes", response_model=CatalogDelta)
+async def get_catalog_changes(
+    request: Request,
+    response: Response,
+    since: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     api_key: str = Depends(AuthService.get_current_api_key)
 ):
-    """Get all beaches"""
-    beaches = CacheService.get_all_beaches(db)
-    return BeachList(beaches=beaches)
+    """Get beaches added, changed or removed since catalog version `since`
+    
+    Store the returned `version` and pass it as `since` on the next sync;
+    `since=0` returns the whole catalog. Sends a weak ETag for the current
+    version and answers 304 when the client already has it.
+    """
+    version = CatalogService.get_catalog_version(db)
+    etag = f'W/"catalog-{version}"'
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    version, upserts, deletes = CatalogService.get_changes_since(db, since)
+    response.headers["ETag"] = f'W/"catalog-{version}"'
+    return CatalogDelta(version=version, since=since, upserts=upserts, deletes=deletes)
 
 @router.get("/{beach_name}", response_model=Beach)
 async def get_beach(
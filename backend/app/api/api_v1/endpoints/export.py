@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional
+from app.core.config import settings
+from app.db.database import get_db
+from app.services.auth_service import AuthService
+from app.services.export_service import ExportService
+from app.services.subscription_service import get_broker
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+@router.get("/surf-data", response_class=StreamingResponse)
+async def export_surf_data(
+    request: Request,
+    state: Optional[str] = None,
+    town: Optional[str] = None,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Stream surf data for every beach as NDJSON, one line per beach
+
+    Each line has the same shape as `GET /surf-data/{beach_name}`. Lines are
+    sent as soon as a beach is ready, so the order is not alphabetical. The
+    key's in-flight slot is held until the last line has been sent.
+    """
+    # The request session is closed before the body streams, so use our own
+    bind = db.get_bind()
+    broker = get_broker()
+
+    def generate() -> Iterator[bytes]:
+        with Session(bind=bind) as export_db:
+            for response in ExportService.iter_conditions(
+                export_db,
+                state=state,
+                town=town,
+                batch_size=settings.EXPORT_BATCH_SIZE,
+                concurrency=settings.EXPORT_FETCH_CONCURRENCY
+            ):
+                # An export refreshes the cache too, so subscribers hear about it
+                broker.publish(response)
+                yield response.model_dump_json().encode() + b"\n"
+
+    # Starlette runs the background task after the body, disconnects included
+    slot = AuthService.detach_request_slot(request)
+    return StreamingResponse(
+        generate(),
+        media_type=NDJSON_MEDIA_TYPE,
+        background=BackgroundTask(slot.release) if slot else None
+    )
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.db.database import get_db
+from app.schemas.search import SurfWindowList
+from app.services.auth_service import AuthService
+from app.services.forecast_service import FORECAST_TIMEZONE
+from app.services.search_service import SearchService
+
+router = APIRouter()
+
+@router.get("/windows", response_model=SurfWindowList)
+async def search_surf_windows(
+    days: int = Query(5, ge=1, le=settings.SEARCH_MAX_DAYS),
+    limit: int = Query(10, ge=1, le=settings.SEARCH_MAX_RESULTS),
+    min_grade: Literal["yellow", "green"] = "yellow",
+    state: Optional[str] = None,
+    town: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    long: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Find the best times and places to surf over the next `days` days
+    
+    Grades every cached forecast hour of every matching beach and returns
+    the best runs of `min_grade`-or-better hours. Pass `lat`, `long` and
+    `radius_km` to search near a point. Beaches without cached forecasts
+    are skipped.
+    """
+    if (lat is None) != (long is None) or (radius_km is not None and lat is None):
+        raise HTTPException(status_code=400, detail="lat and long must be given together, and radius_km needs both")
+    
+    start = datetime.now(FORECAST_TIMEZONE).replace(tzinfo=None, second=0, microsecond=0)
+    end = start + timedelta(days=days)
+    windows = SearchService.find_windows(
+        db,
+        start,
+        end,
+        limit=limit,
+        min_grade=min_grade,
+        state=state,
+        town=town,
+        near=(lat, long) if lat is not None else None,
+        radius_km=radius_km,
+        batch_size=settings.SEARCH_BATCH_SIZE
+    )
+    return SurfWindowList(start=start, end=end, windows=windows)
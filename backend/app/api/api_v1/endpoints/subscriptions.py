@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, List
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.beach import Beach
+from app.services.auth_service import AuthService
+from app.services.subscription_service import format_event, get_broker
+import asyncio
+
+router = APIRouter()
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+@router.get("/surf-data", response_class=StreamingResponse)
+async def subscribe_surf_data(
+    request: Request,
+    beach: List[str] = Query(..., description="Beach name; repeat to subscribe to several"),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Server-Sent Events stream of surf data changes for the given beaches
+
+    Sends each beach's current cached data on connect, then a `surf_data`
+    event only when that beach's data or grade changes. A comment line is
+    sent periodically to keep idle connections open.
+    """
+    beach_names = list(dict.fromkeys(beach))
+    if len(beach_names) > settings.SUBSCRIPTION_MAX_BEACHES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SUBSCRIPTION_MAX_BEACHES} beaches per subscription")
+
+    known = {name for (name,) in db.query(Beach.beach_name).filter(Beach.beach_name.in_(beach_names))}
+    missing = [name for name in beach_names if name not in known]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Beach '{missing[0]}' not found")
+
+    broker = get_broker()
+    # The request session is closed before the body streams
+    bind = db.get_bind()
+
+    async def events() -> AsyncIterator[bytes]:
+        snapshots = await run_in_threadpool(broker.load_snapshots, bind, beach_names)
+        queue = broker.subscribe(beach_names, bind=bind, snapshots=snapshots)
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(request))
+        try:
+            for snapshot in snapshots:
+                yield format_event("surf_data", snapshot.model_dump_json())
+            while True:
+                next_message = asyncio.ensure_future(queue.get())
+                await asyncio.wait(
+                    {next_message, disconnected},
+                    timeout=settings.SUBSCRIPTION_KEEPALIVE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_message.done():
+                    yield next_message.result()
+                    continue
+                next_message.cancel()
+                if disconnected.done():
+                    return
+                yield b": keepalive\n\n"
+        finally:
+            disconnected.cancel()
+            broker.unsubscribe(queue, beach_names)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,62 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from app.core.config import settings
 from app.db.database import get_db
-from app.schemas.weather import SurfDataResponse, WindData, WaveData, TideData, TemperatureData
+from app.models.beach import Beach
+from app.schemas.weather import SurfDataResponse, WindData, WaveData, TideData, TemperatureData, ForecastData, CurrentConditions, TideCurveData
 from app.services.cache_service import CacheService
 from app.services.weather_service import WeatherService
 from app.services.auth_service import AuthService
 from app.services.grading_service import GradingService
+from app.services.forecast_service import Forecast, ForecastService
+from app.services.tide_service import TideCurve, TideService
+from app.services.subscription_service import get_broker
+from app.services.admission_service import UpstreamOverloaded
+from app.services.export_service import DATA_TYPES
+from app.core.timing import span
+import asyncio
 
 router = APIRouter()
 
+# Source refreshes by (beach_id, data_type); ones that outlast their request's
+# budget keep running here, and later requests wait on them instead of refetching
+_refreshes: Dict[Tuple[int, str], asyncio.Task] = {}
+
 @router.get("/{beach_name}", response_model=SurfDataResponse)
 async def get_surf_data(
     beach_name: str,
     db: Session = Depends(get_db),
     api_key: str = Depends(AuthService.get_current_api_key)
 ):
-    """Get all surf data for a beach (wind, waves, tides, temperature)"""
+    """Get all surf data for a beach (wind, waves, tides, temperature)
+    
+    Sources that aren't cached are fetched concurrently. Any still loading
+    after SURF_DATA_BUDGET_MS are listed in `pending` and keep refreshing in
+    the background, so a later request finds them cached.
+    """
     beach = CacheService.get_beach_by_name(db, beach_name)
     if not beach:
         raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
     
     response = SurfDataResponse(beach_name=beach_name)
     
-    # Get wind data
-    wind_data = await get_wind_data_internal(beach, db)
-    if wind_data:
-        response.wind = wind_data
-    
-    # Get wave data
-    wave_data = await get_wave_data_internal(beach, db)
-    if wave_data:
-        response.waves = wave_data
+    # Cached sources first, then one refresh per miss
+    refreshes = {}
+    for data_type, (field, schema, _) in DATA_TYPES.items():
+        cached_data = CacheService.get_cached_data(db, beach.id, data_type)
+        if cached_data:
+            setattr(response, field, schema(beach_name=beach.beach_name, data=cached_data['data'], cached=True))
+        else:
+            refreshes[field] = refresh_source(db.get_bind(), beach.id, data_type)
     
-    # Get tide data
-    tide_data = await get_tide_data_internal(beach, db)
-    if tide_data:
-        response.tides = tide_data
-    
-    # Get temperature data
-    temp_data = await get_temperature_data_internal(beach, db)
-    if temp_data:
-        response.temperature = temp_data
+    failed = []
+    if refreshes:
+        with span("sources"):
+            done, _ = await asyncio.wait(refreshes.values(), timeout=settings.SURF_DATA_BUDGET_MS / 1000 or None)
+        for field, task in refreshes.items():
+            if task not in done:
+                response.pending.append(field)
+            elif task.exception() is not None:
+                # One source failing (e.g. shed with nothing cached) leaves just that field empty
+                print(f"Error fetching {field} for {beach_name}: {task.exception()}")
+                failed.append(field)
+            else:
+                setattr(response, field, task.result())
+    wind_data, wave_data = response.wind, response.waves
     
     # Calculate grade if we have both wind and wave data
     try:
         if wind_data and wave_data and wind_data.data and wave_data.data:
-            grade = GradingService.calculate_grade_from_data(
-                wind_data=wind_data.data,
-                wave_data=wave_data.data,
-                beach_orientation=beach.beach_angle
-            )
-            response.grade = grade
+            # Fresh payloads were stored first, so a cached forecast still matches them
+            forecast = ForecastService.get_forecast(db, beach.id, wind_data.data, wave_data.data)
+            if forecast is not None:
+                response.grade = GradingService.calculate_grade_from_forecast(forecast, beach.beach_angle)
     except Exception as e:
         print(f"Error calculating grade: {e}")
         response.grade = None
     
-    return response
+    # Push to subscribers if anything changed since the last publish; a
+    # partial response would look like pending or failed sources had gone missing
+    if not response.pending and not failed:
+        get_broker().publish(response)
+    
+    # Serialize here rather than in FastAPI so it shows up as its own phase
+    with span("serialize"):
+        body = response.model_dump_json()
+    return Response(content=body, media_type="application/json")
 
 @router.get("/{beach_name}/wind", response_model=WindData)
 async def get_wind_data(
@@ -92,23 +122,141 @@ async def get_wave_data(
     
     return wave_data
 
+@router.get("/{beach_name}/forecast", response_model=ForecastData)
+async def get_forecast(
+    beach_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Get wind and wave forecast for a beach on one time axis
+    
+    `data` is columnar: `time` plus one list per variable. `start` and `end`
+    are beach-local wall-clock times and limit the points returned.
+    """
+    beach = CacheService.get_beach_by_name(db, beach_name)
+    if not beach:
+        raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
+    
+    forecast, cached = await get_forecast_internal(beach, db)
+    if forecast is None:
+        raise HTTPException(status_code=500, detail="Failed to retrieve forecast data")
+    
+    return ForecastData(
+        beach_name=beach.beach_name,
+        data=forecast.slice(start, end).to_series(),
+        cached=cached
+    )
+
+@router.get("/{beach_name}/now", response_model=CurrentConditions)
+async def get_current_conditions(
+    beach_name: str,
+    at: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Get wind, waves and grade for the forecast hour covering now (or `at`)
+    
+    Naive `at` values are beach-local wall-clock times.
+    """
+    beach = CacheService.get_beach_by_name(db, beach_name)
+    if not beach:
+        raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
+    
+    forecast, cached = await get_forecast_internal(beach, db)
+    if forecast is None:
+        raise HTTPException(status_code=500, detail="Failed to retrieve forecast data")
+    
+    index = forecast.index_at(at)
+    return CurrentConditions(
+        beach_name=beach.beach_name,
+        time=forecast.time_at(index),
+        wind_speed=forecast.value("wind_speed_10m", index),
+        wind_direction=forecast.value("wind_direction_10m", index),
+        wave_height=forecast.value("wave_height", index),
+        wave_direction=forecast.value("wave_direction", index),
+        wave_period=forecast.value("wave_period", index),
+        grade=GradingService.calculate_grade_from_forecast(forecast, beach.beach_angle, index),
+        cached=cached
+    )
+
 @router.get("/{beach_name}/tides", response_model=TideData)
 async def get_tide_data(
     beach_name: str,
+    day: Optional[date] = Query(None, alias="date", description="Station-local day; defaults to today"),
     db: Session = Depends(get_db),
     api_key: str = Depends(AuthService.get_current_api_key)
 ):
-    """Get tide data for a beach"""
+    """Get tide data for a beach, for today or any other day"""
     beach = CacheService.get_beach_by_name(db, beach_name)
     if not beach:
         raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
     
-    tide_data = await get_tide_data_internal(beach, db)
+    if day is not None and day != TideService.today():
+        predictions, stored = await run_in_threadpool(TideService.get_tides, db, beach.station_id, day)
+        tide_data = TideData(beach_name=beach.beach_name, data=predictions, cached=stored) if predictions is not None else None
+    else:
+        tide_data = await get_tide_data_internal(beach, db)
     if not tide_data:
         raise HTTPException(status_code=500, detail="Failed to retrieve tide data")
     
     return tide_data
 
+@router.get("/{beach_name}/tides/curve", response_model=TideCurveData)
+async def get_tide_curve(
+    beach_name: str,
+    at: Optional[List[datetime]] = Query(None, description="Times to get heights for; repeat for several"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution_minutes: int = Query(30, ge=1, le=1440),
+    db: Session = Depends(get_db),
+    api_key: str = Depends(AuthService.get_current_api_key)
+):
+    """Get tide heights interpolated from the cached high/low predictions
+    
+    Pass `at` for specific times, or get evenly spaced points every
+    `resolution_minutes` from `start` to `end` (defaults to today's curve).
+    Times are the tide station's local standard time.
+    """
+    beach = CacheService.get_beach_by_name(db, beach_name)
+    if not beach:
+        raise HTTPException(status_code=404, detail=f"Beach '{beach_name}' not found")
+    
+    if at:
+        moments = at
+    else:
+        today = datetime.combine(TideService.today(), datetime.min.time())
+        start = start or today
+        end = end or max(start, today) + timedelta(days=1)
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+        if (end - start) // timedelta(minutes=resolution_minutes) >= settings.TIDE_CURVE_MAX_POINTS:
+            raise HTTPException(status_code=400, detail=f"At most {settings.TIDE_CURVE_MAX_POINTS} points per request")
+        moments = TideCurve.sample(start, end, timedelta(minutes=resolution_minutes))
+    if len(moments) > settings.TIDE_CURVE_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.TIDE_CURVE_MAX_POINTS} points per request")
+    
+    # Load the days requested plus one either side, for the turning points around them
+    first_day, last_day = min(moments).date(), max(moments).date()
+    if (last_day - first_day).days >= settings.TIDE_PREFETCH_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must be under {settings.TIDE_PREFETCH_DAYS} days")
+    days, stored = await run_in_threadpool(
+        TideService.get_days, db, beach.station_id, first_day - timedelta(days=1), last_day + timedelta(days=1)
+    )
+    curve = TideCurve.from_predictions([tide for predictions in (days or {}).values() for tide in predictions])
+    if curve is None:
+        raise HTTPException(status_code=500, detail="Failed to retrieve tide data")
+    
+    return TideCurveData(
+        beach_name=beach.beach_name,
+        data={
+            "time": [moment.strftime("%Y-%m-%dT%H:%M") for moment in moments],
+            "height": curve.heights_at(moments)
+        },
+        cached=stored
+    )
+
 @router.get("/{beach_name}/temperature", response_model=TemperatureData)
 async def get_temperature_data(
     beach_name: str,
@@ -127,6 +275,57 @@ async def get_temperature_data(
     return temp_data
 
 # Internal helper functions
+def refresh_source(bind, beach_id: int, data_type: str) -> asyncio.Task:
+    """Start getting one source for a beach, or join a refresh already running
+    
+    The refresh has its own session, so it can outlive the request that
+    started it.
+    """
+    key = (beach_id, data_type)
+    task = _refreshes.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_refresh_source(bind, beach_id, data_type))
+        _refreshes[key] = task
+        task.add_done_callback(lambda finished: _refresh_done(key, finished))
+    return task
+
+async def _refresh_source(bind, beach_id: int, data_type: str):
+    internal = {
+        "wind_data": get_wind_data_internal,
+        "wave_data": get_wave_data_internal,
+        "tide_data": get_tide_data_internal,
+        "temp_data": get_temperature_data_internal,
+    }[data_type]
+    with Session(bind=bind) as db:
+        beach = db.get(Beach, beach_id)
+        return await internal(beach, db)
+
+def _refresh_done(key: Tuple[int, str], task: asyncio.Task) -> None:
+    if _refreshes.get(key) is task:
+        del _refreshes[key]
+    # Retrieve the error even if no request waited for the result
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error refreshing {key[1]} for beach {key[0]}: {task.exception()}")
+
+async def fetch_upstream(beach, db: Session, data_type: str, fetch: Callable[..., Any], *args) -> Tuple[Any, bool]:
+    """Run a blocking upstream fetch off the event loop, under upstream admission control
+    
+    Returns:
+        tuple: (fetched data, False), or (expired cached data, True) if the
+            fetch was shed
+    
+    Raises:
+        UpstreamOverloaded: The fetch was shed and nothing is cached (503)
+    """
+    try:
+        return await run_in_threadpool(fetch, *args), False
+    except UpstreamOverloaded:
+        stale = CacheService.get_stale_data(db, beach.id, data_type)
+        if stale is None:
+            raise
+        print(f"Serving stale {data_type} for {beach.beach_name}: upstream overloaded")
+        return stale['data'], True
+
 async def get_wind_data_internal(beach, db: Session) -> WindData:
     """Get wind data with caching"""
     # Check cache first
@@ -139,7 +338,9 @@ async def get_wind_data_internal(beach, db: Session) -> WindData:
         )
     
     # Fetch fresh data
-    wind_data = WeatherService.get_wind_data(beach.lat, beach.long)
+    wind_data, stale = await fetch_upstream(beach, db, "wind_data", WeatherService.get_wind_data, beach.lat, beach.long)
+    if stale:
+        return WindData(beach_name=beach.beach_name, data=wind_data, cached=True, stale=True)
     if 'error' in wind_data:
         return None
     
@@ -164,7 +365,9 @@ async def get_wave_data_internal(beach, db: Session) -> WaveData:
         )
     
     # Fetch fresh data
-    wave_data = WeatherService.get_wave_data(beach.lat, beach.long)
+    wave_data, stale = await fetch_upstream(beach, db, "wave_data", WeatherService.get_wave_data, beach.lat, beach.long)
+    if stale:
+        return WaveData(beach_name=beach.beach_name, data=wave_data, cached=True, stale=True)
     if 'error' in wave_data:
         return None
     
@@ -177,6 +380,16 @@ async def get_wave_data_internal(beach, db: Session) -> WaveData:
         cached=False
     )
 
+async def get_forecast_internal(beach, db: Session) -> Tuple[Optional[Forecast], bool]:
+    """Get the parsed forecast and whether its wind and wave data were cached"""
+    wind_data = await get_wind_data_internal(beach, db)
+    wave_data = await get_wave_data_internal(beach, db)
+    if not wind_data or not wave_data:
+        return None, False
+    
+    forecast = ForecastService.get_forecast(db, beach.id, wind_data.data, wave_data.data)
+    return forecast, wind_data.cached and wave_data.cached
+
 async def get_tide_data_internal(beach, db: Session) -> TideData:
     """Get tide data with caching"""
     # Check cache first
@@ -188,18 +401,29 @@ async def get_tide_data_internal(beach, db: Session) -> TideData:
             cached=True
         )
     
-    # Fetch fresh data
-    tide_data = WeatherService.get_tide_data(beach.station_id)
-    if 'error' in tide_data:
-        return None
+    # Today's tides from the per-station store, fetching weeks ahead if missing.
+    # Only the upstream call leaves the event loop: sources refresh concurrently,
+    # and their sessions must not be used from other threads meanwhile.
+    today = TideService.today()
+    tide_data = TideService.get_stored(db, [beach.station_id], today).get(beach.station_id)
+    stored = tide_data is not None
+    if not stored:
+        predictions, stale = await fetch_upstream(
+            beach, db, "tide_data", WeatherService.get_tide_data, beach.station_id, today, settings.TIDE_PREFETCH_DAYS
+        )
+        if stale:
+            return TideData(beach_name=beach.beach_name, data=predictions, cached=True, stale=True)
+        if not isinstance(predictions, list):
+            return None
+        tide_data = TideService.store_predictions(db, beach.station_id, predictions, today, settings.TIDE_PREFETCH_DAYS)[today]
     
-    # Cache the data
-    CacheService.store_cached_data(db, beach.id, "tide_data", tide_data)
+    # Cache the data until the station's day ends
+    CacheService.store_cached_data(db, beach.id, "tide_data", tide_data, expires_at=TideService.end_of_today())
     
     return TideData(
         beach_name=beach.beach_name,
         data=tide_data,
-        cached=False
+        cached=stored
     )
 
 async def get_temperature_data_internal(beach, db: Session) -> TemperatureData:
@@ -214,7 +438,9 @@ async def get_temperature_data_internal(beach, db: Session) -> TemperatureData:
         )
     
     # Fetch fresh data
-    temp_data = WeatherService.get_temperature_data(beach.station_id)
+    temp_data, stale = await fetch_upstream(beach, db, "temp_data", WeatherService.get_temperature_data, beach.station_id)
+    if stale:
+        return TemperatureData(beach_name=beach.beach_name, data=temp_data, cached=True, stale=True)
     if 'error' in temp_data:
         return None
     
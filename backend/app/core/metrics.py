@@ -0,0 +1,269 @@
+"""
+Minimal in-process metrics registry with Prometheus text exposition
+
+Each uvicorn worker keeps its own registry; scrape every worker (or run a
+single worker behind the scraper) to get the full picture.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import bisect
+import threading
+
+# Latency buckets in seconds, from sub-millisecond DB queries to slow upstreams
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base class for labelled metrics"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._values.items())
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class MetricsRegistry:
+    """Holds every metric and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' already registered with a different definition")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clear every recorded value (metric definitions are kept)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Shared application metrics
+REQUEST_LATENCY = registry.histogram(
+    "swellseeker_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+CACHE_LOOKUPS = registry.counter(
+    "swellseeker_cache_lookups_total",
+    "Cache lookups by data type and result (hit, miss, stale)",
+    ["data_type", "result"]
+)
+CACHE_WRITES = registry.counter(
+    "swellseeker_cache_writes_total",
+    "Cache stores by data type and result (stored, unchanged: expiry extended only)",
+    ["data_type", "result"]
+)
+CACHE_WRITE_BEHIND_PENDING = registry.gauge(
+    "swellseeker_cache_write_behind_pending",
+    "Cache writes queued and not yet flushed (write-behind)"
+)
+CACHE_WRITE_BEHIND_FLUSHES = registry.counter(
+    "swellseeker_cache_write_behind_flushes_total",
+    "Batched flushes of queued cache writes by trigger (size, time, explicit) and result",
+    ["trigger", "result"]
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "swellseeker_upstream_requests_total",
+    "Upstream API calls by provider and outcome",
+    ["provider", "outcome"]
+)
+UPSTREAM_LATENCY = registry.histogram(
+    "swellseeker_upstream_request_duration_seconds",
+    "Upstream API call latency by provider",
+    ["provider"]
+)
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    "swellseeker_upstream_in_flight",
+    "Upstream API calls currently holding an admission slot"
+)
+UPSTREAM_QUEUE_DEPTH = registry.gauge(
+    "swellseeker_upstream_queue_depth",
+    "Upstream API calls waiting for an admission slot"
+)
+UPSTREAM_ADMISSION_REJECTIONS = registry.counter(
+    "swellseeker_upstream_admission_rejections_total",
+    "Upstream API calls refused by admission control (queue_full, timeout)",
+    ["reason"]
+)
+DB_QUERY_LATENCY = registry.histogram(
+    "swellseeker_db_query_duration_seconds",
+    "Database statement execution time by statement kind",
+    ["operation"]
+)
+DB_REPLICA_READS = registry.counter(
+    "swellseeker_db_replica_reads_total",
+    "Replica-eligible database reads by where they were sent (replica, primary)",
+    ["target"]
+)
+GRADING_LATENCY = registry.histogram(
+    "swellseeker_grading_duration_seconds",
+    "Time spent calculating surf grades"
+)
+STARTUP_DURATION = registry.gauge(
+    "swellseeker_startup_duration_seconds",
+    "Worker startup time by phase (import, init_db, total)",
+    ["phase"]
+)
@@ -0,0 +1,63 @@
+"""
+Per-request phase timing
+
+A RequestTimer is attached to the current request context by the timing
+middleware; services wrap their work in ``span("name")`` and the collected
+durations are reported in the Server-Timing header and the slow-request log.
+Outside a request (scripts, tests) spans are no-ops.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, Optional
+import threading
+import time
+
+class RequestTimer:
+    """Accumulates named phase durations for one request"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}  # phase name -> total milliseconds
+        self.counts: Dict[str, int] = {}  # phase name -> number of spans
+        self._lock = threading.Lock()  # Spans may finish on threadpool workers
+
+    def add(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration_ms
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def server_timing_header(self, total_ms: Optional[float] = None) -> str:
+        """Render the phases as a Server-Timing header value"""
+        with self._lock:
+            entries = [f"{name};dur={duration:.1f}" for name, duration in self.phases.items()]
+        entries.append(f"total;dur={self.total_ms() if total_ms is None else total_ms:.1f}")
+        return ", ".join(entries)
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+
+def start_request_timer() -> Token:
+    """Attach a fresh timer to the current context; pass the token to end_request_timer()"""
+    return _current_timer.set(RequestTimer())
+
+def end_request_timer(token: Token) -> None:
+    _current_timer.reset(token)
+
+def get_request_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block of work as a phase of the current request"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - start_time) * 1000)
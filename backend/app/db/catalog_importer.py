@@ -0,0 +1,248 @@
+"""
+Streaming bulk importer for the beach catalog
+
+Reads JSON (an array of records, either DynamoDB-style PutRequest items or
+plain objects), JSON Lines or CSV without loading the whole file, validates
+records in batches and upserts them in chunks keyed on beach_name.
+
+    python -m app.db.catalog_importer beaches.json
+    python -m app.db.catalog_importer spots.csv --chunk-size 5000
+"""
+from sqlalchemy import insert, update, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from pydantic import TypeAdapter, ValidationError
+from app.db.database import SessionLocal
+from app.models.beach import Beach
+from app.schemas.beach import BeachCreate
+from app.services.catalog_service import CatalogService
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import argparse
+import csv
+import json
+import time
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+# Columns compared to decide between 'updated' and 'unchanged'
+BEACH_FIELDS = ("town", "state", "lat", "long", "beach_angle", "station_id")
+
+_beach_list_adapter = TypeAdapter(List[BeachCreate])
+
+@dataclass
+class ImportReport:
+    """Counts from one catalog import"""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    errors: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged + self.invalid
+
+    def summary(self) -> str:
+        rate = self.total / self.elapsed_seconds if self.elapsed_seconds else 0
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged, "
+            f"{self.invalid} invalid in {self.elapsed_seconds:.2f}s ({rate:.0f} records/s)"
+        )
+
+def iter_json_array(f, read_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip_whitespace() -> None:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if position >= len(buffer) or buffer[position] != "[":
+        raise ValueError("Expected a JSON array of catalog records")
+    position += 1
+
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of file inside JSON array")
+        if buffer[position] == "]":
+            return
+        if buffer[position] == ",":
+            position += 1
+            skip_whitespace()
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Element straddles the chunk boundary; read more and retry
+                if eof or not fill():
+                    raise
+                continue
+            # A number can be cut off at the boundary and still parse
+            if end == len(buffer) and not eof and fill():
+                continue
+            position = end
+            yield value
+            break
+
+def iter_records(path: str, file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream raw catalog records from a JSON, JSON Lines or CSV file"""
+    file_format = file_format or _detect_format(path)
+
+    with open(path, "r", newline="" if file_format == "csv" else None) as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        elif file_format == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == "json":
+            yield from iter_json_array(f)
+        else:
+            raise ValueError(f"Unsupported catalog format '{file_format}'")
+
+def _detect_format(path: str) -> str:
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "json"
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a DynamoDB PutRequest item into a plain dict (plain records pass through)"""
+    if "PutRequest" in record:
+        item = record["PutRequest"]["Item"]
+        return {key: next(iter(value.values())) if isinstance(value, dict) else value for key, value in item.items()}
+    return record
+
+def validate_batch(records: List[Dict[str, Any]], report: ImportReport) -> List[BeachCreate]:
+    """Validate a batch at once, falling back to per-record checks to isolate bad rows"""
+    try:
+        return _beach_list_adapter.validate_python(records)
+    except ValidationError:
+        pass
+
+    valid = []
+    for record in records:
+        try:
+            valid.append(BeachCreate.model_validate(record))
+        except ValidationError as e:
+            report.invalid += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                name = record.get("beach_name", "<unnamed>")
+                report.errors.append(f"{name}: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+    return valid
+
+def upsert_chunk(db: Session, beaches: List[BeachCreate], report: ImportReport) -> None:
+    """Insert new beaches and update changed ones with one lookup query per chunk"""
+    # Last occurrence wins when a file repeats a beach
+    incoming = {beach.beach_name: beach.model_dump() for beach in beaches}
+
+    existing = {
+        row.beach_name: row
+        for row in db.execute(
+            select(Beach.id, Beach.beach_name, *[getattr(Beach, name) for name in BEACH_FIELDS])
+            .where(Beach.beach_name.in_(list(incoming)))
+        )
+    }
+
+    inserts = []
+    updates = []
+    changed_names = []
+    for name, values in incoming.items():
+        row = existing.get(name)
+        if row is None:
+            inserts.append(values)
+        elif any(getattr(row, column) != values[column] for column in BEACH_FIELDS):
+            updates.append({"id": row.id, **{column: values[column] for column in BEACH_FIELDS}})
+        else:
+            report.unchanged += 1
+            continue
+        changed_names.append(name)
+
+    if inserts:
+        db.execute(insert(Beach), inserts)
+    if updates:
+        db.execute(update(Beach), updates)
+    # Bulk statements skip ORM events, so log catalog changes explicitly
+    CatalogService.record_changes(db, changed_names, "upsert")
+    db.commit()
+
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def import_catalog(
+    path: str,
+    file_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    bind: Optional[Engine] = None
+) -> ImportReport:
+    """Stream, validate and upsert a beach catalog file
+
+    Each chunk is committed on its own, so memory stays flat regardless of
+    file size and a bad record only affects the count, not the import.
+    """
+    report = ImportReport()
+    start_time = time.perf_counter()
+    db = Session(bind=bind) if bind is not None else SessionLocal()
+    try:
+        records = (flatten_record(record) for record in iter_records(path, file_format))
+        for chunk in _chunks(records, chunk_size):
+            beaches = validate_batch(chunk, report)
+            if beaches:
+                upsert_chunk(db, beaches, report)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        report.elapsed_seconds = time.perf_counter() - start_time
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a beach catalog (JSON, JSON Lines or CSV)")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["json", "jsonl", "csv"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    report = import_catalog(args.path, file_format=args.format, chunk_size=args.chunk_size)
+    print(f"Imported {args.path}: {report.summary()}")
+    for error in report.errors:
+        print(f"  invalid record - {error}")
+
+if __name__ == "__main__":
+    main()
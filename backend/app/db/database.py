@@ -1,17 +1,129 @@
-from sqlalchemy import create_engine
+"""
+Database engines and sessions
+
+Writes always go to the primary (DATABASE_URL). When DATABASE_REPLICA_URLS
+lists read replicas, hot read paths wrap their lookups in read_from_replica()
+and those SELECTs are sent to one of the replicas instead. Replicas lag the
+primary, so reads stay on the primary:
+
+- for the rest of a session once it has written anything, and
+- for DATABASE_REPLICA_LAG_SECONDS after this worker wrote a key passed as
+  `recent_write_key` (e.g. a cache entry just filled), so the next request
+  doesn't miss it on a replica that hasn't caught up.
+
+Other workers don't see this worker's recent writes; a replica read there
+can at worst find the previous entry and refetch it.
+"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_LATENCY, DB_REPLICA_READS
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence
+from itertools import count
+import threading
+import time
+
+class RoutingSession(Session):
+    """Session that sends SELECTs inside read_from_replica() to a read replica"""
+
+    _sequence = count()
+
+    def __init__(self, *args, replicas: Sequence[Engine] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Spread sessions over the replicas; one session sticks to one
+        self.replica = replicas[next(RoutingSession._sequence) % len(replicas)] if replicas else None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or (clause is not None and not clause.is_select):
+            self.info["wrote"] = True
+        elif self.replica is not None and clause is not None and self.info.get("replica_reads") is not None:
+            # Inside read_from_replica(): False means the block was pinned to the primary
+            if self.info["replica_reads"] and not self.info.get("wrote"):
+                DB_REPLICA_READS.inc(target="replica")
+                return self.replica
+            DB_REPLICA_READS.inc(target="primary")
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+class RecentWrites:
+    """Keys written in this worker within the last `window` seconds"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._lock = threading.Lock()
+        self._written: Dict[Hashable, float] = {}
+
+    def add(self, key: Hashable) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._written[key] = now + self.window
+            if len(self._written) > 1000:
+                # Forget keys whose window has passed
+                self._written = {k: until for k, until in self._written.items() if until > now}
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            until = self._written.get(key)
+        return until is not None and until > time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._written.clear()
 
 engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+replica_engines: List[Engine] = [
+    create_engine(url.strip()) for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()
+]
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine, replicas=replica_engines)
 
 Base = declarative_base()
 
+# Time every statement on every engine (including test engines)
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    DB_QUERY_LATENCY.observe(elapsed, operation=operation)
+
+@event.listens_for(Engine, "handle_error")
+def _discard_query_timer(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+recent_writes = RecentWrites(settings.DATABASE_REPLICA_LAG_SECONDS)
+
+@contextmanager
+def read_from_replica(db: Session, recent_write_key: Optional[Hashable] = None) -> Iterator[None]:
+    """
+    Send the block's SELECTs to a read replica, if db has one
+
+    Args:
+        db: Session to read with; plain Sessions always read from their bind
+        recent_write_key: Key of the data being read; if this worker wrote it
+            within the replica lag window the block reads from the primary
+    """
+    previous = db.info.get("replica_reads")
+    db.info["replica_reads"] = previous is not False and (recent_write_key is None or recent_write_key not in recent_writes)
+    try:
+        yield
+    finally:
+        db.info["replica_reads"] = previous
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -1,57 +1,154 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from app.db.database import engine, Base
-from app.models import beach, cached_data, api_key
-import json
+from app.models import beach, cached_data, api_key, rate_limit, db_marker, beach_change, tide_prediction
+from app.db.catalog_importer import import_catalog
+from app.services.catalog_service import CatalogService
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import hashlib
 import os
+import tempfile
 
-def init_db():
-    """Initialize the database with tables and initial data"""
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-    
-    # Import initial beach data if beaches.json exists
-    beaches_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "beaches.json")
+# Bump whenever the models change in a way create_all needs to pick up
+SCHEMA_VERSION = 8
+
+SEED_MARKER_KEY = "schema_seed_version"
+
+DEFAULT_BEACHES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "beaches.json")
+
+def init_db(bind: Optional[Engine] = None, beaches_file: str = DEFAULT_BEACHES_FILE) -> bool:
+    """Initialize the database with tables and initial data
+
+    Idempotent and safe to call from every worker: when the stored version
+    marker already matches the current schema and seed file this only issues
+    a single read. Otherwise one caller takes a lock, creates the schema,
+    imports the seed data and records the marker.
+
+    Returns:
+        bool: True if schema/seed work was performed
+    """
+    bind = bind or engine
+    version = _seed_version(beaches_file)
+
+    if _read_marker(bind) == version:
+        return False
+
+    with _init_lock(bind):
+        # Another worker may have finished while we waited for the lock
+        if _read_marker(bind) == version:
+            return False
+
+        # Create all tables, then anything create_all skips on existing tables
+        Base.metadata.create_all(bind=bind)
+        _add_missing_columns_and_indexes(bind)
+        
+        # Version beaches that predate the change log before importing new ones
+        with Session(bind=bind) as db:
+            CatalogService.backfill_change_log(db)
+
+        # Import initial beach data if beaches.json exists
+        if os.path.exists(beaches_file) and not import_beaches_from_json(beaches_file, bind=bind):
+            # Leave the marker alone so the next start retries the seed
+            return True
+
+        _write_marker(bind, version)
+        return True
+
+def _add_missing_columns_and_indexes(bind: Engine) -> None:
+    """Bring existing tables up to date with new nullable columns and indexes
+
+    Only additive changes are handled; anything else needs a real migration.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    print(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+def _seed_version(beaches_file: str) -> str:
+    """Version string covering the schema and the contents of the seed file"""
+    digest = hashlib.sha256()
     if os.path.exists(beaches_file):
-        import_beaches_from_json(beaches_file)
+        with open(beaches_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return f"{SCHEMA_VERSION}:{digest.hexdigest()[:16]}"
+
+def _read_marker(bind: Engine) -> Optional[str]:
+    with bind.connect() as conn:
+        try:
+            return conn.execute(
+                text("SELECT value FROM db_markers WHERE key = :key"),
+                {"key": SEED_MARKER_KEY}
+            ).scalar()
+        except DBAPIError:
+            # Fresh database without the markers table yet
+            return None
+
+def _write_marker(bind: Engine, version: str) -> None:
+    with Session(bind=bind) as db:
+        marker = db.get(db_marker.DatabaseMarker, SEED_MARKER_KEY)
+        if marker:
+            marker.value = version
+        else:
+            db.add(db_marker.DatabaseMarker(key=SEED_MARKER_KEY, value=version))
+        db.commit()
 
-def import_beaches_from_json(json_file_path: str):
-    """Import beach data from the old beaches.json file"""
-    from app.models.beach import Beach
-    from app.db.database import SessionLocal
+@contextmanager
+def _init_lock(bind: Engine) -> Iterator[None]:
+    """Serialize schema/seed work across workers and hosts"""
+    if bind.dialect.name == "postgresql":
+        # Session-level advisory lock, held on a dedicated connection
+        with bind.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(hashtext('swellseeker_init_db'))"))
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext('swellseeker_init_db'))"))
+                conn.commit()
+        return
+
+    # SQLite and friends live on one host, so a lock file next to the temp dir is enough
+    lock_name = hashlib.sha256(str(bind.url).encode()).hexdigest()[:16]
+    lock_path = os.path.join(tempfile.gettempdir(), f"swellseeker-init-{lock_name}.lock")
+    with open(lock_path, "w") as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            # No flock on this platform; rely on create_all/import being idempotent
+            yield
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def import_beaches_from_json(json_file_path: str, bind: Optional[Engine] = None) -> bool:
+    """Import beach data from the old beaches.json file
     
-    db = SessionLocal()
+    Returns:
+        bool: False if the file could not be read to the end
+    """
     try:
-        with open(json_file_path, 'r') as f:
-            beaches_data = json.load(f)
-        
-        for beach_item in beaches_data:
-            item = beach_item["PutRequest"]["Item"]
-            
-            # Check if beach already exists
-            existing_beach = db.query(Beach).filter(Beach.beach_name == item["beach_name"]["S"]).first()
-            if existing_beach:
-                continue
-            
-            # Create new beach record
-            beach = Beach(
-                beach_name=item["beach_name"]["S"],
-                town=item["town"]["S"],
-                state=item["state"]["S"],
-                lat=float(item["lat"]["N"]),
-                long=float(item["long"]["N"]),
-                beach_angle=float(item["beach_angle"]["N"]),
-                station_id=item["station_id"]["N"]
-            )
-            db.add(beach)
-        
-        db.commit()
-        print(f"Imported {len(beaches_data)} beaches from JSON file")
-        
+        report = import_catalog(json_file_path, file_format="json", bind=bind)
+        print(f"Imported beaches from JSON file: {report.summary()}")
+        return True
     except Exception as e:
         print(f"Error importing beaches: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        return False
 
 if __name__ == "__main__":
-    init_db() 
\ No newline at end of file
+    init_db()
@@ -1,17 +1,52 @@
-from fastapi import FastAPI
+import time
+
+# Taken before any app imports so startup time includes module loading
+_process_start_time = time.perf_counter()
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.metrics import registry, REQUEST_LATENCY, STARTUP_DURATION, PROMETHEUS_CONTENT_TYPE
+from app.core.timing import start_request_timer, end_request_timer, get_request_timer
 from app.api.api_v1.api import api_router
 from app.db.init_db import init_db
+from app.services.admission_service import UpstreamOverloaded
+from app.services.cache_backends import get_cache_backend
+from contextlib import asynccontextmanager
+import json
+import logging
+import math
+
+slow_request_logger = logging.getLogger("swellseeker.slow_requests")
+
+STARTUP_DURATION.set(time.perf_counter() - _process_start_time, phase="import")
 
-# Initialize database
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup work once per worker, before it accepts requests"""
+    init_start_time = time.perf_counter()
+    if settings.INIT_DB_ON_STARTUP:
+        # Cheap no-op (one read) unless the schema or seed data changed
+        initialized = await run_in_threadpool(init_db)
+        STARTUP_DURATION.set(time.perf_counter() - init_start_time, phase="init_db")
+        if initialized:
+            print("Database schema and seed data initialized")
+    
+    total = time.perf_counter() - _process_start_time
+    STARTUP_DURATION.set(total, phase="total")
+    print(f"Startup completed in {total * 1000:.0f}ms")
+    yield
+    # Land queued cache writes (CACHE_WRITE_BEHIND) before the worker exits
+    await run_in_threadpool(get_cache_backend().flush)
 
 app = FastAPI(
     title="SwellSeeker API",
     description="Backend API for SwellSeeker mobile app",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS
@@ -23,6 +58,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Observe request latency labelled by route template (not raw path)"""
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start_time,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """Report per-phase timings in Server-Timing and log slow requests"""
+    token = start_request_timer()
+    timer = get_request_timer()
+    try:
+        response = await call_next(request)
+        total_ms = timer.total_ms()
+        response.headers["Server-Timing"] = timer.server_timing_header(total_ms)
+        
+        if total_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            route = request.scope.get("route")
+            slow_request_logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.url.path,
+                "route": getattr(route, "path", None),
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "phases": {name: round(duration, 1) for name, duration in timer.phases.items()},
+                "slow_phases": [
+                    name for name, duration in timer.phases.items()
+                    if duration >= settings.SLOW_PHASE_THRESHOLD_MS
+                ]
+            }))
+        return response
+    finally:
+        end_request_timer(token)
+
+@app.exception_handler(UpstreamOverloaded)
+async def upstream_overloaded(request: Request, exc: UpstreamOverloaded):
+    """Shed requests that need upstream data while upstream calls are saturated"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Upstream data sources are busy, try again shortly"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -32,4 +123,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"} 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
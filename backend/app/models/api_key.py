@@ -10,4 +10,13 @@ class APIKey(Base):
     name = Column(String, nullable=False)  # Human-readable name for the key
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    last_used = Column(DateTime(timezone=True), nullable=True) 
\ No newline at end of file
+    last_used = Column(DateTime(timezone=True), nullable=True)
+    
+    # Rate limits - NULL falls back to the defaults in Settings, 0 disables the limit.
+    # Added after the first release; init_db adds them to existing api_keys tables.
+    rate_limit_per_minute = Column(Integer, nullable=True)  # Token bucket refill rate
+    rate_limit_burst = Column(Integer, nullable=True)  # Token bucket capacity
+    max_concurrent_requests = Column(Integer, nullable=True)  # In-flight request cap
+    
+    # May use the /admin endpoints; NULL means no
+    is_admin = Column(Boolean, nullable=True, default=False)
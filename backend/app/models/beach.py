@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -18,4 +18,10 @@ class Beach(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationship
-    cached_data = relationship("CachedData", back_populates="beach") 
\ No newline at end of file
+    cached_data = relationship("CachedData", back_populates="beach")
+    
+    __table_args__ = (
+        # Keyset pagination orders by beach_name within a state/town filter
+        Index("ix_beaches_state_beach_name", "state", "beach_name"),
+        Index("ix_beaches_town_beach_name", "town", "beach_name"),
+    )
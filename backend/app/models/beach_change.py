@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class BeachChange(Base):
+    __tablename__ = "beach_changes"
+    
+    # The id doubles as the catalog version: it only ever increases
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    beach_name = Column(String, nullable=False)
+    change_type = Column(String, nullable=False)  # 'upsert' or 'delete'
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -10,6 +10,7 @@ class CachedData(Base):
     beach_id = Column(Integer, ForeignKey("beaches.id"), nullable=False)
     data_type = Column(String, nullable=False)  # 'wind_data', 'wave_data', 'tide_data', 'temp_data'
     data = Column(JSON, nullable=False)  # Store the actual API response data
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the data; NULL for rows from before hashing
     expires_at = Column(DateTime(timezone=True), nullable=False)  # TTL timestamp
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
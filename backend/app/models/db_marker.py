@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class DatabaseMarker(Base):
+    __tablename__ = "db_markers"
+    
+    key = Column(String, primary_key=True)  # e.g. 'schema_seed_version'
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from app.db.database import Base
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    
+    # One row per API key, shared by every worker using the same database
+    api_key_id = Column(Integer, ForeignKey("api_keys.id", ondelete="CASCADE"), primary_key=True)
+    tokens = Column(Float, nullable=False)  # Tokens left at `updated_at`
+    updated_at = Column(Float, nullable=False)  # Unix timestamp of the last refill
+
+class RateLimitLease(Base):
+    __tablename__ = "rate_limit_leases"
+    
+    # One row per request being served; expired rows are slots a dead worker never gave back
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    api_key_id = Column(Integer, ForeignKey("api_keys.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(Float, nullable=False)  # Unix timestamp after which the slot is free again
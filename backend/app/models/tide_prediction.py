@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, JSON, Date, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class TidePrediction(Base):
+    __tablename__ = "tide_predictions"
+    
+    # Hi/lo predictions are astronomical, so one fetch covers weeks of days
+    station_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)  # Station local standard time
+    predictions = Column(JSON, nullable=False)  # Same shape as cached 'tide_data'; [] for a day with none
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,49 @@
+from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+from datetime import datetime
+
+CacheDataType = Literal["wind_data", "wave_data", "tide_data", "temp_data", "forecast"]
+
+class CacheSelection(BaseModel):
+    """Cache entries to act on; beaches match by name or tide station"""
+    beach_names: List[str] = []
+    station_ids: List[str] = []
+    data_types: List[CacheDataType] = []  # Empty means every data type
+
+class CacheEntry(BaseModel):
+    beach_id: int
+    beach_name: Optional[str] = None
+    data_type: str
+    size_bytes: int
+    stored_at: Optional[datetime] = None  # Not tracked by every backend
+    age_seconds: Optional[float] = None
+    expires_at: datetime
+    expired: bool
+    content_hash: Optional[str] = None  # Changes only when the data does
+
+class CacheEntryList(BaseModel):
+    total: int
+    entries: List[CacheEntry]
+
+class InvalidateResult(BaseModel):
+    deleted: int
+    tide_days_deleted: int = 0
+
+class RefreshResult(BaseModel):
+    """A refresh runs in the background after this is returned"""
+    beaches: int
+    data_types: List[str]
+
+class CacheKeyStat(BaseModel):
+    beach_id: int
+    beach_name: Optional[str] = None
+    data_type: str
+    hits: int
+    stale: int
+    misses: int
+    hit_ratio: float
+
+class CacheStats(BaseModel):
+    """Lookup counts since this worker started"""
+    totals: Dict[str, Dict[str, int]]  # data_type -> hit/stale/miss counts
+    keys: List[CacheKeyStat]  # Most looked-up entries first
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List
+from datetime import datetime
+
+class ArchiveSeries(BaseModel):
+    """Archived points for one beach and data type, in columnar form"""
+    beach_name: str
+    data_type: str
+    start: datetime
+    end: datetime
+    series: Dict[str, List[Any]]  # 'time', 'issued_at' and one list per variable
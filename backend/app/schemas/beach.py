@@ -23,4 +23,26 @@ class Beach(BeachBase):
         from_attributes = True
 
 class BeachList(BaseModel):
-    beaches: list[Beach] 
\ No newline at end of file
+    beaches: list[Beach]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to fetch the next page
+
+class BeachSummary(BaseModel):
+    """Lightweight projection for list views"""
+    beach_name: str
+    town: str
+    lat: float
+    long: float
+    
+    class Config:
+        from_attributes = True
+
+class BeachSummaryList(BaseModel):
+    beaches: list[BeachSummary]
+    next_cursor: Optional[str] = None 
+
+class CatalogDelta(BaseModel):
+    """Beaches added, changed or removed since a client's catalog version"""
+    version: int  # Pass as `since` next time
+    since: int
+    upserts: list[Beach]
+    deletes: list[str]  # Names of removed beaches
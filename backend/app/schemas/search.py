@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class SurfWindow(BaseModel):
+    """A run of consecutive forecast hours graded yellow or better at one beach"""
+    beach_name: str
+    town: str
+    state: str
+    start: datetime  # Beach-local wall-clock time
+    end: datetime
+    grade: str  # Best grade in the window
+    score: float  # Sum of the hours' wave scores; ranks windows of the same grade
+    distance_km: Optional[float] = None
+
+class SurfWindowList(BaseModel):
+    start: datetime
+    end: datetime
+    windows: list[SurfWindow]  # Best first
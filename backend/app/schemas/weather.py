@@ -7,6 +7,7 @@ class WeatherDataBase(BaseModel):
     data_type: str
     data: Any
     cached: bool = False
+    stale: bool = False  # Expired cache served because upstream calls were being shed
 
 class WindData(WeatherDataBase):
     data_type: str = "wind_data"
@@ -20,6 +21,12 @@ class TideData(WeatherDataBase):
 class TemperatureData(WeatherDataBase):
     data_type: str = "temp_data"
 
+class TideCurveData(WeatherDataBase):
+    data_type: str = "tide_curve"  # data: 'time' and 'height' lists
+
+class ForecastData(WeatherDataBase):
+    data_type: str = "forecast"  # data: 'time' plus one list per wind and wave variable
+
 class SurfDataResponse(BaseModel):
     beach_name: str
     wind: Optional[WindData] = None
@@ -28,6 +35,18 @@ class SurfDataResponse(BaseModel):
     temperature: Optional[TemperatureData] = None
     grade: Optional[str] = None  # 'red', 'yellow', or 'green'
     cached: bool = False
+    pending: List[str] = []  # Sources still loading when the response was sent (e.g. 'tides')
+
+class CurrentConditions(BaseModel):
+    beach_name: str
+    time: Optional[datetime] = None  # Beach-local start of the forecast hour used
+    wind_speed: Optional[float] = None
+    wind_direction: Optional[float] = None
+    wave_height: Optional[float] = None
+    wave_direction: Optional[float] = None
+    wave_period: Optional[float] = None
+    grade: Optional[str] = None
+    cached: bool = False
 
 class TidePrediction(BaseModel):
     time: str
@@ -0,0 +1,163 @@
+from sqlalchemy import or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS
+from app.models.beach import Beach
+from app.models.tide_prediction import TidePrediction
+from app.services.admission_service import UpstreamOverloaded
+from app.services.cache_backends import CacheEntryInfo, get_cache_backend
+from app.services.cache_service import CacheKeyStats, CacheService, cache_key_stats
+from app.services.export_service import DATA_TYPES, ExportService
+from app.services.forecast_service import FORECAST_DATA_TYPE
+from app.services.tide_service import TideService
+from app.services.weather_service import WeatherService
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+# Every data type that can be in the cache
+CACHE_DATA_TYPES = (*DATA_TYPES, FORECAST_DATA_TYPE)
+
+class AdminService:
+    """Service for inspecting and managing cached upstream data"""
+
+    @staticmethod
+    def select_beaches(db: Session, beach_names: List[str], station_ids: List[str]) -> Optional[List[Beach]]:
+        """Beaches with any of the names or stations, or None (every beach) when neither is given"""
+        if not beach_names and not station_ids:
+            return None
+        return db.query(Beach).filter(or_(
+            Beach.beach_name.in_(beach_names),
+            Beach.station_id.in_(station_ids)
+        )).order_by(Beach.beach_name).all()
+
+    @staticmethod
+    def list_entries(
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Tuple[List[CacheEntryInfo], int]:
+        """
+        One page of cache entries ordered by beach and data type
+
+        Returns:
+            tuple: (entries, total matching entries)
+        """
+        entries = sorted(
+            get_cache_backend().list_entries(db, beach_ids, data_types),
+            key=lambda entry: (entry.beach_id, entry.data_type)
+        )
+        return entries[offset:offset + limit], len(entries)
+
+    @staticmethod
+    def invalidate(
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None,
+        station_ids: Optional[List[str]] = None
+    ) -> Tuple[int, int]:
+        """
+        Delete matching cache entries, and stored tide days for the given stations
+
+        Entries derived from a deleted one (the parsed forecast) go with it.
+
+        Returns:
+            tuple: (cache entries deleted, stored tide days deleted)
+        """
+        if data_types is not None:
+            derived = [
+                derived_type
+                for data_type in data_types
+                for derived_type in CacheService.DERIVED_DATA_TYPES.get(data_type, ())
+            ]
+            data_types = list(dict.fromkeys([*data_types, *derived]))
+        deleted = get_cache_backend().delete_many(db, beach_ids, data_types)
+
+        tide_days = 0
+        if station_ids and (data_types is None or "tide_data" in data_types):
+            tide_days = db.query(TidePrediction).filter(
+                TidePrediction.station_id.in_(station_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+        print(f"Admin invalidated {deleted} cache entries and {tide_days} stored tide days")
+        return deleted, tide_days
+
+    @staticmethod
+    def refresh(bind: Engine, beach_ids: List[int], data_types: List[str], concurrency: int = 8) -> int:
+        """
+        Refetch data for beaches from upstream and replace their cache entries
+
+        Existing entries keep being served until their replacement is stored.
+        Tides are refetched for each station once, weeks ahead. Runs with its
+        own session so it can be started as a background task.
+
+        Returns:
+            int: Number of cache entries refreshed
+        """
+        refreshed = 0
+        with Session(bind=bind) as db:
+            beaches = db.query(Beach).filter(Beach.id.in_(beach_ids)).all()
+
+            if "tide_data" in data_types:
+                today = TideService.today()
+                by_station: Dict[str, List[Beach]] = {}
+                for beach in beaches:
+                    by_station.setdefault(beach.station_id, []).append(beach)
+                for station_id, station_beaches in by_station.items():
+                    try:
+                        predictions = WeatherService.get_tide_data(station_id, begin_date=today, days=settings.TIDE_PREFETCH_DAYS)
+                    except UpstreamOverloaded:
+                        print(f"Admin refresh skipped tides for station {station_id}: upstream overloaded")
+                        continue
+                    if not isinstance(predictions, list):
+                        print(f"Admin refresh kept stored tides for station {station_id}: fetch failed")
+                        continue
+                    # Stored days are only replaced once their replacement is in hand
+                    by_day = TideService.store_predictions(db, station_id, predictions, today, settings.TIDE_PREFETCH_DAYS, replace=True)
+                    tides = by_day[today]
+                    for beach in station_beaches:
+                        CacheService.store_cached_data(db, beach.id, "tide_data", tides, expires_at=TideService.end_of_today())
+                        refreshed += 1
+
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = {
+                    pool.submit(ExportService.fetch_upstream, DATA_TYPES[data_type][2], beach): (beach, data_type)
+                    for beach in beaches
+                    for data_type in data_types
+                    if data_type in DATA_TYPES and data_type != "tide_data"
+                }
+                for future in as_completed(futures):
+                    beach, data_type = futures[future]
+                    data = future.result()
+                    if data is not None:
+                        # Sessions aren't thread-safe, so cache writes happen here rather than in the pool
+                        CacheService.store_cached_data(db, beach.id, data_type, data)
+                        refreshed += 1
+        print(f"Admin refresh stored {refreshed} cache entries for {len(beach_ids)} beaches")
+        return refreshed
+
+    @staticmethod
+    def hit_stats(
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None,
+        limit: int = 50,
+        stats: CacheKeyStats = cache_key_stats
+    ) -> List[Tuple[int, str, Dict[str, int]]]:
+        """This worker's most looked-up cache keys, as (beach_id, data_type, counts)"""
+        keys = [
+            (beach_id, data_type, counts)
+            for (beach_id, data_type), counts in stats.snapshot().items()
+            if (beach_ids is None or beach_id in beach_ids) and (data_types is None or data_type in data_types)
+        ]
+        keys.sort(key=lambda key: -sum(key[2].values()))
+        return keys[:limit]
+
+    @staticmethod
+    def lookup_totals() -> Dict[str, Dict[str, int]]:
+        """This worker's cache lookups per data type and result"""
+        return {
+            data_type: {result: int(CACHE_LOOKUPS.value(data_type=data_type, result=result)) for result in CacheKeyStats.RESULTS}
+            for data_type in CACHE_DATA_TYPES
+        }
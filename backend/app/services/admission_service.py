@@ -0,0 +1,111 @@
+"""
+Admission control for upstream API calls
+
+Every upstream call (WeatherService._get) takes one of UPSTREAM_MAX_CONCURRENT
+slots in this worker. When all are taken, callers wait in a queue of at most
+UPSTREAM_QUEUE_SIZE for up to UPSTREAM_QUEUE_TIMEOUT_SECONDS; past either
+limit the call is refused with UpstreamOverloaded instead of piling up, and
+request handlers answer with stale cached data or a fast 503.
+"""
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_ADMISSION_REJECTIONS, UPSTREAM_IN_FLIGHT, UPSTREAM_QUEUE_DEPTH
+from app.core.timing import span
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import threading
+import time
+
+class UpstreamOverloaded(Exception):
+    """An upstream call was refused because too many are already in flight or queued"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Upstream calls overloaded ({reason})")
+        self.reason = reason  # 'queue_full' or 'timeout'
+        self.retry_after = retry_after
+
+class UpstreamAdmission:
+    """Bounded concurrency with a bounded, deadline-limited wait queue"""
+
+    def __init__(self, max_concurrent: int, queue_size: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent  # 0 disables admission control
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed
+
+        Raises:
+            UpstreamOverloaded: The queue is full, or no slot freed up in time
+        """
+        if not self.max_concurrent:
+            return
+        with self._condition:
+            if self._in_flight >= self.max_concurrent:
+                if self._waiting >= self.queue_size:
+                    self._reject("queue_full")
+                self._waiting += 1
+                UPSTREAM_QUEUE_DEPTH.set(self._waiting)
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self._in_flight >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("timeout")
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    UPSTREAM_QUEUE_DEPTH.set(self._waiting)
+            self._in_flight += 1
+            UPSTREAM_IN_FLIGHT.set(self._in_flight)
+
+    def release(self) -> None:
+        if not self.max_concurrent:
+            return
+        with self._condition:
+            self._in_flight -= 1
+            UPSTREAM_IN_FLIGHT.set(self._in_flight)
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the duration of one upstream call"""
+        with span("upstream_queue"):
+            self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _reject(self, reason: str) -> None:
+        UPSTREAM_ADMISSION_REJECTIONS.inc(reason=reason)
+        # By then a queued call will most likely have finished
+        raise UpstreamOverloaded(reason, retry_after=max(1.0, self.queue_timeout))
+
+_admission: Optional[UpstreamAdmission] = None
+
+def get_upstream_admission() -> UpstreamAdmission:
+    """Return the worker-wide admission controller configured in Settings"""
+    global _admission
+    if _admission is None:
+        _admission = UpstreamAdmission(
+            settings.UPSTREAM_MAX_CONCURRENT,
+            settings.UPSTREAM_QUEUE_SIZE,
+            settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS
+        )
+    return _admission
+
+def set_upstream_admission(admission: Optional[UpstreamAdmission]) -> None:
+    """Swap the worker-wide admission controller (None re-reads Settings on next use)"""
+    global _admission
+    _admission = admission
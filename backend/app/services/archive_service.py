@@ -0,0 +1,263 @@
+"""
+Append-only archive of fetched forecast and observation series
+
+Every payload written to the cache is also appended here, so past forecasts
+and readings survive cache replacement. Layout:
+
+    {ARCHIVE_DIR}/{data_type}/{YYYY-MM-DD}/beach-{beach_id}.seg
+
+Each fetch is split by day and appended to that day's partition as one
+segment: a fixed header followed by a zlib-compressed block holding the
+column names, delta-encoded int64 timestamps and one float64 array per
+variable. A range query only opens the day partitions it covers.
+
+Timestamps are the upstream's local wall-clock times (NOAA LST, Open-Meteo
+America/New_York) stored as if they were UTC, so days line up with the beach's
+calendar. Temperature has no observation time, so the fetch time is used.
+"""
+from app.core.config import settings
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from array import array
+import math
+import os
+import struct
+import sys
+import zlib
+
+# Magic, issued_at (epoch seconds), point count, column count, compressed length
+SEGMENT_HEADER = struct.Struct("<4sqIHI")
+SEGMENT_MAGIC = b"SSA1"
+
+# Numeric columns archived per data type
+SCHEMAS = {
+    "wind_data": ("wind_speed_10m", "wind_direction_10m"),
+    "wave_data": ("wave_height", "wave_direction", "wave_period"),
+    "tide_data": ("height", "high"),
+    "temp_data": ("water_temp", "air_temp"),
+}
+
+SECONDS_PER_DAY = 86400
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _epoch(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _parse_time(value: str) -> int:
+    # Wall-clock time, kept as-is (see module docstring)
+    return _epoch(datetime.fromisoformat(value))
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+def extract_series(data_type: str, data: Any, fetched_at: datetime) -> Optional[Tuple[List[int], Dict[str, List[float]]]]:
+    """Pull (timestamps, columns) out of a cached payload, or None if it isn't archivable"""
+    columns = SCHEMAS.get(data_type)
+    if columns is None or not data or (isinstance(data, dict) and "error" in data):
+        return None
+
+    if data_type in ("wind_data", "wave_data"):
+        hourly = data.get("hourly", {})
+        times = [_parse_time(value) for value in hourly.get("time", [])]
+        values = {
+            column: [_to_float(value) for value in hourly.get(column, [None] * len(times))]
+            for column in columns
+        }
+    elif data_type == "tide_data":
+        times = [_parse_time(tide["time"]) for tide in data]
+        values = {
+            "height": [_to_float(tide.get("height")) for tide in data],
+            "high": [1.0 if tide.get("type") == "high" else 0.0 for tide in data]
+        }
+    else:
+        times = [_epoch(fetched_at)]
+        values = {column: [_to_float(data.get(column))] for column in columns}
+
+    if not times or any(len(column_values) != len(times) for column_values in values.values()):
+        return None
+    return times, values
+
+def encode_segment(issued_at: int, times: List[int], columns: Dict[str, List[float]]) -> bytes:
+    """Pack one fetch's slice of a partition into a segment"""
+    names = list(columns)
+    deltas = array("q", [times[0]] + [times[i] - times[i - 1] for i in range(1, len(times))])
+    parts = [
+        "\0".join(names).encode(),
+        _little_endian(deltas).tobytes()
+    ]
+    for name in names:
+        parts.append(_little_endian(array("d", columns[name])).tobytes())
+    name_length = struct.pack("<H", len(parts[0]))
+    block = zlib.compress(name_length + b"".join(parts), 6)
+    return SEGMENT_HEADER.pack(SEGMENT_MAGIC, issued_at, len(times), len(names), len(block)) + block
+
+def decode_segments(raw: bytes) -> Iterator[Tuple[int, array, Dict[str, array]]]:
+    """Yield (issued_at, times, columns) for every complete segment in a partition"""
+    offset = 0
+    while offset + SEGMENT_HEADER.size <= len(raw):
+        magic, issued_at, count, column_count, block_length = SEGMENT_HEADER.unpack_from(raw, offset)
+        start = offset + SEGMENT_HEADER.size
+        if magic != SEGMENT_MAGIC or start + block_length > len(raw):
+            # Torn write at the tail; everything before it is intact
+            return
+        block = zlib.decompress(raw[start:start + block_length])
+        offset = start + block_length
+
+        (name_length,) = struct.unpack_from("<H", block, 0)
+        position = 2 + name_length
+        names = block[2:position].decode().split("\0") if name_length else []
+
+        deltas = array("q")
+        deltas.frombytes(block[position:position + count * 8])
+        position += count * 8
+        deltas = _little_endian(deltas)
+        times = array("q")
+        running = 0
+        for index, delta in enumerate(deltas):
+            running = delta if index == 0 else running + delta
+            times.append(running)
+
+        columns = {}
+        for name in names[:column_count]:
+            values = array("d")
+            values.frombytes(block[position:position + count * 8])
+            position += count * 8
+            columns[name] = _little_endian(values)
+        yield issued_at, times, columns
+
+class ForecastArchive:
+    """Day-partitioned columnar archive rooted at a directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def partition_path(self, data_type: str, day: date, beach_id: int) -> str:
+        return os.path.join(self.directory, data_type, day.isoformat(), f"beach-{beach_id}.seg")
+
+    def append(self, beach_id: int, data_type: str, data: Any, fetched_at: Optional[datetime] = None) -> int:
+        """
+        Archive one fetched payload
+
+        Returns:
+            int: Number of points written (0 if the payload isn't archivable)
+        """
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        series = extract_series(data_type, data, fetched_at)
+        if series is None:
+            return 0
+        times, columns = series
+        issued_at = _epoch(fetched_at)
+
+        # Split by day; each day gets its own segment
+        by_day: Dict[int, List[int]] = {}
+        for index, timestamp in enumerate(times):
+            by_day.setdefault(timestamp // SECONDS_PER_DAY, []).append(index)
+
+        for day_number, indexes in by_day.items():
+            day = date(1970, 1, 1) + timedelta(days=day_number)
+            segment = encode_segment(
+                issued_at,
+                [times[i] for i in indexes],
+                {name: [values[i] for i in indexes] for name, values in columns.items()}
+            )
+            path = self.partition_path(data_type, day, beach_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # One O_APPEND write per segment keeps concurrent writers from interleaving
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, segment)
+            finally:
+                os.close(fd)
+        return len(times)
+
+    def query(
+        self,
+        beach_id: int,
+        data_type: str,
+        start: datetime,
+        end: datetime,
+        latest_only: bool = True
+    ) -> Dict[str, List[Any]]:
+        """
+        Read archived points with start <= time < end
+
+        Args:
+            latest_only: Keep only the most recently fetched value for each
+                timestamp; otherwise every archived forecast is returned
+
+        Returns:
+            dict: Columnar result with 'time' and 'issued_at' (ISO strings)
+                plus one list per variable, ordered by time then issued_at
+        """
+        if data_type not in SCHEMAS:
+            raise ValueError(f"Unknown archive data type '{data_type}'")
+        start_epoch, end_epoch = _epoch(start), _epoch(end)
+
+        rows = []
+        day = datetime.fromtimestamp(start_epoch, tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp(max(start_epoch, end_epoch - 1), tz=timezone.utc).date()
+        while day <= last_day:
+            path = self.partition_path(data_type, day, beach_id)
+            day += timedelta(days=1)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                raw = f.read()
+            for issued_at, times, columns in decode_segments(raw):
+                for index, timestamp in enumerate(times):
+                    if start_epoch <= timestamp < end_epoch:
+                        rows.append((timestamp, issued_at, {name: values[index] for name, values in columns.items()}))
+
+        rows.sort(key=lambda row: (row[0], row[1]))
+        if latest_only:
+            latest = {}
+            for row in rows:
+                latest[row[0]] = row
+            rows = list(latest.values())
+
+        def iso(timestamp: int) -> str:
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M")
+
+        result: Dict[str, List[Any]] = {
+            "time": [iso(row[0]) for row in rows],
+            "issued_at": [iso(row[1]) for row in rows]
+        }
+        for name in SCHEMAS[data_type]:
+            result[name] = [
+                None if math.isnan(row[2].get(name, math.nan)) else row[2][name]
+                for row in rows
+            ]
+        return result
+
+    def size_bytes(self) -> int:
+        """Total archive size on disk"""
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+_archive: Optional[ForecastArchive] = None
+
+def get_archive() -> Optional[ForecastArchive]:
+    """Return the process-wide archive, or None when ARCHIVE_ENABLED is off"""
+    global _archive
+    if not settings.ARCHIVE_ENABLED:
+        return None
+    if _archive is None:
+        _archive = ForecastArchive(settings.ARCHIVE_DIR)
+    return _archive
+
+def set_archive(archive: Optional[ForecastArchive]) -> None:
+    """Swap the process-wide archive (None re-reads Settings on next use)"""
+    global _archive
+    _archive = archive
@@ -1,13 +1,39 @@
 from sqlalchemy.orm import Session
 from app.models.api_key import APIKey
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.db.database import get_db
+from app.services.rate_limit_service import RateLimiter, get_rate_limiter
+from app.core.timing import span
+from typing import Iterator, Optional
 import hashlib
+import math
 from datetime import datetime
 
 security = HTTPBearer()
 
+class RequestSlot:
+    """An in-flight slot taken for one request, released exactly once"""
+    
+    def __init__(self, limiter: RateLimiter, api_key: APIKey, lease_id: Optional[int], bind):
+        self.limiter = limiter
+        self.api_key = api_key
+        self.lease_id = lease_id
+        self.bind = bind
+        self.detached = False
+        self.released = False
+    
+    def release(self, db: Optional[Session] = None) -> None:
+        if self.released:
+            return
+        self.released = True
+        if db is not None:
+            self.limiter.release(db, self.api_key, self.lease_id)
+            return
+        # Detached slots outlive the request session
+        with Session(bind=self.bind) as own_db:
+            self.limiter.release(own_db, self.api_key, self.lease_id)
+
 class AuthService:
     """Service for API key authentication"""
     
@@ -17,8 +43,8 @@ class AuthService:
         return hashlib.sha256(api_key.encode()).hexdigest()
     
     @staticmethod
-    def validate_api_key(db: Session, api_key: str) -> bool:
-        """Validate an API key"""
+    def get_api_key_record(db: Session, api_key: str) -> Optional[APIKey]:
+        """Look up an active API key and mark it as used"""
         key_hash = AuthService.hash_api_key(api_key)
         
         api_key_record = db.query(APIKey).filter(
@@ -30,20 +56,73 @@ class AuthService:
             # Update last used timestamp
             api_key_record.last_used = datetime.utcnow()
             db.commit()
-            return True
         
-        return False
+        return api_key_record
+    
+    @staticmethod
+    def validate_api_key(db: Session, api_key: str) -> bool:
+        """Validate an API key"""
+        return AuthService.get_api_key_record(db, api_key) is not None
     
     @staticmethod
     def get_current_api_key(
+        request: Request,
         credentials: HTTPAuthorizationCredentials = Depends(security),
         db: Session = Depends(get_db)
-    ) -> str:
-        """Dependency for getting and validating the current API key"""
+    ) -> Iterator[str]:
+        """Dependency for getting and validating the current API key
+        
+        Also enforces the key's rate limit and holds one of its in-flight
+        slots until the request has been handled. Streaming endpoints keep
+        the slot for the whole body with detach_request_slot().
+        """
         if not credentials:
             raise HTTPException(status_code=401, detail="API key required")
         
-        if not AuthService.validate_api_key(db, credentials.credentials):
-            raise HTTPException(status_code=401, detail="Invalid API key")
+        with span("auth"):
+            api_key_record = AuthService.get_api_key_record(db, credentials.credentials)
+            if not api_key_record:
+                raise HTTPException(status_code=401, detail="Invalid API key")
+            
+            limiter = get_rate_limiter()
+            decision = limiter.acquire(db, api_key_record)
+        if not decision.allowed:
+            detail = "Too many concurrent requests" if decision.reason == "concurrency" else "Rate limit exceeded"
+            raise HTTPException(
+                status_code=429,
+                detail=detail,
+                headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))}
+            )
+        
+        slot = RequestSlot(limiter, api_key_record, decision.lease_id, db.get_bind())
+        request.state.rate_limit_slot = slot
+        try:
+            yield credentials.credentials
+        finally:
+            if not slot.detached:
+                slot.release(db)
+    
+    @staticmethod
+    def detach_request_slot(request: Request) -> Optional[RequestSlot]:
+        """Take over the request's in-flight slot from get_current_api_key
         
-        return credentials.credentials 
\ No newline at end of file
+        Dependency teardown runs before a streamed body is sent, so a
+        streaming endpoint calls this and releases the slot itself once
+        the body is done (e.g. from the response's background task).
+        """
+        slot = getattr(request.state, "rate_limit_slot", None)
+        if slot is not None:
+            slot.detached = True
+        return slot
+    
+    @staticmethod
+    def get_admin_api_key(
+        request: Request,
+        # The plain function, so FastAPI shares it with endpoints' own dependency
+        api_key: str = Depends(get_current_api_key.__func__)
+    ) -> str:
+        """Dependency for endpoints only admin keys may use (see APIKey.is_admin)"""
+        slot = getattr(request.state, "rate_limit_slot", None)
+        if slot is None or not slot.api_key.is_admin:
+            raise HTTPException(status_code=403, detail="Admin API key required")
+        return api_key
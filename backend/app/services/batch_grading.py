@@ -0,0 +1,239 @@
+"""
+Offline batch grading of archived wind and wave series
+
+Re-grades historical points with the current GradingService rules, e.g.
+after tuning thresholds. Input rows hold one point each:
+
+    beach_id, time, beach_angle, wind_speed_10m, wind_direction_10m, wave_height, wave_period
+
+as CSV, JSON Lines or a columnar file (.seg: archive segments, see
+archive_service, with time as the segment's timestamps and every other
+column as float64). Missing values are empty, null or NaN.
+
+Rows are read in chunks and each chunk is parsed, graded with
+GradingService.grade_columns and encoded by a worker process; results are
+written in input order as rows of beach_id, time, grade, score in the
+output format (columnar output stores grade as 0 red, 1 yellow, 2 green).
+
+    python -m app.services.batch_grading history.csv grades.jsonl
+    python -m app.services.batch_grading history.seg grades.seg --workers 8 --chunk-size 50000
+"""
+from app.services.archive_service import decode_segments, encode_segment
+from app.services.grading_service import GradingService
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+from array import array
+from itertools import islice
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import time
+
+DEFAULT_CHUNK_SIZE = 20000
+
+FORMATS = ("csv", "jsonl", "columnar")
+
+# Float columns read from every row, in GradingService.grade_columns order after the angle
+VALUE_COLUMNS = ("beach_angle", "wind_speed_10m", "wind_direction_10m", "wave_height", "wave_period")
+OUTPUT_COLUMNS = ("beach_id", "time", "grade", "score")
+
+GRADE_CODES = {"red": 0.0, "yellow": 1.0, "green": 2.0}
+
+# Raw records from a text file, or (times, columns) from a columnar one
+Chunk = Union[List[Dict[str, Any]], Tuple[array, Dict[str, array]]]
+
+@dataclass
+class GradingReport:
+    """Counts and timing from one batch grading run"""
+    rows: int = 0
+    missing: int = 0
+    chunks: int = 0
+    workers: int = 1
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows graded ({self.missing} with missing values) in {self.chunks} chunks "
+            f"on {self.workers} workers in {self.elapsed_seconds:.2f}s ({self.rows_per_second:.0f} rows/s)"
+        )
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _epoch(value: str) -> int:
+    # Wall-clock time stored as if it were UTC, like the archive
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _wall_clock(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None).isoformat()
+
+def detect_format(path: str) -> str:
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if lowered.endswith(".seg"):
+        return "columnar"
+    raise ValueError(f"Can't tell the format of '{path}'; pass it explicitly")
+
+def iter_chunks(path: str, file_format: str, chunk_size: int) -> Iterator[Chunk]:
+    """Stream an input file a chunk of at most chunk_size rows at a time"""
+    if file_format == "columnar":
+        with open(path, "rb") as f:
+            raw = f.read()
+        for _, times, columns in decode_segments(raw):
+            for low in range(0, len(times), chunk_size):
+                high = low + chunk_size
+                yield times[low:high], {name: values[low:high] for name, values in columns.items()}
+        return
+
+    with open(path, "r", newline="" if file_format == "csv" else None) as f:
+        if file_format == "csv":
+            records: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        elif file_format == "jsonl":
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            raise ValueError(f"Unsupported input format '{file_format}'")
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def to_columns(chunk: Chunk) -> Tuple[List[int], array, Dict[str, array]]:
+    """Parse a chunk into (beach ids, times, float columns)"""
+    if isinstance(chunk, tuple):
+        times, columns = chunk
+        missing = array("d", [math.nan]) * len(times)
+        beach_ids = [int(value) if value == value else 0 for value in columns.get("beach_id", missing)]
+        return beach_ids, times, {name: columns.get(name, missing) for name in VALUE_COLUMNS}
+
+    beach_ids = [int(record["beach_id"]) for record in chunk]
+    times = array("q", [_epoch(record["time"]) for record in chunk])
+    columns = {name: array("d", [_to_float(record.get(name)) for record in chunk]) for name in VALUE_COLUMNS}
+    return beach_ids, times, columns
+
+def grade_chunk(chunk: Chunk, output_format: str, issued_at: int) -> Tuple[int, int, bytes]:
+    """
+    Parse, grade and encode one chunk (runs in a worker process)
+
+    Returns:
+        tuple: (rows, rows with missing values, encoded output)
+    """
+    beach_ids, times, columns = to_columns(chunk)
+    grades, scores = GradingService.grade_columns(
+        columns["wind_speed_10m"],
+        columns["wind_direction_10m"],
+        columns["wave_height"],
+        columns["wave_period"],
+        columns["beach_angle"]
+    )
+    missing = grades.count(None)
+
+    if output_format == "columnar":
+        if not len(times):
+            return 0, 0, b""
+        encoded = encode_segment(issued_at, list(times), {
+            "beach_id": [float(beach_id) for beach_id in beach_ids],
+            "grade": [GRADE_CODES[grade] if grade is not None else math.nan for grade in grades],
+            "score": [score if score is not None else math.nan for score in scores]
+        })
+        return len(times), missing, encoded
+
+    rows = zip(beach_ids, map(_wall_clock, times), grades, scores)
+    if output_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        text = buffer.getvalue()
+    elif output_format == "jsonl":
+        text = "".join(json.dumps(dict(zip(OUTPUT_COLUMNS, row))) + "\n" for row in rows)
+    else:
+        raise ValueError(f"Unsupported output format '{output_format}'")
+    return len(times), missing, text.encode()
+
+def grade_file(
+    input_path: str,
+    output_path: str,
+    input_format: Optional[str] = None,
+    output_format: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: Optional[int] = None
+) -> GradingReport:
+    """Grade every row of an input file into an output file
+
+    Chunks are graded by a pool of worker processes, with at most two per
+    worker in flight so memory stays flat; workers=1 grades in this process.
+    """
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or detect_format(output_path)
+    workers = workers or os.cpu_count() or 1
+    report = GradingReport(workers=workers)
+    issued_at = int(time.time())
+    start_time = time.perf_counter()
+
+    def write(result: Tuple[int, int, bytes]) -> None:
+        rows, missing, encoded = result
+        out.write(encoded)
+        report.rows += rows
+        report.missing += missing
+        report.chunks += 1
+
+    with open(output_path, "wb") as out:
+        if output_format == "csv":
+            out.write((",".join(OUTPUT_COLUMNS) + "\n").encode())
+        chunks = iter_chunks(input_path, input_format, chunk_size)
+        if workers == 1:
+            for chunk in chunks:
+                write(grade_chunk(chunk, output_format, issued_at))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight: Deque[Future] = deque()
+                for chunk in chunks:
+                    if len(in_flight) >= workers * 2:
+                        write(in_flight.popleft().result())
+                    in_flight.append(pool.submit(grade_chunk, chunk, output_format, issued_at))
+                while in_flight:
+                    write(in_flight.popleft().result())
+
+    report.elapsed_seconds = time.perf_counter() - start_time
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-grade archived wind and wave series (CSV, JSON Lines or columnar)")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=FORMATS, help="Input format; defaults to the file extension")
+    parser.add_argument("--output-format", choices=FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, help="Worker processes; defaults to the CPU count")
+    args = parser.parse_args()
+
+    report = grade_file(
+        args.input,
+        args.output,
+        input_format=args.format,
+        output_format=args.output_format,
+        chunk_size=args.chunk_size,
+        workers=args.workers
+    )
+    print(f"Graded {args.input} into {args.output}: {report.summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,732 @@
+"""
+Storage backends for cached upstream data
+
+- sql:    the cached_data table in the primary database (default)
+- memory: a per-process dict; nothing is shared between workers
+- sqlite: a dedicated SQLite file in WAL mode, shared by every worker on the
+          host without adding write load to the primary database
+
+Every backend stores (data, expires_at) per beach and data type, plus a hash
+of the data so an unchanged refresh only has to push expires_at back; TTL
+checks stay in CacheService.
+
+With CACHE_WRITE_BEHIND any of them is wrapped in WriteBehindCacheBackend,
+which queues writes in memory and applies them in batched transactions.
+"""
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import CACHE_WRITE_BEHIND_FLUSHES, CACHE_WRITE_BEHIND_PENDING
+from app.db.database import SessionLocal
+from app.models.cached_data import CachedData
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CacheEntry = Tuple[Dict[str, Any], datetime]
+
+class CacheEntryInfo(NamedTuple):
+    """An entry's metadata, for inspection"""
+    beach_id: int
+    data_type: str
+    size_bytes: int  # Serialized JSON size
+    stored_at: Optional[datetime]  # When the current data was stored; unchanged refreshes keep it
+    expires_at: datetime
+    content_hash: Optional[str] = None
+
+class CacheWrite(NamedTuple):
+    """One queued change to an entry: 'set', 'touch' (new expiry for the same data) or 'delete'"""
+    kind: str
+    beach_id: int
+    data_type: str
+    data: Optional[Dict[str, Any]] = None
+    expires_at: Optional[datetime] = None
+    content_hash: Optional[str] = None
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    if value.tzinfo is None or value.tzinfo.utcoffset(value) is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class CacheBackend:
+    """Base class for cache backends"""
+
+    def get(self, db: Session, beach_id: int, data_type: str) -> Optional[CacheEntry]:
+        """Return (data, expires_at) or None, expired entries included"""
+        raise NotImplementedError
+
+    def get_many(self, db: Session, beach_ids: List[int], data_type: str) -> Dict[int, CacheEntry]:
+        """Return beach_id -> (data, expires_at) for every beach with an entry"""
+        entries = {}
+        for beach_id in beach_ids:
+            entry = self.get(db, beach_id, data_type)
+            if entry is not None:
+                entries[beach_id] = entry
+        return entries
+
+    def set(
+        self,
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: datetime,
+        content_hash: Optional[str] = None
+    ) -> None:
+        """Store data, replacing any existing entry"""
+        raise NotImplementedError
+
+    def touch(self, db: Session, beach_id: int, data_type: str, content_hash: str, expires_at: datetime) -> bool:
+        """Move an entry's expiry to expires_at if it holds data with this hash
+
+        Returns:
+            bool: True if the entry was extended, False if there is no such
+                entry (the data must be stored with set())
+        """
+        return False
+
+    def get_content_hash(self, db: Session, beach_id: int, data_type: str) -> Optional[str]:
+        """Hash of an entry's data, or None if there is no entry or it wasn't hashed"""
+        return None
+
+    def delete(self, db: Session, beach_id: int, data_type: str) -> None:
+        raise NotImplementedError
+
+    def write_many(self, db: Session, writes: List[CacheWrite]) -> None:
+        """Apply writes to distinct entries, in one transaction where the backend has them"""
+        for write in writes:
+            if write.kind == "set":
+                self.set(db, write.beach_id, write.data_type, write.data, write.expires_at, content_hash=write.content_hash)
+            elif write.kind == "touch":
+                self.touch(db, write.beach_id, write.data_type, write.content_hash, write.expires_at)
+            else:
+                self.delete(db, write.beach_id, write.data_type)
+
+    def flush(self) -> None:
+        """Write out anything queued (only WriteBehindCacheBackend queues)"""
+
+    def list_entries(
+        self,
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None
+    ) -> List[CacheEntryInfo]:
+        """Metadata of every entry matching the filters (None matches all), expired ones included"""
+        raise NotImplementedError
+
+    def delete_many(self, db: Session, beach_ids: Optional[List[int]] = None, data_types: Optional[List[str]] = None) -> int:
+        """Delete every entry matching the filters (None matches all) and return how many"""
+        entries = self.list_entries(db, beach_ids, data_types)
+        for entry in entries:
+            self.delete(db, entry.beach_id, entry.data_type)
+        return len(entries)
+
+    def clear(self) -> None:
+        """Drop every entry (tests and benchmarks)"""
+        raise NotImplementedError
+
+class SQLCacheBackend(CacheBackend):
+    """Cache rows in the cached_data table, using the request's session"""
+
+    def get(self, db: Session, beach_id: int, data_type: str) -> Optional[CacheEntry]:
+        cached_record = db.query(CachedData).filter(
+            CachedData.beach_id == beach_id,
+            CachedData.data_type == data_type
+        ).first()
+        if cached_record is None:
+            return None
+        return cached_record.data, _as_utc(cached_record.expires_at)
+
+    def get_many(self, db: Session, beach_ids: List[int], data_type: str) -> Dict[int, CacheEntry]:
+        if not beach_ids:
+            return {}
+        rows = db.query(CachedData.beach_id, CachedData.data, CachedData.expires_at).filter(
+            CachedData.beach_id.in_(beach_ids),
+            CachedData.data_type == data_type
+        ).all()
+        return {row.beach_id: (row.data, _as_utc(row.expires_at)) for row in rows}
+
+    def set(
+        self,
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: datetime,
+        content_hash: Optional[str] = None
+    ) -> None:
+        # Delete existing cached data for this beach and data type
+        db.query(CachedData).filter(
+            CachedData.beach_id == beach_id,
+            CachedData.data_type == data_type
+        ).delete()
+        db.add(CachedData(beach_id=beach_id, data_type=data_type, data=data, expires_at=expires_at, content_hash=content_hash))
+        db.commit()
+
+    def touch(self, db: Session, beach_id: int, data_type: str, content_hash: str, expires_at: datetime) -> bool:
+        # One small UPDATE instead of rewriting the JSON payload
+        updated = db.query(CachedData).filter(
+            CachedData.beach_id == beach_id,
+            CachedData.data_type == data_type,
+            CachedData.content_hash == content_hash
+        ).update({CachedData.expires_at: expires_at}, synchronize_session=False)
+        if not updated:
+            # Left open so the set() that follows shares the transaction
+            return False
+        db.commit()
+        return True
+
+    def get_content_hash(self, db: Session, beach_id: int, data_type: str) -> Optional[str]:
+        return db.query(CachedData.content_hash).filter(
+            CachedData.beach_id == beach_id,
+            CachedData.data_type == data_type
+        ).scalar()
+
+    def delete(self, db: Session, beach_id: int, data_type: str) -> None:
+        db.query(CachedData).filter(
+            CachedData.beach_id == beach_id,
+            CachedData.data_type == data_type
+        ).delete()
+        db.commit()
+
+    def write_many(self, db: Session, writes: List[CacheWrite]) -> None:
+        replaced = [(write.beach_id, write.data_type) for write in writes if write.kind != "touch"]
+        if replaced:
+            db.query(CachedData).filter(
+                tuple_(CachedData.beach_id, CachedData.data_type).in_(replaced)
+            ).delete(synchronize_session=False)
+        db.add_all([
+            CachedData(
+                beach_id=write.beach_id,
+                data_type=write.data_type,
+                data=write.data,
+                expires_at=write.expires_at,
+                content_hash=write.content_hash
+            )
+            for write in writes if write.kind == "set"
+        ])
+        for write in writes:
+            if write.kind == "touch":
+                db.query(CachedData).filter(
+                    CachedData.beach_id == write.beach_id,
+                    CachedData.data_type == write.data_type,
+                    CachedData.content_hash == write.content_hash
+                ).update({CachedData.expires_at: write.expires_at}, synchronize_session=False)
+        db.commit()
+
+    def _filtered(self, query, beach_ids: Optional[List[int]], data_types: Optional[List[str]]):
+        if beach_ids is not None:
+            query = query.filter(CachedData.beach_id.in_(beach_ids))
+        if data_types is not None:
+            query = query.filter(CachedData.data_type.in_(data_types))
+        return query
+
+    def list_entries(
+        self,
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None
+    ) -> List[CacheEntryInfo]:
+        rows = self._filtered(
+            db.query(
+                CachedData.beach_id,
+                CachedData.data_type,
+                CachedData.data,
+                CachedData.created_at,
+                CachedData.expires_at,
+                CachedData.content_hash
+            ),
+            beach_ids,
+            data_types
+        ).all()
+        return [
+            CacheEntryInfo(
+                row.beach_id,
+                row.data_type,
+                len(json.dumps(row.data)),
+                _as_utc(row.created_at) if row.created_at else None,
+                _as_utc(row.expires_at),
+                row.content_hash
+            )
+            for row in rows
+        ]
+
+    def delete_many(self, db: Session, beach_ids: Optional[List[int]] = None, data_types: Optional[List[str]] = None) -> int:
+        deleted = self._filtered(db.query(CachedData), beach_ids, data_types).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    def clear(self) -> None:
+        # Rows live in the primary database; tests recreate it instead
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU dict, for single-worker deployments and tests"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # (beach_id, data_type) -> (data, expires_at, stored_at, content_hash)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[Dict[str, Any], datetime, datetime, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, beach_id: int, data_type: str) -> Optional[CacheEntry]:
+        key = (beach_id, data_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def set(
+        self,
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: datetime,
+        content_hash: Optional[str] = None
+    ) -> None:
+        key = (beach_id, data_type)
+        with self._lock:
+            self._entries[key] = (data, _as_utc(expires_at), datetime.now(timezone.utc), content_hash)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, db: Session, beach_id: int, data_type: str, content_hash: str, expires_at: datetime) -> bool:
+        key = (beach_id, data_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] != content_hash:
+                return False
+            self._entries[key] = (entry[0], _as_utc(expires_at), entry[2], content_hash)
+            self._entries.move_to_end(key)
+            return True
+
+    def get_content_hash(self, db: Session, beach_id: int, data_type: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((beach_id, data_type))
+        return entry[3] if entry is not None else None
+
+    def delete(self, db: Session, beach_id: int, data_type: str) -> None:
+        with self._lock:
+            self._entries.pop((beach_id, data_type), None)
+
+    def list_entries(
+        self,
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None
+    ) -> List[CacheEntryInfo]:
+        with self._lock:
+            items = list(self._entries.items())
+        return [
+            CacheEntryInfo(beach_id, data_type, len(json.dumps(data)), stored_at, expires_at, content_hash)
+            for (beach_id, data_type), (data, expires_at, stored_at, content_hash) in items
+            if (beach_ids is None or beach_id in beach_ids) and (data_types is None or data_type in data_types)
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache in a dedicated SQLite file shared by every worker on the host
+
+    WAL mode lets readers in other processes proceed while one writes.
+    Connections are per thread, since sqlite3 connections can't be shared.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " beach_id INTEGER NOT NULL,"
+            " data_type TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " stored_at REAL,"
+            " content_hash TEXT,"
+            " PRIMARY KEY (beach_id, data_type))"
+        )
+        # Files created before these columns were added
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+        for column, column_type in (("stored_at", "REAL"), ("content_hash", "TEXT")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE cache_entries ADD COLUMN {column} {column_type}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; each statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, db: Session, beach_id: int, data_type: str) -> Optional[CacheEntry]:
+        row = self._connection().execute(
+            "SELECT data, expires_at FROM cache_entries WHERE beach_id = ? AND data_type = ?",
+            (beach_id, data_type)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), datetime.fromtimestamp(row[1], tz=timezone.utc)
+
+    def get_many(self, db: Session, beach_ids: List[int], data_type: str) -> Dict[int, CacheEntry]:
+        if not beach_ids:
+            return {}
+        placeholders = ",".join("?" * len(beach_ids))
+        rows = self._connection().execute(
+            f"SELECT beach_id, data, expires_at FROM cache_entries WHERE data_type = ? AND beach_id IN ({placeholders})",
+            (data_type, *beach_ids)
+        ).fetchall()
+        return {
+            beach_id: (json.loads(data), datetime.fromtimestamp(expires_at, tz=timezone.utc))
+            for beach_id, data, expires_at in rows
+        }
+
+    def set(
+        self,
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: datetime,
+        content_hash: Optional[str] = None
+    ) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (beach_id, data_type, data, expires_at, stored_at, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (beach_id, data_type, json.dumps(data), _as_utc(expires_at).timestamp(), datetime.now(timezone.utc).timestamp(), content_hash)
+        )
+
+    def touch(self, db: Session, beach_id: int, data_type: str, content_hash: str, expires_at: datetime) -> bool:
+        return self._connection().execute(
+            "UPDATE cache_entries SET expires_at = ? WHERE beach_id = ? AND data_type = ? AND content_hash = ?",
+            (_as_utc(expires_at).timestamp(), beach_id, data_type, content_hash)
+        ).rowcount > 0
+
+    def get_content_hash(self, db: Session, beach_id: int, data_type: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT content_hash FROM cache_entries WHERE beach_id = ? AND data_type = ?",
+            (beach_id, data_type)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def delete(self, db: Session, beach_id: int, data_type: str) -> None:
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE beach_id = ? AND data_type = ?",
+            (beach_id, data_type)
+        )
+
+    def write_many(self, db: Session, writes: List[CacheWrite]) -> None:
+        now = datetime.now(timezone.utc).timestamp()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "DELETE FROM cache_entries WHERE beach_id = ? AND data_type = ?",
+                [(write.beach_id, write.data_type) for write in writes if write.kind == "delete"]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (beach_id, data_type, data, expires_at, stored_at, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (write.beach_id, write.data_type, json.dumps(write.data), _as_utc(write.expires_at).timestamp(), now, write.content_hash)
+                    for write in writes if write.kind == "set"
+                ]
+            )
+            conn.executemany(
+                "UPDATE cache_entries SET expires_at = ? WHERE beach_id = ? AND data_type = ? AND content_hash = ?",
+                [
+                    (_as_utc(write.expires_at).timestamp(), write.beach_id, write.data_type, write.content_hash)
+                    for write in writes if write.kind == "touch"
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _where(self, beach_ids: Optional[List[int]], data_types: Optional[List[str]]) -> Tuple[str, list]:
+        clauses, parameters = [], []
+        if beach_ids is not None:
+            clauses.append(f"beach_id IN ({','.join('?' * len(beach_ids)) or 'NULL'})")
+            parameters.extend(beach_ids)
+        if data_types is not None:
+            clauses.append(f"data_type IN ({','.join('?' * len(data_types)) or 'NULL'})")
+            parameters.extend(data_types)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def list_entries(
+        self,
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None
+    ) -> List[CacheEntryInfo]:
+        where, parameters = self._where(beach_ids, data_types)
+        rows = self._connection().execute(
+            f"SELECT beach_id, data_type, length(data), stored_at, expires_at, content_hash FROM cache_entries{where}",
+            parameters
+        ).fetchall()
+        return [
+            CacheEntryInfo(
+                beach_id,
+                data_type,
+                size,
+                datetime.fromtimestamp(stored_at, tz=timezone.utc) if stored_at is not None else None,
+                datetime.fromtimestamp(expires_at, tz=timezone.utc),
+                content_hash
+            )
+            for beach_id, data_type, size, stored_at, expires_at, content_hash in rows
+        ]
+
+    def delete_many(self, db: Session, beach_ids: Optional[List[int]] = None, data_types: Optional[List[str]] = None) -> int:
+        where, parameters = self._where(beach_ids, data_types)
+        return self._connection().execute(f"DELETE FROM cache_entries{where}", parameters).rowcount
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache_entries")
+
+class WriteBehindCacheBackend(CacheBackend):
+    """Queue writes in memory and apply them to another backend in batches
+
+    Writes to the same entry coalesce, so only the latest reaches the
+    backend. A batch is written in one transaction once max_batch entries
+    are queued (by the writer, which waits for it) or flush_interval seconds
+    after the first was queued (by a background thread). Reads in this
+    process see queued entries; other workers see them once flushed. Writes
+    still queued when the process dies are lost, which for a cache only
+    means refetching.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        max_batch: int = 500,
+        flush_interval: float = 0.2,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory  # Sessions for flushes, which run outside any request
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Tuple[int, str], CacheWrite] = {}
+        self._flushing: Dict[Tuple[int, str], CacheWrite] = {}  # Being written; still visible to readers
+        self._first_queued_at: Optional[float] = None
+        self._generation = 0  # Bumped by clear() so an in-flight batch is dropped
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _queued(self, key: Tuple[int, str]) -> Optional[CacheWrite]:
+        # Caller holds the condition
+        return self._pending.get(key) or self._flushing.get(key)
+
+    def _enqueue(self, write: CacheWrite) -> None:
+        with self._condition:
+            self._pending[(write.beach_id, write.data_type)] = write
+            if self._first_queued_at is None:
+                self._first_queued_at = time.monotonic()
+            CACHE_WRITE_BEHIND_PENDING.set(len(self._pending))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="cache-write-behind", daemon=True)
+                self._flusher.start()
+            self._condition.notify()
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._flush("size")
+
+    @staticmethod
+    def _entry(write: CacheWrite, stored: Optional[CacheEntry]) -> Optional[CacheEntry]:
+        """What a reader sees for an entry with a queued write"""
+        if write.kind == "set":
+            return write.data, _as_utc(write.expires_at)
+        if write.kind == "touch" and stored is not None:
+            return stored[0], _as_utc(write.expires_at)
+        return None
+
+    def get(self, db: Session, beach_id: int, data_type: str) -> Optional[CacheEntry]:
+        with self._condition:
+            write = self._queued((beach_id, data_type))
+        if write is None:
+            return self.backend.get(db, beach_id, data_type)
+        stored = self.backend.get(db, beach_id, data_type) if write.kind == "touch" else None
+        return self._entry(write, stored)
+
+    def get_many(self, db: Session, beach_ids: List[int], data_type: str) -> Dict[int, CacheEntry]:
+        with self._condition:
+            queued = {beach_id: self._queued((beach_id, data_type)) for beach_id in beach_ids}
+        stored = self.backend.get_many(db, [
+            beach_id for beach_id, write in queued.items() if write is None or write.kind == "touch"
+        ], data_type)
+        entries = {}
+        for beach_id, write in queued.items():
+            entry = stored.get(beach_id) if write is None else self._entry(write, stored.get(beach_id))
+            if entry is not None:
+                entries[beach_id] = entry
+        return entries
+
+    def set(
+        self,
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: datetime,
+        content_hash: Optional[str] = None
+    ) -> None:
+        self._enqueue(CacheWrite("set", beach_id, data_type, data, expires_at, content_hash))
+
+    def touch(self, db: Session, beach_id: int, data_type: str, content_hash: str, expires_at: datetime) -> bool:
+        with self._condition:
+            write = self._queued((beach_id, data_type))
+        if write is None:
+            # A read instead of a committed UPDATE; the new expiry is queued
+            if self.backend.get_content_hash(db, beach_id, data_type) != content_hash:
+                return False
+            write = CacheWrite("touch", beach_id, data_type, content_hash=content_hash)
+        elif write.kind == "delete" or write.content_hash != content_hash:
+            return False
+        self._enqueue(write._replace(expires_at=expires_at))
+        return True
+
+    def get_content_hash(self, db: Session, beach_id: int, data_type: str) -> Optional[str]:
+        with self._condition:
+            write = self._queued((beach_id, data_type))
+        if write is None:
+            return self.backend.get_content_hash(db, beach_id, data_type)
+        return write.content_hash if write.kind != "delete" else None
+
+    def delete(self, db: Session, beach_id: int, data_type: str) -> None:
+        self._enqueue(CacheWrite("delete", beach_id, data_type))
+
+    def list_entries(
+        self,
+        db: Session,
+        beach_ids: Optional[List[int]] = None,
+        data_types: Optional[List[str]] = None
+    ) -> List[CacheEntryInfo]:
+        entries = {(entry.beach_id, entry.data_type): entry for entry in self.backend.list_entries(db, beach_ids, data_types)}
+        with self._condition:
+            queued = {**self._flushing, **self._pending}
+        for key, write in queued.items():
+            if (beach_ids is not None and write.beach_id not in beach_ids) or (data_types is not None and write.data_type not in data_types):
+                continue
+            if write.kind == "set":
+                entries[key] = CacheEntryInfo(
+                    write.beach_id, write.data_type, len(json.dumps(write.data)), None, _as_utc(write.expires_at), write.content_hash
+                )
+            elif write.kind == "delete":
+                entries.pop(key, None)
+            elif key in entries:
+                entries[key] = entries[key]._replace(expires_at=_as_utc(write.expires_at))
+        return list(entries.values())
+
+    def delete_many(self, db: Session, beach_ids: Optional[List[int]] = None, data_types: Optional[List[str]] = None) -> int:
+        # Land queued writes first so none of them outlives the delete
+        self.flush()
+        return self.backend.delete_many(db, beach_ids, data_types)
+
+    def flush(self) -> None:
+        self._flush("explicit")
+
+    def _flush(self, trigger: str) -> None:
+        with self._flush_lock:
+            with self._condition:
+                if not self._pending:
+                    return
+                self._flushing, self._pending = self._pending, {}
+                self._first_queued_at = None
+                CACHE_WRITE_BEHIND_PENDING.set(0)
+                writes = list(self._flushing.values())
+                generation = self._generation
+            try:
+                with self._condition:
+                    if generation != self._generation:
+                        return
+                with self.session_factory() as db:
+                    self.backend.write_many(db, writes)
+                CACHE_WRITE_BEHIND_FLUSHES.inc(trigger=trigger, result="ok")
+            except Exception as e:
+                # Dropping them only costs refetches
+                CACHE_WRITE_BEHIND_FLUSHES.inc(trigger=trigger, result="error")
+                print(f"Error flushing {len(writes)} queued cache writes: {e}")
+            finally:
+                with self._condition:
+                    if generation == self._generation:
+                        self._flushing = {}
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._first_queued_at is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._first_queued_at + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+            self._flush("time")
+
+    def close(self) -> None:
+        """Flush and stop the background thread"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+
+    def clear(self) -> None:
+        with self._condition:
+            self._generation += 1
+            self._pending.clear()
+            self._flushing = {}
+            self._first_queued_at = None
+            CACHE_WRITE_BEHIND_PENDING.set(0)
+        # Wait out a batch already being written so it is cleared after it lands
+        with self._flush_lock:
+            self.backend.clear()
+
+_backend: Optional[CacheBackend] = None
+
+def get_cache_backend() -> CacheBackend:
+    """Return the process-wide backend selected by settings.CACHE_BACKEND"""
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "sql":
+            _backend = SQLCacheBackend()
+        elif settings.CACHE_BACKEND == "memory":
+            _backend = MemoryCacheBackend(settings.CACHE_MEMORY_MAX_ENTRIES)
+        elif settings.CACHE_BACKEND == "sqlite":
+            _backend = SQLiteCacheBackend(settings.CACHE_SQLITE_PATH)
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND '{settings.CACHE_BACKEND}'")
+        if settings.CACHE_WRITE_BEHIND:
+            _backend = WriteBehindCacheBackend(
+                _backend,
+                max_batch=settings.CACHE_WRITE_BEHIND_MAX_BATCH,
+                flush_interval=settings.CACHE_WRITE_BEHIND_FLUSH_MS / 1000
+            )
+    return _backend
+
+def set_cache_backend(backend: Optional[CacheBackend]) -> None:
+    """Swap the process-wide backend (None re-reads Settings on next use)"""
+    global _backend
+    _backend = backend
@@ -1,69 +1,225 @@
 from sqlalchemy.orm import Session
-from app.models.cached_data import CachedData
+from app.db.database import read_from_replica, recent_writes
 from app.models.beach import Beach
+from app.services.cache_backends import get_cache_backend
+from app.services.archive_service import get_archive
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+from app.core.config import settings
+from app.core.metrics import CACHE_LOOKUPS, CACHE_WRITES
+from app.core.timing import span
+from collections import OrderedDict
+import hashlib
 import json
+import threading
+
+class CacheKeyStats:
+    """Hit, stale and miss counts per beach and data type, for the admin API
+    
+    Kept per worker and bounded: the least recently looked-up keys are
+    dropped first. Too many labels for the Prometheus registry.
+    """
+    
+    RESULTS = ("hit", "stale", "miss")
+    
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._counts: "OrderedDict[Tuple[int, str], List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def record(self, beach_id: int, data_type: str, result: str) -> None:
+        key = (beach_id, data_type)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0, 0, 0]
+            else:
+                self._counts.move_to_end(key)
+            counts[self.RESULTS.index(result)] += 1
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+    
+    def snapshot(self) -> Dict[Tuple[int, str], Dict[str, int]]:
+        """(beach_id, data_type) -> {'hit', 'stale', 'miss'} counts"""
+        with self._lock:
+            items = list(self._counts.items())
+        return {key: dict(zip(self.RESULTS, counts)) for key, counts in items}
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+cache_key_stats = CacheKeyStats(settings.CACHE_STATS_MAX_KEYS)
+
+def content_hash(data: Any) -> str:
+    """SHA-256 of a payload's canonical JSON, so equal payloads hash equal whatever their key order"""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
 
 class CacheService:
     """Service for handling data caching with TTL"""
     
     CACHE_DURATION_HOURS = 12  # 12 hours cache duration
     
+    # Entries derived from other entries, dropped when one of their sources is stored
+    DERIVED_DATA_TYPES = {
+        "wind_data": ("forecast",),
+        "wave_data": ("forecast",),
+    }
+    
     @staticmethod
     def get_cached_data(db: Session, beach_id: int, data_type: str) -> Optional[Dict[str, Any]]:
         """Get cached data if it exists and is not expired"""
-        cached_record = db.query(CachedData).filter(
-            CachedData.beach_id == beach_id,
-            CachedData.data_type == data_type
-        ).first()
+        with span(f"cache_{data_type}"), read_from_replica(db, recent_write_key=(beach_id, data_type)):
+            entry = get_cache_backend().get(db, beach_id, data_type)
+        return CacheService._fresh_entry(entry, beach_id, data_type)
+    
+    @staticmethod
+    def get_cached_data_many(db: Session, beach_ids: List[int], data_type: str) -> Dict[int, Dict[str, Any]]:
+        """Get unexpired cached data for several beaches in one lookup
         
+        Returns:
+            dict: beach_id -> cached data, for hits only
+        """
+        with span(f"cache_{data_type}"):
+            entries = get_cache_backend().get_many(db, beach_ids, data_type)
+        
+        results = {}
+        for beach_id in beach_ids:
+            cached = CacheService._fresh_entry(entries.get(beach_id), beach_id, data_type)
+            if cached:
+                results[beach_id] = cached
+        return results
+    
+    @staticmethod
+    def get_stale_data(db: Session, beach_id: int, data_type: str) -> Optional[Dict[str, Any]]:
+        """Get cached data even if expired, for when it can't be refreshed (not counted as a lookup)"""
+        entry = get_cache_backend().get(db, beach_id, data_type)
+        if not entry:
+            return None
+        data, expires_at = entry
+        return {
+            'data': data,
+            'cached': True,
+            'expires_at': expires_at
+        }
+    
+    @staticmethod
+    def _fresh_entry(entry: Optional[Tuple[Any, datetime]], beach_id: int, data_type: str) -> Optional[Dict[str, Any]]:
+        """Turn a backend entry into cached data, or None if missing or expired"""
         # Use timezone-aware datetime for comparison
         current_time = datetime.now(timezone.utc)
         
-        if cached_record:
-            expires_at = cached_record.expires_at
-            # Patch: If expires_at is naive, make it UTC-aware
-            if expires_at.tzinfo is None or expires_at.tzinfo.utcoffset(expires_at) is None:
-                expires_at = expires_at.replace(tzinfo=timezone.utc)
-            if expires_at > current_time:
-                return {
-                    'data': cached_record.data,
-                    'cached': True,
-                    'expires_at': expires_at
-                }
+        if entry:
+            data, expires_at = entry
+            result = "hit" if expires_at > current_time else "stale"
+        else:
+            result = "miss"
+        CACHE_LOOKUPS.inc(data_type=data_type, result=result)
+        cache_key_stats.record(beach_id, data_type, result)
         
+        if result == "hit":
+            return {
+                'data': data,
+                'cached': True,
+                'expires_at': expires_at
+            }
         return None
     
     @staticmethod
-    def store_cached_data(db: Session, beach_id: int, data_type: str, data: Dict[str, Any]) -> None:
-        """Store new data in cache, replacing any existing data"""
-        # Delete existing cached data for this beach and data type
-        db.query(CachedData).filter(
-            CachedData.beach_id == beach_id,
-            CachedData.data_type == data_type
-        ).delete()
+    def store_cached_data(
+        db: Session,
+        beach_id: int,
+        data_type: str,
+        data: Dict[str, Any],
+        expires_at: Optional[datetime] = None
+    ) -> bool:
+        """Store new data in cache, replacing any existing data
         
-        # Calculate expiration time with timezone-aware datetime
-        expires_at = datetime.now(timezone.utc) + timedelta(hours=CacheService.CACHE_DURATION_HOURS)
+        Entries expire after CACHE_DURATION_HOURS, or at `expires_at` if that is sooner.
+        If the cache already holds the same data, only its expiry is moved:
+        the payload isn't rewritten and entries derived from it are kept.
         
-        # Create new cached data record
-        cached_data = CachedData(
-            beach_id=beach_id,
-            data_type=data_type,
-            data=data,
-            expires_at=expires_at
-        )
+        Returns:
+            bool: True if the data changed, False if it was already cached
+        """
+        with span("cache_write"):
+            # Calculate expiration time with timezone-aware datetime
+            default_expiry = datetime.now(timezone.utc) + timedelta(hours=CacheService.CACHE_DURATION_HOURS)
+            expires_at = min(expires_at, default_expiry) if expires_at else default_expiry
+            backend = get_cache_backend()
+            digest = content_hash(data)
+            changed = not backend.touch(db, beach_id, data_type, digest, expires_at)
+            if changed:
+                backend.set(db, beach_id, data_type, data, expires_at, content_hash=digest)
+                for derived_type in CacheService.DERIVED_DATA_TYPES.get(data_type, ()):
+                    backend.delete(db, beach_id, derived_type)
+                    recent_writes.add((beach_id, derived_type))
+            # Replicas may not have this yet; read it back from the primary for a while
+            recent_writes.add((beach_id, data_type))
+        CACHE_WRITES.inc(data_type=data_type, result="stored" if changed else "unchanged")
         
-        db.add(cached_data)
-        db.commit()
+        archive = get_archive()
+        # Identical data is already archived from the fetch that stored it
+        if changed and archive is not None:
+            with span("archive_write"):
+                try:
+                    archive.append(beach_id, data_type, data)
+                except Exception as e:
+                    # History is best effort; never fail the request over it
+                    print(f"Error archiving {data_type} for beach {beach_id}: {e}")
+        return changed
     
     @staticmethod
     def get_beach_by_name(db: Session, beach_name: str) -> Optional[Beach]:
         """Get beach by name"""
-        return db.query(Beach).filter(Beach.beach_name == beach_name).first()
+        with span("db_beach"), read_from_replica(db):
+            return db.query(Beach).filter(Beach.beach_name == beach_name).first()
     
     @staticmethod
     def get_all_beaches(db: Session) -> list[Beach]:
         """Get all beaches"""
-        return db.query(Beach).all() 
\ No newline at end of file
+        return db.query(Beach).all()
+    
+    @staticmethod
+    def list_beaches(
+        db: Session,
+        state: Optional[str] = None,
+        town: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: int = 100,
+        summary: bool = False
+    ) -> Tuple[list, Optional[str]]:
+        """
+        Get one page of beaches ordered by name (keyset pagination)
+        
+        Args:
+            state: Only beaches in this state
+            town: Only beaches in this town
+            after: Return beaches named after this one (the previous page's last name)
+            limit: Page size
+            summary: Load only the summary columns instead of full rows
+            
+        Returns:
+            tuple: (beaches, name to pass as `after` for the next page or None)
+        """
+        if summary:
+            query = db.query(Beach.beach_name, Beach.town, Beach.lat, Beach.long)
+        else:
+            query = db.query(Beach)
+        
+        if state:
+            query = query.filter(Beach.state == state)
+        if town:
+            query = query.filter(Beach.town == town)
+        if after:
+            query = query.filter(Beach.beach_name > after)
+        
+        # The catalog changes rarely, so replica lag is harmless here
+        with span("db_beaches"), read_from_replica(db):
+            # Fetch one extra row to learn whether another page exists
+            rows = query.order_by(Beach.beach_name).limit(limit + 1).all()
+        
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, rows[-1].beach_name
+        return rows, None
@@ -0,0 +1,103 @@
+from sqlalchemy import event, func, insert, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, attributes
+from app.models.beach import Beach
+from app.models.beach_change import BeachChange
+from typing import Iterable, List, Tuple
+
+class CatalogService:
+    """Service for catalog versioning and delta sync"""
+    
+    @staticmethod
+    def get_catalog_version(db: Session) -> int:
+        """Current catalog version (0 for an empty change log)"""
+        return db.query(func.max(BeachChange.id)).scalar() or 0
+    
+    @staticmethod
+    def record_changes(db: Session, beach_names: Iterable[str], change_type: str) -> None:
+        """Append change log entries; committed with the caller's transaction
+        
+        Needed for bulk statements, which bypass the ORM events below.
+        """
+        rows = [{"beach_name": name, "change_type": change_type} for name in beach_names]
+        if rows:
+            lock_change_log(db.connection())
+            db.execute(insert(BeachChange), rows)
+    
+    @staticmethod
+    def get_changes_since(db: Session, since: int) -> Tuple[int, List[Beach], List[str]]:
+        """
+        Get what changed in the catalog after a client's version
+        
+        Args:
+            since: Catalog version the client already has (0 for none)
+            
+        Returns:
+            tuple: (current version, added or changed beaches, names of removed beaches)
+        """
+        changes = db.query(BeachChange.id, BeachChange.beach_name, BeachChange.change_type).filter(
+            BeachChange.id > since
+        ).order_by(BeachChange.id).all()
+        
+        if not changes:
+            return max(since, CatalogService.get_catalog_version(db)), [], []
+        
+        # Only the latest change per beach matters
+        latest = {}
+        for change in changes:
+            latest[change.beach_name] = change.change_type
+        
+        changed_names = [name for name, change_type in latest.items() if change_type == "upsert"]
+        upserts = db.query(Beach).filter(Beach.beach_name.in_(changed_names)).order_by(Beach.beach_name).all() if changed_names else []
+        
+        # A beach deleted and re-added, or upserted then deleted, ends up in exactly one list
+        present = {beach.beach_name for beach in upserts}
+        deletes = sorted(name for name in latest if name not in present)
+        
+        return changes[-1].id, upserts, deletes
+    
+    @staticmethod
+    def backfill_change_log(db: Session) -> int:
+        """Log every existing beach once if the change log is empty (pre-versioning databases)"""
+        if db.query(BeachChange.id).first() is not None:
+            return 0
+        names = [name for (name,) in db.query(Beach.beach_name).order_by(Beach.beach_name)]
+        CatalogService.record_changes(db, names, "upsert")
+        db.commit()
+        return len(names)
+
+def lock_change_log(connection: Connection) -> None:
+    """Serialize change log writers until their transaction ends
+    
+    Ids are handed out on insert but become visible on commit. Without this,
+    a writer holding id N could commit after a client synced past N, and
+    that client would never see change N. Under the lock, ids commit in
+    order. SQLite already allows only one writer at a time.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('swellseeker_beach_changes'))"))
+
+# Keep the change log in step with ORM-level beach changes
+@event.listens_for(Beach, "after_insert")
+def _log_beach_insert(mapper, connection, target):
+    lock_change_log(connection)
+    connection.execute(insert(BeachChange).values(beach_name=target.beach_name, change_type="upsert"))
+
+@event.listens_for(Beach, "after_update")
+def _log_beach_update(mapper, connection, target):
+    changed = [
+        column.key for column in mapper.column_attrs
+        if attributes.get_history(target, column.key).has_changes()
+    ]
+    if not changed:
+        return
+    lock_change_log(connection)
+    # Renamed: clients must drop the old name
+    for old_name in attributes.get_history(target, "beach_name").deleted:
+        connection.execute(insert(BeachChange).values(beach_name=old_name, change_type="delete"))
+    connection.execute(insert(BeachChange).values(beach_name=target.beach_name, change_type="upsert"))
+
+@event.listens_for(Beach, "after_delete")
+def _log_beach_delete(mapper, connection, target):
+    lock_change_log(connection)
+    connection.execute(insert(BeachChange).values(beach_name=target.beach_name, change_type="delete"))
@@ -0,0 +1,137 @@
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.models.beach import Beach
+from app.schemas.weather import SurfDataResponse, WindData, WaveData, TideData, TemperatureData
+from app.services.cache_service import CacheService
+from app.services.weather_service import WeatherService
+from app.services.grading_service import GradingService
+from app.services.tide_service import TideService
+
+# data_type -> (response field, schema, upstream fetch)
+DATA_TYPES: Dict[str, tuple] = {
+    "wind_data": ("wind", WindData, lambda beach: WeatherService.get_wind_data(beach.lat, beach.long)),
+    "wave_data": ("waves", WaveData, lambda beach: WeatherService.get_wave_data(beach.lat, beach.long)),
+    # Fetches weeks of predictions for the beach's station (see TideService)
+    "tide_data": ("tides", TideData, lambda beach: WeatherService.get_tide_data(beach.station_id, begin_date=TideService.today(), days=settings.TIDE_PREFETCH_DAYS)),
+    "temp_data": ("temperature", TemperatureData, lambda beach: WeatherService.get_temperature_data(beach.station_id)),
+}
+
+class ExportService:
+    """Service for exporting conditions for many beaches at once"""
+
+    @staticmethod
+    def iter_conditions(
+        db: Session,
+        state: Optional[str] = None,
+        town: Optional[str] = None,
+        batch_size: int = 100,
+        concurrency: int = 8
+    ) -> Iterator[SurfDataResponse]:
+        """
+        Yield surf data for every matching beach, one beach at a time
+
+        Beaches are read a batch at a time, cache lookups are done per batch
+        and cache misses are fetched concurrently. Beaches that are fully
+        cached come out first; the rest follow as their fetches finish.
+        Only one batch is held in memory.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            after = None
+            while True:
+                beaches, after = CacheService.list_beaches(db, state=state, town=town, after=after, limit=batch_size)
+                yield from ExportService._export_batch(db, beaches, pool)
+                if after is None:
+                    return
+
+    @staticmethod
+    def _export_batch(db: Session, beaches: List[Beach], pool: ThreadPoolExecutor) -> Iterator[SurfDataResponse]:
+        beach_ids = [beach.id for beach in beaches]
+        cached = {data_type: CacheService.get_cached_data_many(db, beach_ids, data_type) for data_type in DATA_TYPES}
+
+        results: Dict[int, Dict[str, Any]] = {beach.id: {} for beach in beaches}
+        pending: Dict[int, int] = {}
+        futures = {}
+        tide_misses: Dict[str, List[Beach]] = {}
+        for beach in beaches:
+            for data_type, (_, _, fetch) in DATA_TYPES.items():
+                hit = cached[data_type].get(beach.id)
+                if hit:
+                    results[beach.id][data_type] = (hit["data"], True)
+                    continue
+                pending[beach.id] = pending.get(beach.id, 0) + 1
+                if data_type == "tide_data":
+                    tide_misses.setdefault(beach.station_id, []).append(beach)
+                else:
+                    futures[pool.submit(ExportService.fetch_upstream, fetch, beach)] = ([beach], data_type)
+
+        # Tides come from the per-station store; each station missing from it is fetched once
+        today = TideService.today()
+        stored_tides = TideService.get_stored(db, list(tide_misses), today)
+        for station_id, station_beaches in tide_misses.items():
+            if station_id in stored_tides:
+                for beach in station_beaches:
+                    ExportService._cache_tides(db, beach, stored_tides[station_id])
+                    results[beach.id]["tide_data"] = (stored_tides[station_id], True)
+                    pending[beach.id] -= 1
+            else:
+                futures[pool.submit(ExportService.fetch_upstream, DATA_TYPES["tide_data"][2], station_beaches[0])] = (station_beaches, "tide_data")
+
+        for beach in beaches:
+            if not pending.get(beach.id):
+                yield ExportService.build_response(beach, results.pop(beach.id))
+
+        for future in as_completed(futures):
+            waiting, data_type = futures[future]
+            data = future.result()
+            if data is not None and data_type == "tide_data":
+                # The fetch covers several weeks; keep them all and use today's
+                data = TideService.store_predictions(db, waiting[0].station_id, data, today, settings.TIDE_PREFETCH_DAYS)[today]
+            for beach in waiting:
+                if data is not None:
+                    # Sessions aren't thread-safe, so cache writes happen here rather than in the pool
+                    if data_type == "tide_data":
+                        ExportService._cache_tides(db, beach, data)
+                    else:
+                        CacheService.store_cached_data(db, beach.id, data_type, data)
+                    results[beach.id][data_type] = (data, False)
+                pending[beach.id] -= 1
+                if pending[beach.id] == 0:
+                    yield ExportService.build_response(beach, results.pop(beach.id))
+
+    @staticmethod
+    def _cache_tides(db: Session, beach: Beach, tides: List[Dict[str, Any]]) -> None:
+        CacheService.store_cached_data(db, beach.id, "tide_data", tides, expires_at=TideService.end_of_today())
+
+    @staticmethod
+    def fetch_upstream(fetch: Callable[[Beach], Any], beach: Beach) -> Optional[Any]:
+        """Run one DATA_TYPES fetch, returning None on any error (safe to call from a thread)"""
+        try:
+            data = fetch(beach)
+        except Exception as e:
+            print(f"Error fetching data for {beach.beach_name}: {e}")
+            return None
+        if not data or 'error' in data:
+            return None
+        return data
+
+    @staticmethod
+    def build_response(beach: Beach, results: Dict[str, Any]) -> SurfDataResponse:
+        """Assemble surf data and its grade from data_type -> (data, cached) pairs"""
+        response = SurfDataResponse(beach_name=beach.beach_name)
+        for data_type, (data, was_cached) in results.items():
+            field, schema, _ = DATA_TYPES[data_type]
+            setattr(response, field, schema(beach_name=beach.beach_name, data=data, cached=was_cached))
+
+        try:
+            if response.wind and response.waves:
+                response.grade = GradingService.calculate_grade_from_data(
+                    wind_data=response.wind.data,
+                    wave_data=response.waves.data,
+                    beach_orientation=beach.beach_angle
+                )
+        except Exception as e:
+            print(f"Error calculating grade: {e}")
+            response.grade = None
+        return response
@@ -0,0 +1,240 @@
+"""
+Wind and wave forecasts parsed once into aligned columns
+
+Open-Meteo returns wind and marine data as separate `hourly` dicts, each with
+its own `time` strings. A Forecast parses both once into int64 epoch times
+and one float64 array per variable on a single shared time axis, so grading
+and slicing never walk the raw dicts again. Missing values are NaN.
+
+Times are the upstream's local wall-clock times stored as if they were UTC,
+the same convention as the archive.
+
+The cache keeps each beach's Forecast under data_type "forecast" in a compact
+base64 form. CacheService drops it whenever wind or wave data is stored, and
+it is rebuilt from the cached payloads on the next request. A refresh that
+brings back identical data keeps it, so nothing is re-parsed or re-graded.
+"""
+from sqlalchemy.orm import Session
+from app.services.cache_service import CacheService
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from array import array
+from bisect import bisect_left, bisect_right
+from zoneinfo import ZoneInfo
+import base64
+import math
+import sys
+
+FORECAST_DATA_TYPE = "forecast"
+
+# The timezone WeatherService asks Open-Meteo for; forecast times are wall-clock in it
+FORECAST_TIMEZONE = ZoneInfo("America/New_York")
+
+# Cached payloads a Forecast is built from, and the columns taken from each
+SOURCES = {
+    "wind_data": ("wind_speed_10m", "wind_direction_10m"),
+    "wave_data": ("wave_height", "wave_direction", "wave_period"),
+}
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _epoch(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _parse_times(values: Optional[Sequence[str]]) -> Optional[List[int]]:
+    # An unreadable axis is treated like a missing one
+    try:
+        return [_epoch(datetime.fromisoformat(value)) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+def _pack(values: array) -> str:
+    return base64.b64encode(_little_endian(values).tobytes()).decode()
+
+def _unpack(typecode: str, encoded: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(encoded))
+    return _little_endian(values)
+
+class Forecast:
+    """Hourly wind and wave variables on one time axis"""
+
+    def __init__(self, times: array, columns: Dict[str, array], timed: bool = True):
+        self.times = times
+        self.columns = columns
+        # False when upstream sent no time axis; times are then positions
+        self.timed = timed
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def from_upstream(cls, wind_data: Any, wave_data: Any) -> Optional["Forecast"]:
+        """
+        Parse Open-Meteo wind and marine payloads
+
+        If both carry a time axis the series are aligned on the union of the
+        two; otherwise they are aligned by position.
+
+        Returns:
+            Forecast or None if either payload has no hourly data
+        """
+        sources = {}
+        for data_type, data in (("wind_data", wind_data), ("wave_data", wave_data)):
+            if not isinstance(data, dict) or not isinstance(data.get("hourly"), dict):
+                return None
+            hourly = data["hourly"]
+            sources[data_type] = (_parse_times(hourly.get("time")), hourly)
+
+        axes = [times for times, _ in sources.values()]
+        aligned = all(times is not None for times in axes)
+        if aligned:
+            if axes[0] == axes[1]:
+                times = axes[0]
+            else:
+                times = sorted(set(axes[0]) | set(axes[1]))
+            timed = True
+        else:
+            lengths = [
+                len(times) if times is not None else min((len(values) for values in hourly.values() if isinstance(values, list)), default=0)
+                for times, hourly in sources.values()
+            ]
+            length = min(lengths)
+            times = next((times for times in axes if times is not None), range(length))[:length]
+            timed = any(times is not None for times in axes)
+
+        positions = {timestamp: index for index, timestamp in enumerate(times)}
+        columns = {}
+        for data_type, (source_times, hourly) in sources.items():
+            for name in SOURCES[data_type]:
+                raw = hourly.get(name) or []
+                values = array("d", [math.nan]) * len(times)
+                if aligned:
+                    for timestamp, value in zip(source_times, raw):
+                        values[positions[timestamp]] = _to_float(value)
+                else:
+                    for index, value in enumerate(raw[:len(times)]):
+                        values[index] = _to_float(value)
+                columns[name] = values
+        return cls(array("q", times), columns, timed=timed)
+
+    def value(self, name: str, index: int) -> Optional[float]:
+        """One variable at a position, or None if missing"""
+        column = self.columns.get(name)
+        if column is None or not 0 <= index < len(column) or math.isnan(column[index]):
+            return None
+        return column[index]
+
+    def index_at(self, moment: Optional[datetime] = None) -> int:
+        """
+        Position of the forecast slot covering a time (binary search)
+
+        Args:
+            moment: Time to look up; defaults to now. Aware datetimes are
+                converted to forecast-local time, naive ones are taken as
+                already local.
+
+        Returns:
+            int: Index of the last point at or before the time, clamped to
+                the first and last points
+        """
+        if not self.timed or len(self.times) == 0:
+            return 0
+        if moment is None:
+            moment = datetime.now(FORECAST_TIMEZONE)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(FORECAST_TIMEZONE).replace(tzinfo=None)
+        index = bisect_right(self.times, _epoch(moment)) - 1
+        return min(max(index, 0), len(self.times) - 1)
+
+    def time_at(self, index: int) -> Optional[datetime]:
+        """Forecast-local wall-clock time of a position, or None without a time axis"""
+        if not self.timed or not 0 <= index < len(self.times):
+            return None
+        return datetime.fromtimestamp(self.times[index], tz=timezone.utc).replace(tzinfo=None)
+
+    def slice(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "Forecast":
+        """The points with start <= time < end"""
+        low = bisect_left(self.times, _epoch(start)) if start is not None and self.timed else 0
+        high = bisect_left(self.times, _epoch(end)) if end is not None and self.timed else len(self.times)
+        high = max(low, high)
+        return Forecast(
+            self.times[low:high],
+            {name: values[low:high] for name, values in self.columns.items()},
+            timed=self.timed
+        )
+
+    def to_series(self) -> Dict[str, List[Any]]:
+        """Columnar JSON form: 'time' (ISO strings) plus one list per variable"""
+        if self.timed:
+            time_values = [datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M") for t in self.times]
+        else:
+            time_values = [None] * len(self.times)
+        series: Dict[str, List[Any]] = {"time": time_values}
+        for name, values in self.columns.items():
+            series[name] = [None if math.isnan(value) else value for value in values]
+        return series
+
+    def to_cache(self) -> Dict[str, Any]:
+        """Compact form stored in the cache"""
+        return {
+            "timed": self.timed,
+            "times": _pack(self.times),
+            "columns": {name: _pack(values) for name, values in self.columns.items()}
+        }
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "Forecast":
+        return cls(
+            _unpack("q", data["times"]),
+            {name: _unpack("d", encoded) for name, encoded in data["columns"].items()},
+            timed=data.get("timed", True)
+        )
+
+class ForecastService:
+    """Service for building and caching parsed forecasts"""
+
+    @staticmethod
+    def get_forecast(
+        db: Session,
+        beach_id: int,
+        wind_data: Any,
+        wave_data: Any
+    ) -> Optional[Forecast]:
+        """
+        Get a beach's parsed forecast, building and caching it if needed
+
+        The payloads must be the ones currently cached (store fresh ones
+        first). A cached forecast is dropped whenever either payload
+        changes, so one still cached was built from them.
+
+        Args:
+            wind_data: Wind payload the forecast should reflect
+            wave_data: Wave payload the forecast should reflect
+
+        Returns:
+            Forecast or None if the payloads have no hourly data
+        """
+        cached = CacheService.get_cached_data(db, beach_id, FORECAST_DATA_TYPE)
+        if cached:
+            try:
+                return Forecast.from_cache(cached['data'])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error reading cached forecast for beach {beach_id}: {e}")
+
+        forecast = Forecast.from_upstream(wind_data, wave_data)
+        if forecast is not None:
+            CacheService.store_cached_data(db, beach_id, FORECAST_DATA_TYPE, forecast.to_cache())
+        return forecast
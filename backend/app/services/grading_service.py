@@ -1,8 +1,31 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
+from app.core.metrics import GRADING_LATENCY
+from app.core.timing import span
+from app.services.forecast_service import Forecast
+from itertools import repeat
+import time
 
 class GradingService:
     """Service for calculating surf quality grades"""
     
+    # Grading rules, shared by the per-point and column graders
+    MIN_RIDEABLE_HEIGHT = 1  # Feet; anything lower is red
+    OFFSHORE_WIND = (240, 300)  # Wind direction relative to the beach, degrees
+    ONSHORE_WIND = (60, 120)
+    OFFSHORE_EFFECT = 2
+    ONSHORE_EFFECT = -2
+    CROSS_SHORE_EFFECT = -1
+    LIGHT_WIND_KNOTS = 5
+    STRONG_WIND_KNOTS = 15
+    LIGHT_WIND_MULTIPLIER = 1.2
+    STRONG_WIND_MULTIPLIER = 0.5
+    LONG_PERIOD_SECONDS = 10
+    SHORT_PERIOD_SECONDS = 7
+    LONG_PERIOD_BONUS = 2
+    SHORT_PERIOD_BONUS = -2
+    GREEN_SCORE = 4
+    YELLOW_SCORE = 0
+    
     @staticmethod
     def get_wave_quality(
         wind_direction: float,
@@ -24,47 +47,178 @@ class GradingService:
         Returns:
             str: 'red', 'yellow', or 'green' grade
         """
-        score = 0
-        
         # Boolean check for unrideable waves
-        if wave_height < 1:
+        if wave_height < GradingService.MIN_RIDEABLE_HEIGHT:
             return 'red'
         
+        return GradingService.grade_for_score(
+            GradingService.get_wave_score(wind_direction, wind_speed, swell_period, beach_orientation)
+        )
+    
+    @staticmethod
+    def get_wave_score(
+        wind_direction: float,
+        wind_speed: float,
+        swell_period: float,
+        beach_orientation: float
+    ) -> float:
+        """
+        Score rideable conditions; higher is better (see grade_for_score)
+        
+        Args:
+            wind_direction: Wind direction in degrees
+            wind_speed: Wind speed in knots
+            swell_period: Swell period in seconds
+            beach_orientation: Beach angle/orientation in degrees
+            
+        Returns:
+            float: Score from wind and swell period
+        """
+        score = 0
+        
         # Normalize wind direction relative to beach orientation
         adjusted_wind_direction = (wind_direction - beach_orientation + 360) % 360
         
         # Determine wind effect on surf quality
         wind_effect = 0
-        if 240 <= adjusted_wind_direction <= 300:
-            wind_effect = 2  # Offshore wind - beneficial
-        elif 60 <= adjusted_wind_direction <= 120:
-            wind_effect = -2  # Onshore wind - detrimental
+        if GradingService.OFFSHORE_WIND[0] <= adjusted_wind_direction <= GradingService.OFFSHORE_WIND[1]:
+            wind_effect = GradingService.OFFSHORE_EFFECT  # Offshore wind - beneficial
+        elif GradingService.ONSHORE_WIND[0] <= adjusted_wind_direction <= GradingService.ONSHORE_WIND[1]:
+            wind_effect = GradingService.ONSHORE_EFFECT  # Onshore wind - detrimental
         else:
-            wind_effect = -1  # Cross-shore wind - slightly negative
+            wind_effect = GradingService.CROSS_SHORE_EFFECT  # Cross-shore wind - slightly negative
         
         # Adjust wind effect based on wind speed multiplier
         wind_speed_multiplier = 1
-        if wind_speed <= 5:
-            wind_speed_multiplier = 1.2  # Light wind - positive effect
-        elif wind_speed > 15:
-            wind_speed_multiplier = 0.5  # Strong wind - negative effect
+        if wind_speed <= GradingService.LIGHT_WIND_KNOTS:
+            wind_speed_multiplier = GradingService.LIGHT_WIND_MULTIPLIER  # Light wind - positive effect
+        elif wind_speed > GradingService.STRONG_WIND_KNOTS:
+            wind_speed_multiplier = GradingService.STRONG_WIND_MULTIPLIER  # Strong wind - negative effect
         
         score += wind_effect * wind_speed_multiplier
         
         # Swell period impact
-        if swell_period >= 10:
-            score += 2  # Long period - better waves
-        elif swell_period < 7:
-            score -= 2  # Short period - choppier waves
+        if swell_period >= GradingService.LONG_PERIOD_SECONDS:
+            score += GradingService.LONG_PERIOD_BONUS  # Long period - better waves
+        elif swell_period < GradingService.SHORT_PERIOD_SECONDS:
+            score += GradingService.SHORT_PERIOD_BONUS  # Short period - choppier waves
         
+        return score
+    
+    @staticmethod
+    def grade_for_score(score: float) -> str:
+        """Map a wave score to 'red', 'yellow' or 'green'"""
         # Assign final quality grade
-        if score >= 4:
+        if score >= GradingService.GREEN_SCORE:
             return 'green'
-        elif score >= 0:
+        elif score >= GradingService.YELLOW_SCORE:
             return 'yellow'
         else:
             return 'red'
     
+    @staticmethod
+    def grade_forecast(
+        forecast: Forecast,
+        beach_orientation: float
+    ) -> Tuple[List[Optional[str]], List[Optional[float]]]:
+        """
+        Grade every point of a parsed forecast in one pass
+        
+        Args:
+            forecast: Parsed wind and wave forecast
+            beach_orientation: Beach angle in degrees
+            
+        Returns:
+            tuple: (grades, scores) per point; None where an input is missing.
+                Unrideable points are graded red with no score.
+        """
+        with span("grade"):
+            start_time = time.perf_counter()
+            try:
+                return GradingService.grade_columns(
+                    forecast.columns["wind_speed_10m"],
+                    forecast.columns["wind_direction_10m"],
+                    forecast.columns["wave_height"],
+                    forecast.columns["wave_period"],
+                    beach_orientation
+                )
+            finally:
+                GRADING_LATENCY.observe(time.perf_counter() - start_time)
+    
+    @staticmethod
+    def grade_columns(
+        wind_speeds: Sequence[float],
+        wind_directions: Sequence[float],
+        wave_heights: Sequence[float],
+        wave_periods: Sequence[float],
+        beach_orientations: Union[float, Sequence[float]]
+    ) -> Tuple[List[Optional[str]], List[Optional[float]]]:
+        """
+        Grade whole columns of points at once
+        
+        Same rules as get_wave_quality and get_wave_score, but applied in
+        one loop with the thresholds held in locals instead of two method
+        calls per point. Used for forecasts and offline re-grading.
+        
+        Args:
+            wind_speeds: Wind speeds in knots
+            wind_directions: Wind directions in degrees
+            wave_heights: Wave heights in feet
+            wave_periods: Swell periods in seconds
+            beach_orientations: One beach angle for every point, or one per point
+            
+        Returns:
+            tuple: (grades, scores) per point; None where an input is missing
+                (NaN). Unrideable points are graded red with no score.
+        """
+        rules = GradingService
+        min_height = rules.MIN_RIDEABLE_HEIGHT
+        offshore_low, offshore_high = rules.OFFSHORE_WIND
+        onshore_low, onshore_high = rules.ONSHORE_WIND
+        offshore, onshore, cross_shore = rules.OFFSHORE_EFFECT, rules.ONSHORE_EFFECT, rules.CROSS_SHORE_EFFECT
+        light_wind, strong_wind = rules.LIGHT_WIND_KNOTS, rules.STRONG_WIND_KNOTS
+        light_multiplier, strong_multiplier = rules.LIGHT_WIND_MULTIPLIER, rules.STRONG_WIND_MULTIPLIER
+        long_period, short_period = rules.LONG_PERIOD_SECONDS, rules.SHORT_PERIOD_SECONDS
+        long_bonus, short_bonus = rules.LONG_PERIOD_BONUS, rules.SHORT_PERIOD_BONUS
+        green_score, yellow_score = rules.GREEN_SCORE, rules.YELLOW_SCORE
+        if isinstance(beach_orientations, (int, float)):
+            beach_orientations = repeat(beach_orientations)
+        
+        grades: List[Optional[str]] = []
+        scores: List[Optional[float]] = []
+        add_grade, add_score = grades.append, scores.append
+        columns = zip(wind_speeds, wind_directions, wave_heights, wave_periods, beach_orientations)
+        for wind_speed, wind_direction, wave_height, swell_period, orientation in columns:
+            # NaN marks a missing value and is the only value not equal to itself
+            if wind_speed != wind_speed or wind_direction != wind_direction or wave_height != wave_height or swell_period != swell_period:
+                add_grade(None)
+                add_score(None)
+                continue
+            if wave_height < min_height:
+                add_grade('red')
+                add_score(None)
+                continue
+            
+            adjusted_wind_direction = (wind_direction - orientation + 360) % 360
+            if offshore_low <= adjusted_wind_direction <= offshore_high:
+                score = offshore
+            elif onshore_low <= adjusted_wind_direction <= onshore_high:
+                score = onshore
+            else:
+                score = cross_shore
+            if wind_speed <= light_wind:
+                score *= light_multiplier
+            elif wind_speed > strong_wind:
+                score *= strong_multiplier
+            if swell_period >= long_period:
+                score += long_bonus
+            elif swell_period < short_period:
+                score += short_bonus
+            
+            add_grade('green' if score >= green_score else 'yellow' if score >= yellow_score else 'red')
+            add_score(score)
+        return grades, scores
+    
     @staticmethod
     def calculate_grade_from_data(
         wind_data: Dict[str, Any],
@@ -80,29 +234,49 @@ class GradingService:
             beach_orientation: Beach angle in degrees
             
         Returns:
-            str: Grade or None if insufficient data
+            str: Grade for the current hour or None if insufficient data
         """
-        try:
-            # Extract current conditions (first hour of data)
-            if 'hourly' not in wind_data or 'hourly' not in wave_data:
-                return None
-            
-            # Get current wind conditions
-            wind_speed = wind_data['hourly']['wind_speed_10m'][0]
-            wind_direction = wind_data['hourly']['wind_direction_10m'][0]
-            
-            # Get current wave conditions
-            wave_height = wave_data['hourly']['wave_height'][0]
-            swell_period = wave_data['hourly']['wave_period'][0]
+        forecast = Forecast.from_upstream(wind_data, wave_data)
+        if forecast is None:
+            return None
+        return GradingService.calculate_grade_from_forecast(forecast, beach_orientation)
+    
+    @staticmethod
+    def calculate_grade_from_forecast(
+        forecast: Forecast,
+        beach_orientation: float,
+        index: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Calculate grade for one point of a parsed forecast
+        
+        Args:
+            forecast: Parsed wind and wave forecast
+            beach_orientation: Beach angle in degrees
+            index: Position on the forecast's time axis; defaults to the
+                slot covering the current time
             
-            return GradingService.get_wave_quality(
-                wind_direction=wind_direction,
-                wind_speed=wind_speed,
-                swell_period=swell_period,
-                beach_orientation=beach_orientation,
-                wave_height=wave_height
-            )
+        Returns:
+            str: Grade or None if any input is missing at that point
+        """
+        with span("grade"):
+            start_time = time.perf_counter()
+            try:
+                if index is None:
+                    index = forecast.index_at()
+                wind_speed = forecast.value("wind_speed_10m", index)
+                wind_direction = forecast.value("wind_direction_10m", index)
+                wave_height = forecast.value("wave_height", index)
+                swell_period = forecast.value("wave_period", index)
+                if None in (wind_speed, wind_direction, wave_height, swell_period):
+                    return None
             
-        except (KeyError, IndexError, TypeError):
-            # Return None if we can't extract the required data
-            return None 
\ No newline at end of file
+                return GradingService.get_wave_quality(
+                    wind_direction=wind_direction,
+                    wind_speed=wind_speed,
+                    swell_period=swell_period,
+                    beach_orientation=beach_orientation,
+                    wave_height=wave_height
+                )
+            finally:
+                GRADING_LATENCY.observe(time.perf_counter() - start_time)
\ No newline at end of file
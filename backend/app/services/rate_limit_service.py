@@ -0,0 +1,222 @@
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.api_key import APIKey
+from app.models.rate_limit import RateLimitBucket, RateLimitLease
+from dataclasses import dataclass
+from typing import Dict, Optional
+import threading
+import time
+
+@dataclass
+class RateLimits:
+    """Effective limits for one API key (0 disables a limit)"""
+    per_minute: int
+    burst: int
+    max_concurrent: int
+
+    @classmethod
+    def for_key(cls, api_key: APIKey) -> "RateLimits":
+        """Resolve per-key overrides against the defaults in Settings"""
+        def pick(value: Optional[int], default: int) -> int:
+            return default if value is None else value
+
+        per_minute = pick(api_key.rate_limit_per_minute, settings.DEFAULT_RATE_LIMIT_PER_MINUTE)
+        burst = pick(api_key.rate_limit_burst, settings.DEFAULT_RATE_LIMIT_BURST)
+        return cls(
+            per_minute=per_minute,
+            # A bucket smaller than one token would never admit anything
+            burst=max(burst, 1) if per_minute else 0,
+            max_concurrent=pick(api_key.max_concurrent_requests, settings.DEFAULT_MAX_CONCURRENT_REQUESTS)
+        )
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.per_minute / 60.0
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of a rate limit check"""
+    allowed: bool
+    retry_after: float = 0.0  # Seconds until the request could succeed
+    reason: Optional[str] = None  # 'rate' or 'concurrency' when rejected
+    lease_id: Optional[int] = None  # In-flight slot to hand back to release()
+
+class RateLimiter:
+    """Base class for per-key token bucket + in-flight limiters"""
+
+    def acquire(self, db: Session, api_key: APIKey) -> RateLimitDecision:
+        """Take one token and one in-flight slot for the key"""
+        raise NotImplementedError
+
+    def release(self, db: Session, api_key: APIKey, lease_id: Optional[int] = None) -> None:
+        """Give back the in-flight slot taken by a successful acquire()"""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """Forget all limiter state"""
+        raise NotImplementedError
+
+class InMemoryRateLimiter(RateLimiter):
+    """Limiter state held in this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, list] = {}  # key id -> [tokens, updated_at]
+        self._in_flight: Dict[int, int] = {}
+
+    def acquire(self, db: Session, api_key: APIKey) -> RateLimitDecision:
+        limits = RateLimits.for_key(api_key)
+        now = time.monotonic()
+
+        with self._lock:
+            in_flight = self._in_flight.get(api_key.id, 0)
+            if limits.max_concurrent and in_flight >= limits.max_concurrent:
+                return RateLimitDecision(allowed=False, retry_after=1.0, reason="concurrency")
+
+            if limits.per_minute:
+                tokens, updated_at = self._buckets.get(api_key.id, (limits.burst, now))
+                tokens = min(limits.burst, tokens + (now - updated_at) * limits.refill_per_second)
+                if tokens < 1:
+                    self._buckets[api_key.id] = [tokens, now]
+                    return RateLimitDecision(
+                        allowed=False,
+                        retry_after=(1 - tokens) / limits.refill_per_second,
+                        reason="rate"
+                    )
+                self._buckets[api_key.id] = [tokens - 1, now]
+
+            self._in_flight[api_key.id] = in_flight + 1
+
+        return RateLimitDecision(allowed=True)
+
+    def release(self, db: Session, api_key: APIKey, lease_id: Optional[int] = None) -> None:
+        with self._lock:
+            in_flight = self._in_flight.get(api_key.id, 0)
+            if in_flight <= 1:
+                self._in_flight.pop(api_key.id, None)
+            else:
+                self._in_flight[api_key.id] = in_flight - 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._in_flight.clear()
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Limiter state shared by all workers through the rate_limit_buckets table
+
+    Tokens are spent with a single conditional UPDATE, so concurrent workers
+    can't both spend the last one. In-flight slots are lease rows with an
+    expiry: a worker that dies mid-request only holds its slot until the
+    lease runs out. The bucket row lock taken by the UPDATE serializes slot
+    checks for the same key.
+    """
+
+    def __init__(self, lease_seconds: Optional[float] = None):
+        self.lease_seconds = settings.RATE_LIMIT_LEASE_SECONDS if lease_seconds is None else lease_seconds
+
+    def acquire(self, db: Session, api_key: APIKey) -> RateLimitDecision:
+        limits = RateLimits.for_key(api_key)
+        now = time.time()
+        self._ensure_bucket(db, api_key.id, limits, now)
+
+        if limits.per_minute:
+            refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * limits.refill_per_second
+            available = case((refilled > limits.burst, float(limits.burst)), else_=refilled)
+            result = db.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.api_key_id == api_key.id, available >= 1)
+                .values(tokens=available - 1, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                db.rollback()
+                bucket = db.get(RateLimitBucket, api_key.id, populate_existing=True)
+                tokens = min(limits.burst, bucket.tokens + (now - bucket.updated_at) * limits.refill_per_second)
+                return RateLimitDecision(
+                    allowed=False,
+                    retry_after=max(1 - tokens, 0) / limits.refill_per_second,
+                    reason="rate"
+                )
+
+        if not limits.max_concurrent:
+            db.commit()
+            return RateLimitDecision(allowed=True)
+
+        if not limits.per_minute:
+            # Lock the bucket row so slot checks for this key run one at a time
+            db.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.api_key_id == api_key.id)
+                .values(updated_at=RateLimitBucket.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+
+        db.execute(
+            delete(RateLimitLease)
+            .where(RateLimitLease.api_key_id == api_key.id, RateLimitLease.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+        live = db.execute(
+            select(func.count()).select_from(RateLimitLease).where(RateLimitLease.api_key_id == api_key.id)
+        ).scalar()
+        if live >= limits.max_concurrent:
+            # Also gives back the token spent above
+            db.rollback()
+            return RateLimitDecision(allowed=False, retry_after=1.0, reason="concurrency")
+
+        lease = RateLimitLease(api_key_id=api_key.id, expires_at=now + self.lease_seconds)
+        db.add(lease)
+        db.commit()
+        return RateLimitDecision(allowed=True, lease_id=lease.id)
+
+    def release(self, db: Session, api_key: APIKey, lease_id: Optional[int] = None) -> None:
+        if lease_id is None:
+            # No lease on record: free the key's oldest slot
+            lease_id = db.execute(
+                select(RateLimitLease.id)
+                .where(RateLimitLease.api_key_id == api_key.id)
+                .order_by(RateLimitLease.id)
+                .limit(1)
+            ).scalar()
+            if lease_id is None:
+                return
+        db.execute(
+            delete(RateLimitLease)
+            .where(RateLimitLease.id == lease_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def reset(self) -> None:
+        # State lives in the database and goes away with the table
+        pass
+
+    @staticmethod
+    def _ensure_bucket(db: Session, api_key_id: int, limits: RateLimits, now: float) -> None:
+        """Create the key's bucket, full, on its first request"""
+        if db.get(RateLimitBucket, api_key_id) is not None:
+            return
+
+        db.add(RateLimitBucket(api_key_id=api_key_id, tokens=float(limits.burst), updated_at=now))
+        try:
+            db.commit()
+        except Exception:
+            # Another worker created it first
+            db.rollback()
+
+_rate_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter selected by settings.RATE_LIMIT_BACKEND"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        if settings.RATE_LIMIT_BACKEND == "database":
+            _rate_limiter = DatabaseRateLimiter()
+        elif settings.RATE_LIMIT_BACKEND == "memory":
+            _rate_limiter = InMemoryRateLimiter()
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{settings.RATE_LIMIT_BACKEND}'")
+    return _rate_limiter
@@ -0,0 +1,144 @@
+from sqlalchemy.orm import Session
+from app.models.beach import Beach
+from app.schemas.search import SurfWindow
+from app.services.cache_service import CacheService
+from app.services.forecast_service import FORECAST_DATA_TYPE, Forecast
+from app.services.grading_service import GradingService
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from heapq import heappush, heapreplace
+from itertools import count
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+# Grades that can be part of a window, worst first
+WINDOW_GRADES = ("yellow", "green")
+
+def distance_km(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = math.radians(lat2 - lat1) / 2
+    half_dlambda = math.radians(long2 - long1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class SearchService:
+    """Service for finding the best times and places to surf"""
+
+    @staticmethod
+    def find_windows(
+        db: Session,
+        start: datetime,
+        end: datetime,
+        limit: int = 10,
+        min_grade: str = "yellow",
+        state: Optional[str] = None,
+        town: Optional[str] = None,
+        near: Optional[Tuple[float, float]] = None,
+        radius_km: Optional[float] = None,
+        batch_size: int = 200
+    ) -> List[SurfWindow]:
+        """
+        Best surf windows across every matching beach, from cached forecasts only
+
+        Every forecast hour between start and end is graded; consecutive
+        hours graded min_grade or better are merged into one window. Windows
+        with a green hour rank above all-yellow ones, then by the sum of
+        their hours' wave scores. Beaches without cached wind and
+        wave data are skipped rather than fetched.
+
+        Args:
+            start: Beach-local wall-clock start of the search
+            end: Beach-local wall-clock end of the search
+            limit: Number of windows to return
+            min_grade: 'yellow' or 'green'
+            near: (lat, long) to measure distance from
+            radius_km: Only beaches within this distance of `near`
+
+        Returns:
+            list: The best `limit` windows, best first
+        """
+        min_rank = WINDOW_GRADES.index(min_grade)
+        # Min-heap of the best windows so far; the counter breaks ties
+        best: List[Tuple[int, float, int, SurfWindow]] = []
+        sequence = count()
+
+        after = None
+        while True:
+            beaches, after = CacheService.list_beaches(db, state=state, town=town, after=after, limit=batch_size)
+            distances: Dict[int, Optional[float]] = {}
+            for beach in beaches:
+                distance = distance_km(near[0], near[1], beach.lat, beach.long) if near else None
+                if radius_km is None or distance is None or distance <= radius_km:
+                    distances[beach.id] = distance
+
+            nearby = [beach for beach in beaches if beach.id in distances]
+            for beach, forecast in SearchService._cached_forecasts(db, nearby):
+                for window in SearchService._windows(beach, forecast, start, end, min_rank):
+                    window.distance_km = distances[beach.id]
+                    entry = (WINDOW_GRADES.index(window.grade), window.score, next(sequence), window)
+                    if len(best) < limit:
+                        heappush(best, entry)
+                    elif entry > best[0]:
+                        heapreplace(best, entry)
+
+            if after is None:
+                break
+        return [window for _, _, _, window in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _cached_forecasts(db: Session, beaches: List[Beach]) -> Iterator[Tuple[Beach, Forecast]]:
+        """Parsed forecasts for a batch of beaches, from the cache only"""
+        beach_ids = [beach.id for beach in beaches]
+        parsed = CacheService.get_cached_data_many(db, beach_ids, FORECAST_DATA_TYPE)
+
+        # Beaches whose forecast hasn't been parsed since their last refresh
+        unparsed = [beach_id for beach_id in beach_ids if beach_id not in parsed]
+        wind = CacheService.get_cached_data_many(db, unparsed, "wind_data")
+        waves = CacheService.get_cached_data_many(db, unparsed, "wave_data")
+
+        for beach in beaches:
+            forecast = None
+            try:
+                if beach.id in parsed:
+                    forecast = Forecast.from_cache(parsed[beach.id]['data'])
+                elif beach.id in wind and beach.id in waves:
+                    forecast = Forecast.from_upstream(wind[beach.id]['data'], waves[beach.id]['data'])
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error reading forecast for {beach.beach_name}: {e}")
+            if forecast is not None and forecast.timed and len(forecast):
+                yield beach, forecast
+
+    @staticmethod
+    def _windows(beach: Beach, forecast: Forecast, start: datetime, end: datetime, min_rank: int) -> Iterator[SurfWindow]:
+        """Merge a beach's consecutive good hours between start and end into windows"""
+        # Include the slot already under way at start
+        forecast = forecast.slice(forecast.time_at(forecast.index_at(start)), end)
+        if not len(forecast):
+            return
+        grades, scores = GradingService.grade_forecast(forecast, beach.beach_angle)
+
+        def slot_end(index: int) -> datetime:
+            if index + 1 < len(forecast):
+                return forecast.time_at(index + 1)
+            step = forecast.times[index] - forecast.times[index - 1] if index > 0 else 3600
+            return forecast.time_at(index) + timedelta(seconds=step)
+
+        run: List[int] = []
+        for index in range(len(forecast) + 1):
+            grade = grades[index] if index < len(grades) else None
+            if grade in WINDOW_GRADES and WINDOW_GRADES.index(grade) >= min_rank:
+                run.append(index)
+                continue
+            if run and slot_end(run[-1]) > start:
+                yield SurfWindow(
+                    beach_name=beach.beach_name,
+                    town=beach.town,
+                    state=beach.state,
+                    start=max(forecast.time_at(run[0]), start),
+                    end=min(slot_end(run[-1]), end),
+                    grade=max((grades[i] for i in run), key=WINDOW_GRADES.index),
+                    score=sum(scores[i] for i in run)
+                )
+            run = []
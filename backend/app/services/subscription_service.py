@@ -0,0 +1,189 @@
+"""
+Change-driven push of surf data to subscribed clients
+
+Each worker runs one SubscriptionBroker. Clients subscribe to beaches and
+get a message only when a beach's data or grade actually changes. Changes
+are picked up two ways:
+
+- publish() is called whenever this worker assembles fresh surf data; it
+  returns immediately for beaches nobody is subscribed to
+- while anyone is subscribed, a poller re-reads the cache for subscribed
+  beaches, catching refreshes made by other workers
+
+Each change is serialized once and the same bytes are queued for every
+subscriber of that beach.
+"""
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.models.beach import Beach
+from app.schemas.weather import SurfDataResponse
+from app.services.cache_service import CacheService
+from app.services.export_service import DATA_TYPES, ExportService
+from typing import Dict, List, Optional, Sequence, Set
+import asyncio
+import hashlib
+import json
+import threading
+
+def format_event(event: str, data: str) -> bytes:
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+def fingerprint(response: SurfDataResponse) -> str:
+    """Hash of the data and grade, ignoring whether it came from cache"""
+    content = {
+        "grade": response.grade,
+        "data": {field: getattr(response, field).data if getattr(response, field) else None for field, _, _ in DATA_TYPES.values()}
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+class SubscriptionBroker:
+    """Fans out surf data changes to per-connection queues"""
+
+    def __init__(self, queue_size: int = 16, poll_seconds: float = 30.0):
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._bind: Optional[Engine] = None
+
+    def subscribe(
+        self,
+        beach_names: List[str],
+        bind: Optional[Engine] = None,
+        snapshots: Sequence[SurfDataResponse] = ()
+    ) -> asyncio.Queue:
+        """
+        Register a connection; must be called from the event loop
+
+        Args:
+            snapshots: State the connection is sent on its own. Recorded only
+                for beaches nobody else is subscribed to: other subscribers
+                may not have seen it yet, and the next publish or poll must
+                still reach them.
+        """
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            for snapshot in snapshots:
+                self._fingerprints.setdefault(snapshot.beach_name, fingerprint(snapshot))
+            for name in beach_names:
+                self._subscribers.setdefault(name, set()).add(queue)
+        if bind is not None:
+            self._bind = bind
+        if self._bind is not None and self.poll_seconds > 0 and (self._poller is None or self._poller.done()):
+            self._poller = self._loop.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, beach_names: List[str]) -> None:
+        with self._lock:
+            for name in beach_names:
+                queues = self._subscribers.get(name)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[name]
+                        # Only subscribed beaches are tracked
+                        self._fingerprints.pop(name, None)
+
+    def subscriber_count(self, beach_name: str) -> int:
+        return len(self._subscribers.get(beach_name, ()))
+
+    def publish(self, response: SurfDataResponse) -> bool:
+        """
+        Notify a beach's subscribers if its data or grade changed
+
+        A no-op (no hashing) for beaches nobody is subscribed to, so it is
+        cheap to call on every request. Safe to call from any thread.
+
+        Returns:
+            bool: True if subscribers were sent a change
+        """
+        beach_name = response.beach_name
+        if not self._subscribers.get(beach_name) or self._loop is None:
+            return False
+
+        digest = fingerprint(response)
+        with self._lock:
+            if self._fingerprints.get(beach_name) == digest:
+                return False
+            self._fingerprints[beach_name] = digest
+
+        message = format_event("surf_data", response.model_dump_json())
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._deliver(beach_name, message)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, beach_name, message)
+        return True
+
+    def _deliver(self, beach_name: str, message: bytes) -> None:
+        with self._lock:
+            queues = list(self._subscribers.get(beach_name, ()))
+        for queue in queues:
+            if queue.full():
+                # Slow client: drop its oldest message rather than block everyone
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def load_snapshots(self, bind: Engine, beach_names: List[str]) -> List[SurfDataResponse]:
+        """Build surf data for beaches from cache only (never calls upstream)"""
+        with Session(bind=bind) as db:
+            beaches = db.query(Beach).filter(Beach.beach_name.in_(beach_names)).all()
+            beach_ids = [beach.id for beach in beaches]
+            cached = {data_type: CacheService.get_cached_data_many(db, beach_ids, data_type) for data_type in DATA_TYPES}
+
+        snapshots = []
+        for beach in beaches:
+            results = {
+                data_type: (hits[beach.id]["data"], True)
+                for data_type, hits in cached.items() if beach.id in hits
+            }
+            if results:
+                snapshots.append(ExportService.build_response(beach, results))
+        return snapshots
+
+    async def _poll(self) -> None:
+        """Pick up cache refreshes made by other workers, while anyone is subscribed"""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            with self._lock:
+                beach_names = list(self._subscribers)
+            if not beach_names:
+                return
+            try:
+                snapshots = await run_in_threadpool(self.load_snapshots, self._bind, beach_names)
+            except Exception as e:
+                print(f"Error polling subscribed beaches: {e}")
+                continue
+            for snapshot in snapshots:
+                self.publish(snapshot)
+
+    def reset(self) -> None:
+        """Forget all subscribers and fingerprints"""
+        if self._poller is not None:
+            self._poller.cancel()
+        self._poller = None
+        with self._lock:
+            self._subscribers.clear()
+            self._fingerprints.clear()
+
+_broker: Optional[SubscriptionBroker] = None
+
+def get_broker() -> SubscriptionBroker:
+    """Return the process-wide subscription broker"""
+    global _broker
+    if _broker is None:
+        _broker = SubscriptionBroker(
+            queue_size=settings.SUBSCRIPTION_QUEUE_SIZE,
+            poll_seconds=settings.SUBSCRIPTION_POLL_SECONDS
+        )
+    return _broker
@@ -0,0 +1,239 @@
+"""
+Continuous tide curve from cached high/low predictions
+
+NOAA hi/lo predictions give only the turning points (about four a day).
+Between two turning points the tide follows half a cosine wave closely
+enough for charts:
+
+    h(t) = h1 + (h2 - h1) * (1 - cos(pi * (t - t1) / (t2 - t1))) / 2
+
+so heights at any time are reconstructed here instead of fetching 6-minute
+predictions. Half a cycle is extrapolated before the first and after the
+last turning point, mirroring the neighbouring interval; times further out
+have no height.
+
+Times are NOAA local standard time (LST) wall-clock, kept as-is.
+
+Predictions themselves are fixed far in advance, so TideService fetches
+TIDE_PREFETCH_DAYS days per station in one NOAA call and stores them per
+station and day in the tide_predictions table.
+"""
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.tide_prediction import TidePrediction
+from app.services.weather_service import WeatherService
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from array import array
+from bisect import bisect_right
+import math
+
+def _epoch(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _wall_clock(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+class TideCurve:
+    """Cosine-interpolated tide heights between hi/lo turning points"""
+
+    def __init__(self, times: array, heights: array):
+        self.times = times
+        self.heights = heights
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def from_predictions(cls, predictions: Any) -> Optional["TideCurve"]:
+        """
+        Build a curve from cached tide data ({'time', 'height', 'type'} dicts)
+
+        Returns:
+            TideCurve or None if there are fewer than two usable turning points
+        """
+        if not isinstance(predictions, list):
+            return None
+        points = []
+        for prediction in predictions:
+            try:
+                points.append((_epoch(datetime.fromisoformat(prediction["time"])), float(prediction["height"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+        points.sort()
+        # Duplicate times would make a zero-length interval
+        points = [point for index, point in enumerate(points) if index == 0 or point[0] != points[index - 1][0]]
+        if len(points) < 2:
+            return None
+
+        # Mirror the first and last intervals to cover half a cycle either side
+        first, second = points[0], points[1]
+        last, before_last = points[-1], points[-2]
+        points.insert(0, (2 * first[0] - second[0], second[1]))
+        points.append((2 * last[0] - before_last[0], before_last[1]))
+        return cls(array("q", [t for t, _ in points]), array("d", [h for _, h in points]))
+
+    @property
+    def start(self) -> datetime:
+        return _wall_clock(self.times[0])
+
+    @property
+    def end(self) -> datetime:
+        return _wall_clock(self.times[-1])
+
+    def heights_at(self, moments: Sequence[datetime]) -> List[Optional[float]]:
+        """Interpolated heights (feet) at wall-clock times; None outside the curve"""
+        times, heights = self.times, self.heights
+        last = len(times) - 1
+        results: List[Optional[float]] = []
+        index = 0
+        previous = None
+        for moment in moments:
+            t = _epoch(moment)
+            # Sorted input walks the intervals forward; anything else re-searches
+            if previous is None or t < previous:
+                index = max(0, bisect_right(times, t) - 1)
+            while index < last and times[index + 1] <= t:
+                index += 1
+            previous = t
+            if t < times[0] or t > times[last]:
+                results.append(None)
+            elif index == last:
+                results.append(heights[last])
+            else:
+                t1, t2 = times[index], times[index + 1]
+                h1, h2 = heights[index], heights[index + 1]
+                results.append(round(h1 + (h2 - h1) * (1 - math.cos(math.pi * (t - t1) / (t2 - t1))) / 2, 3))
+        return results
+
+    @staticmethod
+    def sample(start: datetime, end: datetime, step: timedelta) -> List[datetime]:
+        """Evenly spaced times from start up to and including end"""
+        moments = []
+        moment = start
+        while moment <= end:
+            moments.append(moment)
+            moment += step
+        return moments
+
+class TideService:
+    """Service for tide predictions stored per station and day"""
+
+    @staticmethod
+    def station_timezone() -> timezone:
+        """The stations' local standard time, which NOAA 'lst' times are in"""
+        return timezone(timedelta(hours=settings.TIDE_STATION_UTC_OFFSET_HOURS))
+
+    @staticmethod
+    def today() -> date:
+        return datetime.now(TideService.station_timezone()).date()
+
+    @staticmethod
+    def end_of_today() -> datetime:
+        """When today's tides stop being today's (aware, for cache expiry)"""
+        tomorrow = TideService.today() + timedelta(days=1)
+        return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=TideService.station_timezone())
+
+    @staticmethod
+    def get_tides(db: Session, station_id: str, day: Optional[date] = None) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """
+        One day's hi/lo predictions for a station (today by default)
+
+        Returns:
+            tuple: (predictions or None if they couldn't be fetched,
+                whether they were already stored)
+        """
+        day = day or TideService.today()
+        row = db.get(TidePrediction, (station_id, day))
+        if row is not None:
+            return row.predictions, True
+        days, _ = TideService.get_days(db, station_id, day, day)
+        return (days[day] if days is not None else None), False
+
+    @staticmethod
+    def get_stored(db: Session, station_ids: List[str], day: date) -> Dict[str, List[Dict[str, Any]]]:
+        """One day's stored predictions for several stations in one query (no fetching)"""
+        if not station_ids:
+            return {}
+        rows = db.query(TidePrediction.station_id, TidePrediction.predictions).filter(
+            TidePrediction.station_id.in_(station_ids),
+            TidePrediction.day == day
+        ).all()
+        return {row.station_id: row.predictions for row in rows}
+
+    @staticmethod
+    def get_days(
+        db: Session,
+        station_id: str,
+        first_day: date,
+        last_day: date
+    ) -> Tuple[Optional[Dict[date, List[Dict[str, Any]]]], bool]:
+        """
+        Predictions for every day in a range, fetching missing days in one call
+
+        Returns:
+            tuple: (day -> predictions, [] for a day without turning points,
+                or None if missing days couldn't be fetched; whether every
+                day was already stored)
+        """
+        span_days = (last_day - first_day).days + 1
+        wanted = [first_day + timedelta(days=offset) for offset in range(span_days)]
+        rows = db.query(TidePrediction.day, TidePrediction.predictions).filter(
+            TidePrediction.station_id == station_id,
+            TidePrediction.day >= first_day,
+            TidePrediction.day <= last_day
+        ).all()
+        by_day = {row.day: row.predictions for row in rows}
+
+        missing = [day for day in wanted if day not in by_day]
+        if missing:
+            # Cover the whole gap and prefetch ahead of it
+            days = max(settings.TIDE_PREFETCH_DAYS, (last_day - missing[0]).days + 1)
+            predictions = WeatherService.get_tide_data(station_id, begin_date=missing[0], days=days)
+            if not isinstance(predictions, list):
+                return None, False
+            by_day.update(TideService.store_predictions(db, station_id, predictions, missing[0], days))
+        return {day: by_day[day] for day in wanted}, not missing
+
+    @staticmethod
+    def store_predictions(
+        db: Session,
+        station_id: str,
+        predictions: List[Dict[str, Any]],
+        begin_date: date,
+        days: int,
+        replace: bool = False
+    ) -> Dict[date, List[Dict[str, Any]]]:
+        """
+        Split fetched predictions by day and store every day in the range
+
+        Args:
+            replace: Also drop stored days from begin_date onward, in the same
+                transaction, so a refetch replaces them all at once
+        """
+        by_day: Dict[date, List[Dict[str, Any]]] = {begin_date + timedelta(days=offset): [] for offset in range(days)}
+        for prediction in predictions:
+            try:
+                day = datetime.fromisoformat(prediction["time"]).date()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if day in by_day:
+                by_day[day].append(prediction)
+
+        fetched_at = datetime.now(timezone.utc)
+        try:
+            if replace:
+                db.query(TidePrediction).filter(
+                    TidePrediction.station_id == station_id,
+                    TidePrediction.day >= begin_date
+                ).delete(synchronize_session=False)
+            for day, day_predictions in by_day.items():
+                db.merge(TidePrediction(station_id=station_id, day=day, predictions=day_predictions, fetched_at=fetched_at))
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same days first; theirs are identical
+            db.rollback()
+        return by_day
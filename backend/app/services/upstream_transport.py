@@ -0,0 +1,152 @@
+"""
+Pluggable HTTP transport for upstream weather APIs
+
+- live:   plain requests.get
+- record: live, and every response is also saved to the fixture store
+- replay: answers from the fixture store only, never touching the network
+
+Fixtures are gzip-compressed JSON files keyed by the normalized request URL,
+so payloads keep their real size and shape when profiling offline.
+"""
+from app.core.config import settings
+from datetime import datetime, timezone
+from typing import Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import requests
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercase scheme/host, default port dropped, query sorted"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    default_port = {"http": 80, "https": 443}.get(scheme)
+    netloc = host if parts.port in (None, default_port) else f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{scheme}://{netloc}{parts.path or '/'}" + (f"?{query}" if query else "")
+
+class FixtureStore:
+    """Directory of compressed upstream responses keyed by normalized URL"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path_for(self, url: str) -> str:
+        key = hashlib.sha256(normalize_url(url).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def save(self, url: str, response: requests.Response, elapsed_ms: float) -> None:
+        fixture = {
+            "url": normalize_url(url),
+            "status_code": response.status_code,
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "body": response.text,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "recorded_at": datetime.now(timezone.utc).isoformat()
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps(fixture).encode())
+            os.replace(temp_path, self.path_for(url))
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def load(self, url: str) -> Optional[dict]:
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rb") as f:
+            return json.loads(f.read())
+
+class UpstreamTransport:
+    """Base class for upstream transports"""
+
+    def get(self, url: str) -> requests.Response:
+        raise NotImplementedError
+
+class LiveTransport(UpstreamTransport):
+    """Talk to the real upstream APIs"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        # Bounded so a hung connection can't hold an admission slot forever
+        self.timeout = timeout if timeout is not None else settings.UPSTREAM_TIMEOUT_SECONDS
+
+    def get(self, url: str) -> requests.Response:
+        return requests.get(url, timeout=self.timeout)
+
+class RecordingTransport(UpstreamTransport):
+    """Live transport that also saves every response to the fixture store"""
+
+    def __init__(self, store: FixtureStore, live: Optional[UpstreamTransport] = None):
+        self.store = store
+        self.live = live or LiveTransport()
+
+    def get(self, url: str) -> requests.Response:
+        start_time = time.perf_counter()
+        response = self.live.get(url)
+        self.store.save(url, response, (time.perf_counter() - start_time) * 1000)
+        return response
+
+class ReplayTransport(UpstreamTransport):
+    """Serve responses from the fixture store, optionally with simulated latency
+
+    latency_ms adds a fixed delay to every response; use_recorded_latency
+    replays the delay observed when the fixture was recorded instead.
+    """
+
+    def __init__(self, store: FixtureStore, latency_ms: float = 0.0, use_recorded_latency: bool = False):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.use_recorded_latency = use_recorded_latency
+
+    def get(self, url: str) -> requests.Response:
+        fixture = self.store.load(url)
+        if fixture is None:
+            raise requests.exceptions.ConnectionError(f"No recorded fixture for {normalize_url(url)}")
+
+        delay_ms = fixture.get("elapsed_ms", 0.0) if self.use_recorded_latency else self.latency_ms
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        response = requests.Response()
+        response.status_code = fixture["status_code"]
+        response._content = fixture["body"].encode()
+        response.headers["Content-Type"] = fixture["content_type"]
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+_transport: Optional[UpstreamTransport] = None
+
+def get_upstream_transport() -> UpstreamTransport:
+    """Return the process-wide transport selected by settings.UPSTREAM_MODE"""
+    global _transport
+    if _transport is None:
+        store = FixtureStore(settings.UPSTREAM_FIXTURE_DIR)
+        if settings.UPSTREAM_MODE == "live":
+            _transport = LiveTransport()
+        elif settings.UPSTREAM_MODE == "record":
+            _transport = RecordingTransport(store)
+        elif settings.UPSTREAM_MODE == "replay":
+            _transport = ReplayTransport(
+                store,
+                latency_ms=settings.UPSTREAM_REPLAY_LATENCY_MS,
+                use_recorded_latency=settings.UPSTREAM_REPLAY_RECORDED_LATENCY
+            )
+        else:
+            raise ValueError(f"Unknown UPSTREAM_MODE '{settings.UPSTREAM_MODE}'")
+    return _transport
+
+def set_upstream_transport(transport: Optional[UpstreamTransport]) -> None:
+    """Swap the process-wide transport (None re-reads Settings on next use)"""
+    global _transport
+    _transport = transport
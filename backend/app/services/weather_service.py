@@ -1,20 +1,51 @@
 import requests
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_REQUESTS, UPSTREAM_LATENCY
+from app.core.timing import span
+from app.services.admission_service import UpstreamOverloaded, get_upstream_admission
+from app.services.upstream_transport import get_upstream_transport
 import json
+import time
 
 class WeatherService:
     """Service for fetching weather data from external APIs"""
     
+    @staticmethod
+    def _get(url: str, provider: str, phase: str) -> requests.Response:
+        """GET an upstream URL, recording call count, latency and errors per provider
+        
+        The call is also timed as `phase` of the current request. It waits for
+        an upstream admission slot first and raises UpstreamOverloaded if shed.
+        """
+        with get_upstream_admission().slot():
+            start_time = time.perf_counter()
+            outcome = "error"
+            try:
+                with span(phase):
+                    response = get_upstream_transport().get(url)
+                response.raise_for_status()
+                outcome = "success"
+                return response
+            except requests.exceptions.HTTPError:
+                outcome = "http_error"
+                raise
+            finally:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start_time, provider=provider)
+                UPSTREAM_REQUESTS.inc(provider=provider, outcome=outcome)
+    
     @staticmethod
     def get_wind_data(lat: float, long: float) -> Dict[str, Any]:
         """Fetch wind data from Open-Meteo API"""
-        wind_url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={long}&hourly=wind_speed_10m,wind_direction_10m&temperature_unit=fahrenheit&wind_speed_unit=kn&timezone=America%2FNew_York&temporal_resolution=hourly_3&cell_selection=sea"
+        wind_url = f"{settings.OPEN_METEO_URL}/v1/forecast?latitude={lat}&longitude={long}&hourly=wind_speed_10m,wind_direction_10m&temperature_unit=fahrenheit&wind_speed_unit=kn&timezone=America%2FNew_York&temporal_resolution=hourly_3&cell_selection=sea"
         
         try:
-            response = requests.get(wind_url)
-            response.raise_for_status()
+            response = WeatherService._get(wind_url, "open_meteo", "upstream_wind")
             return response.json()
+        except UpstreamOverloaded:
+            # Shed, not failed; callers fall back to stale data or a 503
+            raise
         except requests.exceptions.HTTPError as http_error:
             print(f"HTTP Error occurred: {http_error}")
             return {'error': f"HTTP error occurred: {http_error}"}
@@ -25,12 +56,13 @@ class WeatherService:
     @staticmethod
     def get_wave_data(lat: float, long: float) -> Dict[str, Any]:
         """Fetch wave data from Open-Meteo Marine API"""
-        waves_url = f"https://marine-api.open-meteo.com/v1/marine?latitude={lat}&longitude={long}&hourly=wave_height,wave_direction,wave_period&length_unit=imperial&timezone=America%2FNew_York&temporal_resolution=hourly_3&models=ncep_gfswave025"
+        waves_url = f"{settings.OPEN_METEO_MARINE_URL}/v1/marine?latitude={lat}&longitude={long}&hourly=wave_height,wave_direction,wave_period&length_unit=imperial&timezone=America%2FNew_York&temporal_resolution=hourly_3&models=ncep_gfswave025"
         
         try:
-            response = requests.get(waves_url)
-            response.raise_for_status()
+            response = WeatherService._get(waves_url, "open_meteo_marine", "upstream_waves")
             return response.json()
+        except UpstreamOverloaded:
+            raise
         except requests.exceptions.HTTPError as http_error:
             print(f"HTTP Error occurred: {http_error}")
             return {'error': f"HTTP error occurred: {http_error}"}
@@ -39,13 +71,20 @@ class WeatherService:
             return {'error': f"General error occurred: {err}"}
     
     @staticmethod
-    def get_tide_data(station_id: str) -> Dict[str, Any]:
-        """Fetch tide data from NOAA API"""
-        tides_url = f"https://api.tidesandcurrents.noaa.gov/api/prod/datagetter?date=today&station={station_id}&product=predictions&datum=STND&time_zone=lst&interval=hilo&units=english&format=json"
+    def get_tide_data(station_id: str, begin_date: Optional[date] = None, days: int = 1) -> Dict[str, Any]:
+        """Fetch tide data from NOAA API
+        
+        Fetches today's predictions, or `days` days from `begin_date` in one call.
+        """
+        if begin_date is None:
+            date_range = "date=today"
+        else:
+            end_date = begin_date + timedelta(days=max(days, 1) - 1)
+            date_range = f"begin_date={begin_date:%Y%m%d}&end_date={end_date:%Y%m%d}"
+        tides_url = f"{settings.NOAA_TIDES_URL}/api/prod/datagetter?{date_range}&station={station_id}&product=predictions&datum=STND&time_zone=lst&interval=hilo&units=english&format=json"
         
         try:
-            response = requests.get(tides_url)
-            response.raise_for_status()
+            response = WeatherService._get(tides_url, "noaa", "upstream_tides")
             tide_data = response.json()
             tide_predictions = tide_data.get('predictions', [])
             
@@ -58,6 +97,8 @@ class WeatherService:
                 })
             
             return formatted_data
+        except UpstreamOverloaded:
+            raise
         except requests.exceptions.HTTPError as http_error:
             print(f"HTTP Error occurred: {http_error}")
             return {'error': f"HTTP error occurred: {http_error}"}
@@ -68,19 +109,17 @@ class WeatherService:
     @staticmethod
     def get_temperature_data(station_id: str) -> Dict[str, Any]:
         """Fetch temperature data from NOAA API"""
-        air_temp_url = f"https://api.tidesandcurrents.noaa.gov/api/prod/datagetter?date=latest&station={station_id}&product=air_temperature&datum=STND&time_zone=lst&units=english&format=json"
-        water_temp_url = f"https://api.tidesandcurrents.noaa.gov/api/prod/datagetter?date=latest&station={station_id}&product=water_temperature&datum=STND&time_zone=lst&units=english&format=json"
+        air_temp_url = f"{settings.NOAA_TIDES_URL}/api/prod/datagetter?date=latest&station={station_id}&product=air_temperature&datum=STND&time_zone=lst&units=english&format=json"
+        water_temp_url = f"{settings.NOAA_TIDES_URL}/api/prod/datagetter?date=latest&station={station_id}&product=water_temperature&datum=STND&time_zone=lst&units=english&format=json"
         
         try:
             # Get water temperature
-            water_temp_response = requests.get(water_temp_url)
-            water_temp_response.raise_for_status()
+            water_temp_response = WeatherService._get(water_temp_url, "noaa", "upstream_temperature")
             water_temp_data = water_temp_response.json()
             water_temp = water_temp_data['data'][0]['v']
             
             # Get air temperature
-            air_temp_response = requests.get(air_temp_url)
-            air_temp_response.raise_for_status()
+            air_temp_response = WeatherService._get(air_temp_url, "noaa", "upstream_temperature")
             air_temp_data = air_temp_response.json()
             air_temp = air_temp_data['data'][0]['v']
             
@@ -89,6 +128,8 @@ class WeatherService:
                 "water_temp": water_temp,
                 "air_temp": air_temp
             }
+        except UpstreamOverloaded:
+            raise
         except requests.exceptions.HTTPError as http_error:
             print(f"HTTP Error occurred: {http_error}")
             return {'error': f"HTTP error occurred: {http_error}"}
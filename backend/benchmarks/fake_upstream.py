@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Open-Meteo and NOAA APIs
+
+Serves payloads shaped like the real responses with configurable latency
+and size, so benchmarks exercise the full request path without network.
+
+    python benchmarks/fake_upstream.py --port 9100 --latency-ms 150 --hours 168
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import math
+import random
+import threading
+import time
+
+class UpstreamConfig:
+    """Behaviour knobs shared by every handler thread"""
+
+    def __init__(self, latency_ms: float = 100.0, jitter_ms: float = 20.0, hours: int = 168, error_rate: float = 0.0):
+        self.latency_ms = latency_ms  # Mean added latency per request
+        self.jitter_ms = jitter_ms  # Uniform +/- jitter around the mean
+        self.hours = hours  # Hourly points per forecast (controls payload size)
+        self.error_rate = error_rate  # Fraction of requests answered with 500
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.request_count += 1
+
+def _hourly_times(hours: int) -> list:
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [(start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H:%M") for hour in range(hours)]
+
+def wind_payload(lat: float, long: float, hours: int) -> dict:
+    times = _hourly_times(hours)
+    return {
+        "latitude": lat,
+        "longitude": long,
+        "utc_offset_seconds": -14400,
+        "timezone": "America/New_York",
+        "hourly_units": {"time": "iso8601", "wind_speed_10m": "kn", "wind_direction_10m": "°"},
+        "hourly": {
+            "time": times,
+            "wind_speed_10m": [round(8 + 6 * math.sin(hour / 6), 1) for hour in range(hours)],
+            "wind_direction_10m": [(200 + hour * 7) % 360 for hour in range(hours)]
+        }
+    }
+
+def wave_payload(lat: float, long: float, hours: int) -> dict:
+    times = _hourly_times(hours)
+    return {
+        "latitude": lat,
+        "longitude": long,
+        "utc_offset_seconds": -14400,
+        "timezone": "America/New_York",
+        "hourly_units": {"time": "iso8601", "wave_height": "ft", "wave_direction": "°", "wave_period": "s"},
+        "hourly": {
+            "time": times,
+            "wave_height": [round(3 + 2 * math.sin(hour / 9), 2) for hour in range(hours)],
+            "wave_direction": [(90 + hour * 3) % 360 for hour in range(hours)],
+            "wave_period": [round(9 + 3 * math.cos(hour / 12), 1) for hour in range(hours)]
+        }
+    }
+
+def tide_payload(days: int = 1) -> dict:
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    predictions = []
+    # Semidiurnal tide: a turning point roughly every 6h12m
+    for index in range(days * 4):
+        moment = start + timedelta(minutes=372 * index + 95)
+        high = index % 2 == 0
+        predictions.append({
+            "t": moment.strftime("%Y-%m-%d %H:%M"),
+            "v": f"{4.2 if high else 0.3:.3f}",
+            "type": "H" if high else "L"
+        })
+    return {"predictions": predictions}
+
+def temperature_payload(station_id: str, product: str) -> dict:
+    value = "64.2" if product == "water_temperature" else "71.8"
+    return {
+        "metadata": {"id": station_id, "name": "Fake Station"},
+        "data": [{"t": datetime.now().strftime("%Y-%m-%d %H:%M"), "v": value, "f": "0,0,0"}]
+    }
+
+def make_handler(config: UpstreamConfig):
+    class FakeUpstreamHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            # Keep benchmark output clean
+            pass
+
+        def do_GET(self):
+            config.record_request()
+            delay = max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms))
+            time.sleep(delay / 1000)
+
+            if config.error_rate and random.random() < config.error_rate:
+                self._send(500, {"error": True, "reason": "injected failure"})
+                return
+
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+            if url.path == "/v1/forecast":
+                payload = wind_payload(float(query.get("latitude", 0)), float(query.get("longitude", 0)), config.hours)
+            elif url.path == "/v1/marine":
+                payload = wave_payload(float(query.get("latitude", 0)), float(query.get("longitude", 0)), config.hours)
+            elif url.path == "/api/prod/datagetter":
+                product = query.get("product")
+                if product == "predictions":
+                    days = 1
+                    if "begin_date" in query and "end_date" in query:
+                        begin = datetime.strptime(query["begin_date"], "%Y%m%d")
+                        end = datetime.strptime(query["end_date"], "%Y%m%d")
+                        days = (end - begin).days + 1
+                    payload = tide_payload(days)
+                else:
+                    payload = temperature_payload(query.get("station", ""), product)
+            else:
+                self._send(404, {"error": True, "reason": f"unknown path {url.path}"})
+                return
+
+            self._send(200, payload)
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeUpstreamHandler
+
+def start_fake_upstream(config: UpstreamConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake upstream in a daemon thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Open-Meteo/NOAA upstream for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--hours", type=int, default=168, help="Hourly points per forecast payload")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = UpstreamConfig(args.latency_ms, args.jitter_ms, args.hours, args.error_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake upstream listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the SwellSeeker API
+
+Starts the FastAPI app under uvicorn against a throwaway SQLite database and
+the local fake upstream (benchmarks/fake_upstream.py), drives a set of
+traffic scenarios with concurrent clients, and writes throughput and
+latency percentiles as JSON.
+
+    cd backend
+    python benchmarks/run_benchmark.py --beaches 200 --clients 16 --output bench.json
+    python benchmarks/run_benchmark.py --baseline bench.json --max-regression 0.15
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+from fake_upstream import UpstreamConfig, start_fake_upstream
+
+API_KEY = "benchmark-api-key"
+SCENARIOS = ("beach_list", "surf_data_cold", "surf_data_warm", "surf_data_mixed")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies_ms: List[float], errors: int, wall_seconds: float) -> Dict[str, object]:
+    ordered = sorted(latencies_ms)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "duration_s": round(wall_seconds, 3),
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / count, 2) if count else 0.0,
+            "p50": round(percentile(ordered, 0.50), 2),
+            "p95": round(percentile(ordered, 0.95), 2),
+            "p99": round(percentile(ordered, 0.99), 2),
+            "max": round(ordered[-1], 2) if count else 0.0
+        }
+    }
+
+def seed_database(beach_count: int) -> List[str]:
+    """Create the schema, a benchmark API key and synthetic beaches"""
+    # Imported late so the app modules pick up the benchmark environment
+    from app.db.database import engine, SessionLocal, Base
+    from app.db import init_db  # Registers every model with Base.metadata
+    from app.models.beach import Beach
+    from app.models.api_key import APIKey
+    from app.services.auth_service import AuthService
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(APIKey(key_hash=AuthService.hash_api_key(API_KEY), name="benchmark"))
+        names = []
+        for index in range(beach_count):
+            name = f"Bench Beach {index:05d}"
+            names.append(name)
+            db.add(Beach(
+                beach_name=name,
+                town=f"Town {index % 40}",
+                state=("NJ", "NY", "DE", "MD")[index % 4],
+                lat=38.5 + (index % 100) * 0.02,
+                long=-74.9 + (index // 100) * 0.02,
+                beach_angle=float((90 + index * 13) % 360),
+                station_id=str(8530000 + index % 50)
+            ))
+        db.commit()
+        return names
+    finally:
+        db.close()
+
+def clear_cache(beach_names: Optional[List[str]] = None) -> None:
+    """Drop cached upstream data for the given beaches (all when None)
+
+    Assumes CACHE_BACKEND=sql, which main() pins for the app under test.
+    """
+    from sqlalchemy import text
+    from app.db.database import engine
+
+    with engine.begin() as conn:
+        if beach_names is None:
+            conn.execute(text("DELETE FROM cached_data"))
+        else:
+            for name in beach_names:
+                conn.execute(
+                    text("DELETE FROM cached_data WHERE beach_id = (SELECT id FROM beaches WHERE beach_name = :name)"),
+                    {"name": name}
+                )
+
+def start_app(env: Dict[str, str], port: int, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning"
+    ]
+    # The app's own prints go to stderr so stdout stays pure JSON results
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=sys.stderr)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 60s")
+
+def drive(base_url: str, paths: List[str], clients: int) -> Dict[str, object]:
+    """Issue every path once using `clients` concurrent keep-alive sessions"""
+    path_iter = iter(paths)
+    iter_lock = threading.Lock()
+    latencies: List[float] = []
+    errors = 0
+    results_lock = threading.Lock()
+
+    def client_loop():
+        nonlocal errors
+        session = requests.Session()
+        session.headers["Authorization"] = f"Bearer {API_KEY}"
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with iter_lock:
+                path = next(path_iter, None)
+            if path is None:
+                break
+            start_time = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=60)
+                response.content
+                if response.status_code != 200:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append((time.perf_counter() - start_time) * 1000)
+        session.close()
+        with results_lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client_loop)
+    return summarize(latencies, errors, time.perf_counter() - wall_start)
+
+def surf_data_path(beach_name: str) -> str:
+    return f"/api/v1/surf-data/{quote(beach_name)}"
+
+def run_scenarios(base_url: str, beach_names: List[str], args) -> Dict[str, object]:
+    rng = random.Random(args.seed)
+    results = {}
+
+    for scenario in args.scenarios:
+        if scenario == "beach_list":
+            paths = ["/api/v1/beaches/"] * args.requests
+        elif scenario == "surf_data_cold":
+            # Every request misses the cache and goes upstream
+            clear_cache()
+            paths = [surf_data_path(name) for name in beach_names[:args.requests]]
+        elif scenario == "surf_data_warm":
+            clear_cache()
+            drive(base_url, [surf_data_path(name) for name in beach_names], args.clients)
+            paths = [surf_data_path(rng.choice(beach_names)) for _ in range(args.requests)]
+        elif scenario == "surf_data_mixed":
+            clear_cache()
+            drive(base_url, [surf_data_path(name) for name in beach_names], args.clients)
+            cold = rng.sample(beach_names, int(len(beach_names) * (1 - args.warm_ratio)))
+            clear_cache(cold)
+            paths = [surf_data_path(rng.choice(beach_names)) for _ in range(args.requests)]
+        else:
+            raise ValueError(f"Unknown scenario '{scenario}'")
+
+        print(f"Running {scenario} ({len(paths)} requests, {args.clients} clients)...", file=sys.stderr)
+        results[scenario] = drive(base_url, paths, args.clients)
+
+    return results
+
+def compare(results: Dict[str, object], baseline: Dict[str, object], max_regression: float) -> List[str]:
+    """Return a description of every scenario whose p95 or throughput regressed"""
+    regressions = []
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        p95_now, p95_before = current["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        if p95_before and (p95_now - p95_before) / p95_before > max_regression:
+            regressions.append(f"{scenario}: p95 {p95_before}ms -> {p95_now}ms")
+        rps_now, rps_before = current["throughput_rps"], previous["throughput_rps"]
+        if rps_before and (rps_before - rps_now) / rps_before > max_regression:
+            regressions.append(f"{scenario}: throughput {rps_before} -> {rps_now} req/s")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SwellSeeker API load and latency benchmark")
+    parser.add_argument("--beaches", type=int, default=100, help="Synthetic beaches in the catalog")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--warm-ratio", type=float, default=0.8, help="Fraction of beaches cached in surf_data_mixed")
+    parser.add_argument("--upstream-latency-ms", type=float, default=100.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--upstream-hours", type=int, default=168, help="Hourly points per forecast payload")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed fractional p95/throughput regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="swellseeker-bench-")
+    upstream_config = UpstreamConfig(args.upstream_latency_ms, args.upstream_jitter_ms, args.upstream_hours)
+    upstream = start_fake_upstream(upstream_config)
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}"
+
+    bench_env = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "OPEN_METEO_URL": upstream_url,
+        "OPEN_METEO_MARINE_URL": upstream_url,
+        "NOAA_TIDES_URL": upstream_url,
+        # clear_cache() empties cached_data directly; other backends (the
+        # per-process memory one especially) can't be reset from out here
+        "CACHE_BACKEND": "sql",
+        # Keep every artifact inside workdir, and leave the seeding to seed_database()
+        "ARCHIVE_DIR": os.path.join(workdir, "archive"),
+        "INIT_DB_ON_STARTUP": "false",
+        # Measure the service, not the per-key limiter
+        "DEFAULT_RATE_LIMIT_PER_MINUTE": "0",
+        "DEFAULT_MAX_CONCURRENT_REQUESTS": "0"
+    }
+    os.environ.update(bench_env)
+
+    app_process = None
+    try:
+        beach_names = seed_database(args.beaches)
+        port = _free_port()
+        app_process = start_app(dict(os.environ), port, args.workers)
+        scenarios = run_scenarios(f"http://127.0.0.1:{port}", beach_names, args)
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait(timeout=30)
+        upstream.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "parameters": {
+            "beaches": args.beaches,
+            "requests": args.requests,
+            "clients": args.clients,
+            "workers": args.workers,
+            "warm_ratio": args.warm_ratio,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "upstream_jitter_ms": args.upstream_jitter_ms,
+            "upstream_hours": args.upstream_hours
+        },
+        "upstream_requests": upstream_config.request_count,
+        "scenarios": scenarios
+    }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
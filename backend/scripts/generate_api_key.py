@@ -1,11 +1,15 @@
 import secrets
 import hashlib
+import sys
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
 from app.models.api_key import APIKey
 
-def generate_api_key(name: str = "test-key") -> str:
-    """Generate a new API key and store it in the database"""
+def generate_api_key(name: str = "test-key", is_admin: bool = False) -> str:
+    """Generate a new API key and store it in the database
+    
+    Admin keys may also use the /admin endpoints.
+    """
     # Generate a random API key
     api_key = secrets.token_urlsafe(32)
     key_hash = hashlib.sha256(api_key.encode()).hexdigest()
@@ -15,13 +19,16 @@ def generate_api_key(name: str = "test-key") -> str:
     try:
         api_key_record = APIKey(
             key_hash=key_hash,
-            name=name
+            name=name,
+            is_admin=is_admin
         )
         db.add(api_key_record)
         db.commit()
         
         print(f"Generated API key: {api_key}")
         print(f"Name: {name}")
+        if is_admin:
+            print("Admin: yes")
         print("Store this key securely - it won't be shown again!")
         
         return api_key
@@ -33,4 +40,5 @@ def generate_api_key(name: str = "test-key") -> str:
         db.close()
 
 if __name__ == "__main__":
-    generate_api_key() 
\ No newline at end of file
+    # Pass --admin for a key that may use the /admin endpoints
+    generate_api_key(is_admin="--admin" in sys.argv[1:]) 
\ No newline at end of file
@@ -7,6 +7,11 @@ from sqlalchemy.pool import StaticPool
 from app.main import app
 from app.db.database import get_db, Base
 from app.core.config import settings
+from app.services.rate_limit_service import get_rate_limiter
+from app.services.subscription_service import get_broker
+from app.services.cache_service import cache_key_stats
+from app.services.admission_service import set_upstream_admission
+from app.db.database import recent_writes
 
 # Test database URL
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -32,9 +37,20 @@ def override_get_db():
 # Override the database dependency
 app.dependency_overrides[get_db] = override_get_db
 
+# Tests create and drop their own tables and never write archive files
+settings.INIT_DB_ON_STARTUP = False
+settings.ARCHIVE_ENABLED = False
+
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database session for each test"""
+    # Start every test with empty rate limit buckets
+    get_rate_limiter().reset()
+    get_broker().reset()
+    cache_key_stats.reset()
+    set_upstream_admission(None)
+    recent_writes.reset()
+    
     # Create tables
     Base.metadata.create_all(bind=engine)
     
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from app.models.beach import Beach
 from app.models.api_key import APIKey
 from app.services.auth_service import AuthService
+from app.services.catalog_service import lock_change_log
+from unittest.mock import MagicMock
 
 class TestBeachesEndpoints:
     """Test cases for beaches endpoints"""
@@ -119,4 +121,124 @@ class TestBeachesEndpoints:
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert "beaches" in data
-        assert len(data["beaches"]) == 0 
\ No newline at end of file
+        assert len(data["beaches"]) == 0
+    
+    def _create_beaches(self, db_session, api_key, specs):
+        key_hash = AuthService.hash_api_key(api_key)
+        db_session.add(APIKey(key_hash=key_hash, name="test_key", is_active=True))
+        for name, town, state in specs:
+            db_session.add(Beach(
+                beach_name=name,
+                town=town,
+                state=state,
+                lat=39.0,
+                long=-74.0,
+                beach_angle=90.0,
+                station_id="test_station"
+            ))
+        db_session.commit()
+    
+    def test_get_beaches_keyset_pagination(self, client, db_session, api_key):
+        """Test walking the beach list page by page with cursors"""
+        self._create_beaches(db_session, api_key, [
+            (f"Beach {index}", "Test Town", "NJ") for index in range(5)
+        ])
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        names = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            data = client.get("/api/v1/beaches/", params=params, headers=headers).json()
+            names.extend(beach["beach_name"] for beach in data["beaches"])
+            pages += 1
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        
+        assert pages == 3
+        assert names == [f"Beach {index}" for index in range(5)]
+    
+    def test_get_beaches_filter_and_summary_view(self, client, db_session, api_key):
+        """Test state/town filters and the summary projection"""
+        self._create_beaches(db_session, api_key, [
+            ("Beach A", "Atlantic City", "NJ"),
+            ("Beach B", "Ocean City", "NJ"),
+            ("Beach C", "Montauk", "NY"),
+        ])
+        
+        response = client.get(
+            "/api/v1/beaches/",
+            params={"state": "NJ", "town": "Ocean City", "view": "summary"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["next_cursor"] is None
+        assert data["beaches"] == [{"beach_name": "Beach B", "town": "Ocean City", "lat": 39.0, "long": -74.0}]
+    
+    def test_get_beaches_invalid_cursor(self, client, db_session, api_key):
+        """Test that a malformed cursor is rejected"""
+        self._create_beaches(db_session, api_key, [])
+        
+        response = client.get(
+            "/api/v1/beaches/",
+            params={"cursor": "%%%"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_catalog_changes_delta_sync(self, client, db_session, api_key):
+        """Test that a client only receives beaches changed since its version"""
+        self._create_beaches(db_session, api_key, [
+            ("Beach A", "Atlantic City", "NJ"),
+            ("Beach B", "Ocean City", "NJ"),
+        ])
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        full = client.get("/api/v1/beaches/changes", headers=headers).json()
+        assert [beach["beach_name"] for beach in full["upserts"]] == ["Beach A", "Beach B"]
+        assert full["deletes"] == []
+        
+        # Change one beach, remove the other
+        beach_a = db_session.query(Beach).filter(Beach.beach_name == "Beach A").first()
+        beach_a.town = "Brigantine"
+        db_session.delete(db_session.query(Beach).filter(Beach.beach_name == "Beach B").first())
+        db_session.commit()
+        
+        delta = client.get("/api/v1/beaches/changes", params={"since": full["version"]}, headers=headers).json()
+        assert delta["version"] > full["version"]
+        assert [beach["town"] for beach in delta["upserts"]] == ["Brigantine"]
+        assert delta["deletes"] == ["Beach B"]
+        
+        # Nothing new since the latest version
+        empty = client.get("/api/v1/beaches/changes", params={"since": delta["version"]}, headers=headers).json()
+        assert empty["upserts"] == [] and empty["deletes"] == []
+        assert empty["version"] == delta["version"]
+    
+    def test_catalog_changes_not_modified(self, client, db_session, api_key):
+        """Test that a matching If-None-Match gets a 304"""
+        self._create_beaches(db_session, api_key, [("Beach A", "Atlantic City", "NJ")])
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        response = client.get("/api/v1/beaches/changes", headers=headers)
+        etag = response.headers["ETag"]
+        
+        response = client.get("/api/v1/beaches/changes", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    def test_change_log_writers_serialized_on_postgres(self):
+        """Test that Postgres writers take the change log lock and SQLite ones don't"""
+        postgres = MagicMock()
+        postgres.dialect.name = "postgresql"
+        lock_change_log(postgres)
+        assert "pg_advisory_xact_lock" in str(postgres.execute.call_args[0][0])
+        
+        sqlite = MagicMock()
+        sqlite.dialect.name = "sqlite"
+        lock_change_log(sqlite)
+        sqlite.execute.assert_not_called()
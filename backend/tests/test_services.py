@@ -1,13 +1,46 @@
 import pytest
+import json
 from unittest.mock import patch, MagicMock
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 
 from app.services.grading_service import GradingService
 from app.services.cache_service import CacheService
 from app.services.auth_service import AuthService
+from app.services.rate_limit_service import InMemoryRateLimiter, DatabaseRateLimiter
+from app.core.metrics import MetricsRegistry, CACHE_LOOKUPS, REQUEST_LATENCY
+from app.services.upstream_transport import (
+    FixtureStore, LiveTransport, RecordingTransport, ReplayTransport, normalize_url, set_upstream_transport
+)
+from app.services.weather_service import WeatherService
+from app.db.init_db import init_db
+from app.db.database import RoutingSession, recent_writes
+from app.db.catalog_importer import import_catalog, iter_json_array
+from app.services.cache_backends import (
+    MemoryCacheBackend, SQLCacheBackend, SQLiteCacheBackend, WriteBehindCacheBackend, get_cache_backend, set_cache_backend
+)
+from app.services.archive_service import ForecastArchive, set_archive
+from app.services.forecast_service import Forecast, ForecastService
+from app.services.search_service import SearchService
+from app.services.tide_service import TideCurve, TideService
+from app.services.admin_service import AdminService
+from app.services.admission_service import UpstreamAdmission, UpstreamOverloaded, set_upstream_admission
+from app.services.archive_service import decode_segments, encode_segment
+from app.services.batch_grading import grade_file
+from app.core.metrics import UPSTREAM_ADMISSION_REJECTIONS, UPSTREAM_QUEUE_DEPTH
+import threading
+import time
+from app.core.config import settings
+import io
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.db.database import Base
+import requests
 from app.models.beach import Beach
 from app.models.api_key import APIKey
 from app.models.cached_data import CachedData
+from app.models.rate_limit import RateLimitLease
+from app.models.tide_prediction import TidePrediction
 
 class TestGradingService:
     """Test cases for the grading service"""
@@ -71,6 +104,26 @@ class TestGradingService:
         
         grade = GradingService.calculate_grade_from_data(wind_data, wave_data, 90.0)
         assert grade == "red"
+    
+    def test_grade_columns_matches_per_point_rules(self):
+        """Test column grading against get_wave_quality and get_wave_score"""
+        points = [
+            (speed, direction, height, period)
+            for speed in (3.0, 5.0, 10.0, 15.0, 22.0)
+            for direction in (0.0, 60.0, 90.0, 200.0, 240.0, 300.0, 359.0)
+            for height in (0.5, 1.0, 4.0)
+            for period in (5.0, 7.0, 9.0, 10.0, 14.0)
+        ]
+        points.append((10.0, float("nan"), 4.0, 12.0))
+        speeds, directions, heights, periods = (list(column) for column in zip(*points))
+        
+        grades, scores = GradingService.grade_columns(speeds, directions, heights, periods, 45.0)
+        
+        for (speed, direction, height, period), grade, score in zip(points[:-1], grades, scores):
+            assert grade == GradingService.get_wave_quality(direction, speed, period, 45.0, height)
+            expected = GradingService.get_wave_score(direction, speed, period, 45.0) if height >= 1 else None
+            assert score == expected
+        assert (grades[-1], scores[-1]) == (None, None)
 
 class TestCacheService:
     """Test cases for the cache service"""
@@ -166,6 +219,670 @@ class TestCacheService:
         assert cached_data["data"] == new_data
         assert cached_data["data"] != initial_data
 
+class TestCacheBackends:
+    """Test cases for the pluggable cache backends"""
+    
+    @pytest.fixture(autouse=True)
+    def restore_backend(self, db_session):
+        yield
+        backend = get_cache_backend()
+        if isinstance(backend, WriteBehindCacheBackend):
+            # Stop its flusher while the test tables still exist
+            backend.close()
+        set_cache_backend(None)
+    
+    def _backend(self, backend_name, db_session, tmp_path):
+        return {
+            "sql": lambda: None,
+            "memory": MemoryCacheBackend,
+            "sqlite": lambda: SQLiteCacheBackend(str(tmp_path / "cache.db")),
+            "write_behind": lambda: WriteBehindCacheBackend(
+                SQLCacheBackend(), flush_interval=60, session_factory=lambda: Session(bind=db_session.get_bind())
+            ),
+        }[backend_name]()
+    
+    def test_memory_backend_round_trip_and_ttl(self, db_session):
+        """Test CacheService on the in-memory backend"""
+        set_cache_backend(MemoryCacheBackend())
+        
+        CacheService.store_cached_data(db_session, 1, "wind_data", {"hourly": {"wind_speed_10m": [5.0]}})
+        cached = CacheService.get_cached_data(db_session, 1, "wind_data")
+        assert cached["data"] == {"hourly": {"wind_speed_10m": [5.0]}}
+        assert cached["cached"] is True
+        
+        # Nothing reached the primary database
+        assert db_session.query(CachedData).count() == 0
+        
+        with patch.object(CacheService, "CACHE_DURATION_HOURS", -1):
+            CacheService.store_cached_data(db_session, 1, "wind_data", {"stale": True})
+        assert CacheService.get_cached_data(db_session, 1, "wind_data") is None
+    
+    def test_memory_backend_evicts_least_recently_used(self, db_session):
+        """Test that the in-memory backend stays within max_entries"""
+        backend = MemoryCacheBackend(max_entries=2)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        backend.set(db_session, 1, "wind_data", {"n": 1}, expires_at)
+        backend.set(db_session, 2, "wind_data", {"n": 2}, expires_at)
+        backend.get(db_session, 1, "wind_data")
+        backend.set(db_session, 3, "wind_data", {"n": 3}, expires_at)
+        
+        assert backend.get(db_session, 2, "wind_data") is None
+        assert backend.get(db_session, 1, "wind_data")[0] == {"n": 1}
+    
+    def test_sqlite_backend_shared_between_instances(self, db_session, tmp_path):
+        """Test that separate backend instances (as in separate workers) share one file"""
+        path = str(tmp_path / "cache.db")
+        writer = SQLiteCacheBackend(path)
+        reader = SQLiteCacheBackend(path)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        
+        writer.set(db_session, 7, "tide_data", {"predictions": [{"t": "2024-01-01 00:00", "v": "1.2"}]}, expires_at)
+        data, stored_expiry = reader.get(db_session, 7, "tide_data")
+        assert data == {"predictions": [{"t": "2024-01-01 00:00", "v": "1.2"}]}
+        assert abs((stored_expiry - expires_at).total_seconds()) < 0.001
+        
+        reader.delete(db_session, 7, "tide_data")
+        assert writer.get(db_session, 7, "tide_data") is None
+        
+        journal_mode = reader._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode == "wal"
+    
+    @pytest.mark.parametrize("backend_name", ["sql", "memory", "sqlite", "write_behind"])
+    def test_list_and_delete_many(self, db_session, tmp_path, backend_name):
+        """Test listing entries with size and age, and deleting them by filter"""
+        set_cache_backend(self._backend(backend_name, db_session, tmp_path))
+        for beach_id in (1, 2):
+            CacheService.store_cached_data(db_session, beach_id, "wind_data", {"n": beach_id})
+            CacheService.store_cached_data(db_session, beach_id, "temp_data", {"n": beach_id})
+        
+        entries = AdminService.list_entries(db_session, beach_ids=[1])[0]
+        assert [(entry.beach_id, entry.data_type) for entry in entries] == [(1, "temp_data"), (1, "wind_data")]
+        assert all(entry.size_bytes > 0 and entry.expires_at > datetime.now(timezone.utc) for entry in entries)
+        if backend_name in ("memory", "sqlite"):
+            # created_at is set by the database in the server's clock, and queued entries have none yet
+            assert all(entry.stored_at <= datetime.now(timezone.utc) for entry in entries)
+        
+        assert AdminService.invalidate(db_session, data_types=["temp_data"]) == (2, 0)
+        assert AdminService.list_entries(db_session)[1] == 2
+        assert CacheService.get_cached_data(db_session, 2, "wind_data") is not None
+    
+    @pytest.mark.parametrize("backend_name", ["sql", "memory", "sqlite", "write_behind"])
+    def test_unchanged_refresh_only_extends_expiry(self, db_session, tmp_path, backend_name):
+        """Test that storing identical data keeps the entry and what's derived from it"""
+        set_cache_backend(self._backend(backend_name, db_session, tmp_path))
+        wind = {"hourly": {"time": ["2024-06-01T00:00"], "wind_speed_10m": [5.0]}}
+        soon = datetime.now(timezone.utc) + timedelta(minutes=5)
+        assert CacheService.store_cached_data(db_session, 1, "wind_data", wind, expires_at=soon) is True
+        CacheService.store_cached_data(db_session, 1, "forecast", {"times": ""})
+        before = AdminService.list_entries(db_session, data_types=["wind_data"])[0][0]
+        
+        # Same payload, different key order
+        same = {"hourly": {"wind_speed_10m": [5.0], "time": ["2024-06-01T00:00"]}}
+        with patch.object(type(get_cache_backend()), "set") as rewrite:
+            assert CacheService.store_cached_data(db_session, 1, "wind_data", same) is False
+            rewrite.assert_not_called()
+        after = AdminService.list_entries(db_session, data_types=["wind_data"])[0][0]
+        assert after.expires_at > before.expires_at + timedelta(hours=1)
+        assert (after.stored_at, after.content_hash) == (before.stored_at, before.content_hash)
+        assert CacheService.get_cached_data(db_session, 1, "forecast") is not None
+        
+        assert CacheService.store_cached_data(db_session, 1, "wind_data", {"hourly": {"wind_speed_10m": [6.0]}}) is True
+        assert AdminService.list_entries(db_session, data_types=["wind_data"])[0][0].content_hash != before.content_hash
+        assert CacheService.get_cached_data(db_session, 1, "forecast") is None
+    
+    def test_sql_store_commits_once_and_archives_only_changes(self, tmp_path):
+        """Test that a changed payload costs one transaction and an identical one isn't archived again"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        Base.metadata.create_all(bind=engine)
+        commits = []
+        event.listen(engine, "commit", lambda conn: commits.append(conn))
+        set_cache_backend(SQLCacheBackend())
+        archive = ForecastArchive(str(tmp_path / "archive"))
+        set_archive(archive)
+        temperature = {"water_temp": "65.0", "air_temp": "70.0"}
+        try:
+            with Session(bind=engine) as db, patch.object(archive, "append") as append, \
+                    patch.object(settings, "ARCHIVE_ENABLED", True):
+                CacheService.store_cached_data(db, 1, "temp_data", temperature)
+                assert len(commits) == 1
+                CacheService.store_cached_data(db, 1, "temp_data", temperature)
+                assert len(commits) == 2
+        finally:
+            set_archive(None)
+        append.assert_called_once()
+    
+    def test_write_behind_batches_a_warm_up(self, tmp_path):
+        """Test that warming many entries costs one commit and queued entries are readable meanwhile"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        Base.metadata.create_all(bind=engine)
+        commits = []
+        event.listen(engine, "commit", lambda conn: commits.append(conn))
+        backend = WriteBehindCacheBackend(
+            SQLCacheBackend(), max_batch=1000, flush_interval=60, session_factory=lambda: Session(bind=engine)
+        )
+        set_cache_backend(backend)
+        
+        with Session(bind=engine) as db:
+            for beach_id in range(1, 26):
+                for data_type in ("wind_data", "wave_data", "tide_data", "temp_data"):
+                    CacheService.store_cached_data(db, beach_id, data_type, {"beach": beach_id, "type": data_type})
+            assert CacheService.get_cached_data(db, 25, "temp_data")["data"] == {"beach": 25, "type": "temp_data"}
+            assert db.query(CachedData).count() == 0
+            
+            backend.flush()
+            assert db.query(CachedData).count() == 100
+            assert CacheService.get_cached_data(db, 25, "temp_data")["data"] == {"beach": 25, "type": "temp_data"}
+            # An unchanged refresh queues only the new expiry
+            assert CacheService.store_cached_data(db, 25, "temp_data", {"type": "temp_data", "beach": 25}) is False
+            backend.flush()
+        assert len(commits) == 2
+    
+    def test_write_behind_coalesces_and_flushes_on_size_and_time(self, db_session):
+        """Test that repeated writes to an entry coalesce and batches flush when full or due"""
+        stored = MemoryCacheBackend()
+        backend = WriteBehindCacheBackend(stored, max_batch=3, flush_interval=0.05)
+        set_cache_backend(backend)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        
+        backend.set(db_session, 1, "wind_data", {"n": 1}, expires_at)
+        backend.set(db_session, 2, "wind_data", {"n": 2}, expires_at)
+        backend.set(db_session, 1, "wind_data", {"n": 10}, expires_at)
+        backend.delete(db_session, 2, "wind_data")
+        assert backend.get_many(db_session, [1, 2], "wind_data") == {1: ({"n": 10}, expires_at)}
+        assert stored.list_entries(db_session) == []
+        
+        # The third distinct entry fills the batch
+        backend.set(db_session, 3, "wind_data", {"n": 3}, expires_at)
+        assert [entry.beach_id for entry in stored.list_entries(db_session)] == [1, 3]
+        
+        backend.set(db_session, 4, "wind_data", {"n": 4}, expires_at)
+        deadline = time.monotonic() + 5
+        while stored.get(db_session, 4, "wind_data") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stored.get(db_session, 4, "wind_data") == ({"n": 4}, expires_at)
+    
+    def test_write_behind_clear_drops_the_batch_in_flight(self, db_session):
+        """Test that clear() hides a batch being flushed and leaves nothing behind once it lands"""
+        stored = MemoryCacheBackend()
+        release = threading.Event()
+        write_many = stored.write_many
+        stored.write_many = lambda db, writes: (release.wait(5), write_many(db, writes))
+        backend = WriteBehindCacheBackend(stored, max_batch=1000, flush_interval=60)
+        set_cache_backend(backend)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        backend.set(db_session, 1, "wind_data", {"n": 1}, expires_at)
+        
+        flusher = threading.Thread(target=backend.flush)
+        flusher.start()
+        deadline = time.monotonic() + 5
+        while not backend._flushing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        clearer = threading.Thread(target=backend.clear)
+        clearer.start()
+        while backend._generation == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backend.get(db_session, 1, "wind_data") is None
+        
+        release.set()
+        flusher.join()
+        clearer.join()
+        assert backend.get(db_session, 1, "wind_data") is None
+        assert stored.list_entries(db_session) == []
+
+class TestForecastArchive:
+    """Test cases for the historical forecast archive"""
+    
+    def _wind_payload(self, start, hours, speed):
+        times = [(start + timedelta(hours=3 * i)).strftime("%Y-%m-%dT%H:%M") for i in range(hours)]
+        return {"hourly": {
+            "time": times,
+            "wind_speed_10m": [speed + i for i in range(hours)],
+            "wind_direction_10m": [270.0] * hours
+        }}
+    
+    def test_append_partitions_by_day_and_queries_range(self, tmp_path):
+        """Test that a fetch is split into day partitions and read back by range"""
+        archive = ForecastArchive(str(tmp_path))
+        start = datetime(2024, 6, 1, 0, 0)
+        written = archive.append(1, "wind_data", self._wind_payload(start, 16, 5.0), datetime(2024, 6, 1, tzinfo=timezone.utc))
+        
+        assert written == 16
+        assert sorted(os.listdir(tmp_path / "wind_data")) == ["2024-06-01", "2024-06-02"]
+        
+        result = archive.query(1, "wind_data", datetime(2024, 6, 2, 0, 0), datetime(2024, 6, 2, 6, 0))
+        assert result["time"] == ["2024-06-02T00:00", "2024-06-02T03:00"]
+        assert result["wind_speed_10m"] == [13.0, 14.0]
+        assert result["wind_direction_10m"] == [270.0, 270.0]
+    
+    def test_later_fetch_wins_unless_all_runs(self, tmp_path):
+        """Test that overlapping forecasts keep history but default to the latest run"""
+        archive = ForecastArchive(str(tmp_path))
+        start = datetime(2024, 6, 1, 0, 0)
+        archive.append(1, "wind_data", self._wind_payload(start, 4, 5.0), datetime(2024, 5, 31, tzinfo=timezone.utc))
+        archive.append(1, "wind_data", self._wind_payload(start, 4, 20.0), datetime(2024, 6, 1, tzinfo=timezone.utc))
+        
+        latest = archive.query(1, "wind_data", start, start + timedelta(days=1))
+        assert latest["wind_speed_10m"] == [20.0, 21.0, 22.0, 23.0]
+        
+        every_run = archive.query(1, "wind_data", start, start + timedelta(days=1), latest_only=False)
+        assert every_run["wind_speed_10m"][:2] == [5.0, 20.0]
+        assert len(every_run["time"]) == 8
+    
+    def test_tide_and_temperature_series(self, tmp_path):
+        """Test the list-shaped tide payload and the point-in-time temperature payload"""
+        archive = ForecastArchive(str(tmp_path))
+        archive.append(2, "tide_data", [
+            {"time": "2024-06-01 03:24", "height": "4.1", "type": "high"},
+            {"time": "2024-06-01 09:40", "height": "0.3", "type": "low"}
+        ])
+        archive.append(2, "temp_data", {"station_id": "1", "water_temp": "61.2", "air_temp": ""}, datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+        
+        tides = archive.query(2, "tide_data", datetime(2024, 6, 1), datetime(2024, 6, 2))
+        assert tides["height"] == [4.1, 0.3]
+        assert tides["high"] == [1.0, 0.0]
+        
+        temps = archive.query(2, "temp_data", datetime(2024, 6, 1), datetime(2024, 6, 2))
+        assert temps["water_temp"] == [61.2]
+        assert temps["air_temp"] == [None]
+    
+    def test_torn_tail_is_ignored(self, tmp_path):
+        """Test that a partially written final segment doesn't hide earlier ones"""
+        archive = ForecastArchive(str(tmp_path))
+        start = datetime(2024, 6, 1, 0, 0)
+        archive.append(1, "wind_data", self._wind_payload(start, 2, 5.0))
+        with open(archive.partition_path("wind_data", start.date(), 1), "ab") as f:
+            f.write(b"SSA1\x00\x01")
+        
+        assert archive.query(1, "wind_data", start, start + timedelta(days=1))["wind_speed_10m"] == [5.0, 6.0]
+    
+    def test_store_cached_data_archives_and_endpoint_reads(self, client, db_session, api_key, tmp_path):
+        """Test the cache write hook and the archive endpoint together"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        
+        settings.ARCHIVE_ENABLED = True
+        set_archive(ForecastArchive(str(tmp_path)))
+        try:
+            CacheService.store_cached_data(db_session, beach.id, "wind_data", self._wind_payload(datetime(2024, 6, 1), 8, 5.0))
+            CacheService.store_cached_data(db_session, beach.id, "wind_data", self._wind_payload(datetime(2024, 6, 1), 8, 7.0))
+            response = client.get(
+                "/api/v1/archive/Test Beach/wind_data",
+                params={"start": "2024-06-01T00:00", "end": "2024-06-01T06:00", "all_runs": "true"},
+                headers={"Authorization": f"Bearer {api_key}"}
+            )
+        finally:
+            settings.ARCHIVE_ENABLED = False
+            set_archive(None)
+        
+        assert response.status_code == 200
+        series = response.json()["series"]
+        assert series["wind_speed_10m"] == [5.0, 7.0, 6.0, 8.0]
+
+class TestForecast:
+    """Test cases for the parsed wind and wave forecast"""
+    
+    WIND = {"hourly": {
+        "time": ["2024-06-01T00:00", "2024-06-01T03:00", "2024-06-01T06:00"],
+        "wind_speed_10m": [4.0, 6.0, 8.0],
+        "wind_direction_10m": [270, 275, None]
+    }}
+    WAVES = {"hourly": {
+        "time": ["2024-06-01T03:00", "2024-06-01T06:00", "2024-06-01T09:00"],
+        "wave_height": [3.0, 3.5, 4.0],
+        "wave_direction": [90, 90, 95],
+        "wave_period": [11.0, 12.0, 12.0]
+    }}
+    
+    def test_series_aligned_on_shared_time_axis(self):
+        """Test that wind and wave points line up by time, with gaps as None"""
+        forecast = Forecast.from_upstream(self.WIND, self.WAVES)
+        series = forecast.to_series()
+        
+        assert series["time"] == ["2024-06-01T00:00", "2024-06-01T03:00", "2024-06-01T06:00", "2024-06-01T09:00"]
+        assert series["wind_speed_10m"] == [4.0, 6.0, 8.0, None]
+        assert series["wind_direction_10m"] == [270.0, 275.0, None, None]
+        assert series["wave_height"] == [None, 3.0, 3.5, 4.0]
+    
+    def test_cache_round_trip_and_slice(self):
+        """Test that the cached form decodes to the same forecast and slices by time"""
+        forecast = Forecast.from_cache(json.loads(json.dumps(Forecast.from_upstream(self.WIND, self.WAVES).to_cache())))
+        window = forecast.slice(datetime(2024, 6, 1, 3), datetime(2024, 6, 1, 9))
+        
+        assert window.to_series()["time"] == ["2024-06-01T03:00", "2024-06-01T06:00"]
+        assert window.to_series()["wave_period"] == [11.0, 12.0]
+        assert GradingService.calculate_grade_from_forecast(forecast, 90.0, index=1) == "yellow"
+        # No wave data at the first point
+        assert GradingService.calculate_grade_from_forecast(forecast, 90.0, index=0) is None
+    
+    def test_index_at_finds_slot_covering_time(self):
+        """Test the binary-search time lookup, including clamping and aware times"""
+        forecast = Forecast.from_upstream(self.WIND, self.WAVES)
+        
+        assert forecast.index_at(datetime(2024, 6, 1, 4, 30)) == 1
+        assert forecast.index_at(datetime(2024, 6, 1, 6, 0)) == 2
+        assert forecast.index_at(datetime(2024, 5, 31)) == 0
+        assert forecast.index_at(datetime(2024, 6, 2)) == 3
+        # 10:00 UTC is 06:00 in New York (EDT)
+        assert forecast.index_at(datetime(2024, 6, 1, 10, 0, tzinfo=timezone.utc)) == 2
+        assert forecast.time_at(2) == datetime(2024, 6, 1, 6, 0)
+    
+    def test_grade_uses_current_hour(self):
+        """Test that the default grade is for the slot covering now, not the first point"""
+        forecast = Forecast.from_upstream(self.WIND, self.WAVES)
+        with patch.object(Forecast, "index_at", return_value=1) as index_at:
+            assert GradingService.calculate_grade_from_forecast(forecast, 90.0) == "yellow"
+            index_at.assert_called_once_with()
+    
+    def test_forecast_cached_and_dropped_on_refresh(self, db_session):
+        """Test that the parsed forecast is reused from cache until wind or waves are stored again"""
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        
+        CacheService.store_cached_data(db_session, beach.id, "wind_data", self.WIND)
+        CacheService.store_cached_data(db_session, beach.id, "wave_data", self.WAVES)
+        ForecastService.get_forecast(db_session, beach.id, self.WIND, self.WAVES)
+        assert CacheService.get_cached_data(db_session, beach.id, "forecast") is not None
+        with patch.object(Forecast, "from_upstream") as parse:
+            assert len(ForecastService.get_forecast(db_session, beach.id, self.WIND, self.WAVES)) == 4
+            parse.assert_not_called()
+        
+        # An identical refresh keeps it; new wind data drops the stale one
+        CacheService.store_cached_data(db_session, beach.id, "wind_data", self.WIND)
+        assert CacheService.get_cached_data(db_session, beach.id, "forecast") is not None
+        calmer = {"hourly": {**self.WIND["hourly"], "wind_speed_10m": [1.0, 2.0, 3.0]}}
+        CacheService.store_cached_data(db_session, beach.id, "wind_data", calmer)
+        assert CacheService.get_cached_data(db_session, beach.id, "forecast") is None
+        forecast = ForecastService.get_forecast(db_session, beach.id, calmer, self.WAVES)
+        assert forecast.value("wind_speed_10m", 0) == 1.0
+
+class TestSearchService:
+    """Test cases for the best surf window search"""
+    
+    TIMES = [f"2024-06-01T{hour:02d}:00" for hour in range(0, 18, 3)]
+    
+    def _add_beach(self, db_session, name, lat, wave_heights, wave_periods):
+        beach = Beach(beach_name=name, town="Test Town", state="NJ", lat=lat, long=-74.0, beach_angle=0.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        points = len(self.TIMES)
+        CacheService.store_cached_data(db_session, beach.id, "wind_data", {"hourly": {
+            "time": self.TIMES, "wind_speed_10m": [8.0] * points, "wind_direction_10m": [270] * points
+        }})
+        CacheService.store_cached_data(db_session, beach.id, "wave_data", {"hourly": {
+            "time": self.TIMES, "wave_height": wave_heights, "wave_direction": [90] * points, "wave_period": wave_periods
+        }})
+        return beach
+    
+    def test_windows_merged_and_ranked(self, db_session):
+        """Test that good hours merge into windows and green windows rank first"""
+        # Offshore wind scores 2; period >= 10 adds 2 (green), 7-9 adds nothing (yellow)
+        self._add_beach(db_session, "Beach A", 39.0, [0.5, 3.0, 3.0, 0.5, 2.0, 2.0], [12.0, 12.0, 12.0, 12.0, 8.0, 8.0])
+        self._add_beach(db_session, "Beach B", 40.0, [2.0] * 6, [8.0] * 6)
+        
+        windows = SearchService.find_windows(db_session, datetime(2024, 6, 1, 1, 30), datetime(2024, 6, 2), limit=3)
+        
+        assert [(w.beach_name, w.grade, w.score) for w in windows] == [
+            ("Beach A", "green", 8.0), ("Beach B", "yellow", 12.0), ("Beach A", "yellow", 4.0)
+        ]
+        assert windows[0].start == datetime(2024, 6, 1, 3, 0)
+        assert windows[0].end == datetime(2024, 6, 1, 9, 0)
+        # The window under way at the start of the search is clipped to it
+        assert windows[1].start == datetime(2024, 6, 1, 1, 30)
+        assert windows[1].end == datetime(2024, 6, 1, 18, 0)
+    
+    def test_min_grade_and_radius_filters(self, db_session):
+        """Test filtering to green windows and to beaches near a point"""
+        self._add_beach(db_session, "Beach A", 39.0, [3.0] * 6, [12.0] * 6)
+        self._add_beach(db_session, "Beach B", 40.0, [3.0] * 6, [12.0] * 6)
+        self._add_beach(db_session, "Beach C", 41.0, [2.0] * 6, [8.0] * 6)
+        
+        windows = SearchService.find_windows(db_session, datetime(2024, 6, 1), datetime(2024, 6, 2), min_grade="green", near=(40.0, -74.0), radius_km=150)
+        
+        assert [w.beach_name for w in windows] == ["Beach B", "Beach A"]
+        assert windows[0].distance_km == pytest.approx(0.0)
+        assert windows[1].distance_km == pytest.approx(111.2, abs=0.5)
+    
+    def test_search_endpoint(self, client, db_session, api_key):
+        """Test the search endpoint's parameter checks and cache-only behavior"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(Beach(beach_name="Uncached Beach", town="Test Town", state="NJ", lat=39.0, long=-74.0, beach_angle=0.0, station_id="1"))
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        assert client.get("/api/v1/search/windows", params={"lat": 39.0}, headers=headers).status_code == 400
+        with patch('app.services.weather_service.WeatherService.get_wind_data') as mock_wind:
+            response = client.get("/api/v1/search/windows", params={"days": 2}, headers=headers)
+            mock_wind.assert_not_called()
+        
+        assert response.status_code == 200
+        assert response.json()["windows"] == []
+
+class TestTideCurve:
+    """Test cases for tide heights interpolated from hi/lo predictions"""
+    
+    PREDICTIONS = [
+        {"time": "2024-06-01 00:00", "height": "4.0", "type": "high"},
+        {"time": "2024-06-01 06:00", "height": "0.0", "type": "low"},
+        {"time": "2024-06-01 12:00", "height": "5.0", "type": "high"}
+    ]
+    
+    def test_cosine_between_turning_points(self):
+        """Test that heights follow half a cosine between a high and a low"""
+        curve = TideCurve.from_predictions(self.PREDICTIONS)
+        heights = curve.heights_at([
+            datetime(2024, 6, 1, 0, 0), datetime(2024, 6, 1, 3, 0), datetime(2024, 6, 1, 6, 0),
+            datetime(2024, 6, 1, 9, 0), datetime(2024, 6, 1, 8, 0)
+        ])
+        
+        assert heights[:4] == [4.0, 2.0, 0.0, 2.5]
+        assert heights[4] == pytest.approx(1.25)
+    
+    def test_half_cycle_extrapolated_either_side(self):
+        """Test the mirrored half cycle at each end and no height beyond it"""
+        curve = TideCurve.from_predictions(self.PREDICTIONS)
+        
+        assert curve.start == datetime(2024, 5, 31, 18, 0)
+        assert curve.end == datetime(2024, 6, 1, 18, 0)
+        assert curve.heights_at([datetime(2024, 5, 31, 21, 0), datetime(2024, 6, 1, 18, 0)]) == [2.0, 0.0]
+        assert curve.heights_at([datetime(2024, 5, 31, 17, 0), datetime(2024, 6, 1, 19, 0)]) == [None, None]
+    
+    def test_needs_two_turning_points(self):
+        """Test that a single or unusable prediction gives no curve"""
+        assert TideCurve.from_predictions(self.PREDICTIONS[:1]) is None
+        assert TideCurve.from_predictions({"error": "x"}) is None
+    
+    def test_tide_curve_endpoint(self, client, db_session, api_key):
+        """Test evenly spaced and explicit-time requests against stored tides"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        TideService.store_predictions(db_session, "1", self.PREDICTIONS, date(2024, 5, 31), 3)
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        response = client.get(
+            "/api/v1/surf-data/Test Beach/tides/curve",
+            params={"start": "2024-06-01T00:00", "end": "2024-06-01T06:00", "resolution_minutes": 180},
+            headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["data"] == {"time": ["2024-06-01T00:00", "2024-06-01T03:00", "2024-06-01T06:00"], "height": [4.0, 2.0, 0.0]}
+        assert response.json()["cached"] is True
+        
+        response = client.get("/api/v1/surf-data/Test Beach/tides/curve", params={"at": ["2024-06-01T09:00"]}, headers=headers)
+        assert response.json()["data"]["height"] == [2.5]
+        
+        response = client.get("/api/v1/surf-data/Test Beach/tides/curve", params={"resolution_minutes": 1, "end": "2024-06-10T00:00"}, headers=headers)
+        assert response.status_code == 400
+
+class TestTideService:
+    """Test cases for tide predictions stored per station and day"""
+    
+    def _predictions(self, first_day, days):
+        return [
+            {"time": f"{first_day + timedelta(days=offset)} {hour:02d}:00", "height": "3.0", "type": "high" if hour < 12 else "low"}
+            for offset in range(days) for hour in (5, 17)
+        ]
+    
+    def test_one_fetch_serves_many_days(self, db_session):
+        """Test that a miss fetches weeks ahead and later days come from the store"""
+        first_day = date(2024, 6, 1)
+        with patch.object(settings, "TIDE_PREFETCH_DAYS", 14), \
+                patch('app.services.weather_service.WeatherService.get_tide_data', return_value=self._predictions(first_day, 14)) as mock_tide:
+            tides, stored = TideService.get_tides(db_session, "8534720", first_day)
+            assert stored is False
+            assert [tide["time"] for tide in tides] == ["2024-06-01 05:00", "2024-06-01 17:00"]
+            
+            tides, stored = TideService.get_tides(db_session, "8534720", date(2024, 6, 10))
+            assert stored is True
+            assert tides[0]["time"] == "2024-06-10 05:00"
+            
+            days, stored = TideService.get_days(db_session, "8534720", date(2024, 6, 13), date(2024, 6, 14))
+            assert stored is True
+            assert len(days[date(2024, 6, 14)]) == 2
+        
+        mock_tide.assert_called_once_with("8534720", begin_date=first_day, days=14)
+    
+    def test_upstream_error_stores_nothing(self, db_session):
+        """Test that a failed fetch is reported and retried next time"""
+        with patch('app.services.weather_service.WeatherService.get_tide_data', return_value={"error": "down"}) as mock_tide:
+            assert TideService.get_tides(db_session, "1", date(2024, 6, 1)) == (None, False)
+            assert TideService.get_tides(db_session, "1", date(2024, 6, 1)) == (None, False)
+        assert mock_tide.call_count == 2
+    
+    def test_beach_tide_cache_expires_at_end_of_station_day(self, client, db_session, api_key):
+        """Test that today's tides aren't served after the station's midnight, and other days are served from the store"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        today = TideService.today()
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        with patch('app.services.weather_service.WeatherService.get_tide_data', return_value=self._predictions(today, 3)) as mock_tide:
+            response = client.get("/api/v1/surf-data/Test Beach/tides", headers=headers)
+            tomorrow = client.get("/api/v1/surf-data/Test Beach/tides", params={"date": str(today + timedelta(days=1))}, headers=headers)
+        
+        assert response.json()["data"][0]["time"] == f"{today} 05:00"
+        assert tomorrow.json()["data"][0]["time"] == f"{today + timedelta(days=1)} 05:00"
+        assert tomorrow.json()["cached"] is True
+        mock_tide.assert_called_once()
+        
+        cached = CacheService.get_cached_data(db_session, beach.id, "tide_data")
+        assert cached["expires_at"] <= TideService.end_of_today()
+
+class TestAdminApi:
+    """Test cases for the admin cache endpoints"""
+    
+    ADMIN_KEY = "admin_api_key_12345"
+    
+    @pytest.fixture
+    def headers(self, db_session, api_key):
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(self.ADMIN_KEY), name="admin_key", is_active=True, is_admin=True))
+        db_session.add(Beach(beach_name="Beach A", town="Test Town", state="NJ", lat=39.0, long=-74.0, beach_angle=90.0, station_id="100"))
+        db_session.add(Beach(beach_name="Beach B", town="Test Town", state="NJ", lat=39.1, long=-74.0, beach_angle=90.0, station_id="200"))
+        db_session.commit()
+        return {"Authorization": f"Bearer {self.ADMIN_KEY}"}
+    
+    def _beach(self, db_session, name):
+        return db_session.query(Beach).filter(Beach.beach_name == name).one()
+    
+    def test_requires_admin_key(self, client, headers, api_key):
+        """Test that ordinary keys are refused"""
+        response = client.get("/api/v1/admin/cache", headers={"Authorization": f"Bearer {api_key}"})
+        assert response.status_code == 403
+        assert client.get("/api/v1/admin/cache", headers=headers).status_code == 200
+    
+    def test_list_and_invalidate_by_station(self, client, db_session, headers):
+        """Test listing entries and invalidating a station's tides, stored days included"""
+        beach_a, beach_b = self._beach(db_session, "Beach A"), self._beach(db_session, "Beach B")
+        for beach in (beach_a, beach_b):
+            CacheService.store_cached_data(db_session, beach.id, "tide_data", [{"time": "2024-06-01 05:00"}])
+            CacheService.store_cached_data(db_session, beach.id, "wind_data", {"hourly": {}})
+        CacheService.store_cached_data(db_session, beach_a.id, "forecast", {"times": ""})
+        db_session.add(TidePrediction(station_id="100", day=date(2024, 6, 1), predictions=[], fetched_at=datetime.now(timezone.utc)))
+        db_session.commit()
+        
+        response = client.get("/api/v1/admin/cache", params={"beach": "Beach A", "data_type": ["tide_data", "wind_data"]}, headers=headers)
+        body = response.json()
+        assert body["total"] == 2
+        assert {entry["data_type"] for entry in body["entries"]} == {"tide_data", "wind_data"}
+        assert body["entries"][0]["beach_name"] == "Beach A"
+        assert body["entries"][0]["expired"] is False
+        
+        assert client.post("/api/v1/admin/cache/invalidate", json={}, headers=headers).status_code == 400
+        response = client.post("/api/v1/admin/cache/invalidate", json={"station_ids": ["100"], "data_types": ["tide_data"]}, headers=headers)
+        assert response.json() == {"deleted": 1, "tide_days_deleted": 1}
+        assert CacheService.get_cached_data(db_session, beach_b.id, "tide_data") is not None
+        
+        # The parsed forecast goes with the wind data it was built from
+        response = client.post("/api/v1/admin/cache/invalidate", json={"beach_names": ["Beach A"], "data_types": ["wind_data"]}, headers=headers)
+        assert response.json()["deleted"] == 2
+        assert CacheService.get_cached_data(db_session, beach_a.id, "forecast") is None
+    
+    def test_refresh_replaces_entries(self, client, db_session, headers):
+        """Test that a refresh refetches only the selected beaches and data types"""
+        beach_a = self._beach(db_session, "Beach A")
+        CacheService.store_cached_data(db_session, beach_a.id, "temp_data", {"old": True})
+        
+        assert client.post("/api/v1/admin/cache/refresh", json={"data_types": ["temp_data"]}, headers=headers).status_code == 400
+        with patch('app.services.weather_service.WeatherService.get_temperature_data', return_value={"new": True}) as mock_temp, \
+                patch('app.services.weather_service.WeatherService.get_wind_data') as mock_wind:
+            response = client.post(
+                "/api/v1/admin/cache/refresh",
+                json={"beach_names": ["Beach A"], "data_types": ["temp_data"]},
+                headers=headers
+            )
+        
+        assert response.status_code == 202
+        assert response.json() == {"beaches": 1, "data_types": ["temp_data"]}
+        mock_temp.assert_called_once()
+        mock_wind.assert_not_called()
+        db_session.expire_all()
+        assert CacheService.get_cached_data(db_session, beach_a.id, "temp_data")["data"] == {"new": True}
+    
+    def test_refresh_keeps_stored_tides_until_replaced(self, db_session, headers):
+        """Test that a shed or failed tide refetch leaves the stored days in place"""
+        beach_a = self._beach(db_session, "Beach A")
+        today = TideService.today()
+        old = [{"time": f"{today} 04:00", "height": "1.0", "type": "low"}]
+        db_session.add(TidePrediction(station_id="100", day=today, predictions=old, fetched_at=datetime.now(timezone.utc)))
+        db_session.commit()
+        bind = db_session.get_bind()
+        
+        for failure in ({"side_effect": UpstreamOverloaded("timeout", retry_after=1.0)}, {"return_value": {"error": "down"}}):
+            with patch('app.services.weather_service.WeatherService.get_tide_data', **failure):
+                assert AdminService.refresh(bind, [beach_a.id], ["tide_data"]) == 0
+            db_session.expire_all()
+            assert db_session.get(TidePrediction, ("100", today)).predictions == old
+        
+        new = [{"time": f"{today} 06:00", "height": "8.5", "type": "high"}]
+        with patch('app.services.weather_service.WeatherService.get_tide_data', return_value=new):
+            assert AdminService.refresh(bind, [beach_a.id], ["tide_data"]) == 1
+        db_session.expire_all()
+        assert db_session.get(TidePrediction, ("100", today)).predictions == new
+        assert CacheService.get_cached_data(db_session, beach_a.id, "tide_data")["data"] == new
+    
+    def test_stats_per_key(self, client, db_session, headers):
+        """Test per-entry hit, stale and miss counts"""
+        beach_a = self._beach(db_session, "Beach A")
+        CacheService.get_cached_data(db_session, beach_a.id, "wind_data")
+        CacheService.store_cached_data(db_session, beach_a.id, "wind_data", {"hourly": {}})
+        CacheService.get_cached_data(db_session, beach_a.id, "wind_data")
+        CacheService.get_cached_data(db_session, beach_a.id, "wind_data")
+        
+        response = client.get("/api/v1/admin/cache/stats", params={"data_type": "wind_data"}, headers=headers)
+        body = response.json()
+        assert body["keys"] == [{
+            "beach_id": beach_a.id, "beach_name": "Beach A", "data_type": "wind_data",
+            "hits": 2, "stale": 0, "misses": 1, "hit_ratio": 0.6667
+        }]
+        assert body["totals"]["wind_data"]["hit"] >= 2
+
 class TestAuthService:
     """Test cases for the authentication service"""
     
@@ -203,4 +920,528 @@ class TestAuthService:
     def test_validate_api_key_nonexistent(self, db_session):
         """Test validating a non-existent API key"""
         is_valid = AuthService.validate_api_key(db_session, "nonexistent_key")
-        assert is_valid == False 
\ No newline at end of file
+        assert is_valid == False
+
+class TestRateLimiter:
+    """Test cases for the per-key rate limiters"""
+    
+    def _create_key(self, db_session, **limits):
+        api_key = APIKey(key_hash=AuthService.hash_api_key("limited_key"), name="limited_key", is_active=True, **limits)
+        db_session.add(api_key)
+        db_session.commit()
+        return api_key
+    
+    @pytest.mark.parametrize("limiter_class", [InMemoryRateLimiter, DatabaseRateLimiter])
+    def test_token_bucket_rejects_after_burst(self, db_session, limiter_class):
+        """Test that a key is rejected once its burst is spent"""
+        api_key = self._create_key(db_session, rate_limit_per_minute=60, rate_limit_burst=2, max_concurrent_requests=0)
+        limiter = limiter_class()
+        
+        for _ in range(2):
+            assert limiter.acquire(db_session, api_key).allowed
+            limiter.release(db_session, api_key)
+        
+        decision = limiter.acquire(db_session, api_key)
+        assert not decision.allowed
+        assert decision.reason == "rate"
+        assert 0 < decision.retry_after <= 1.0
+    
+    @pytest.mark.parametrize("limiter_class", [InMemoryRateLimiter, DatabaseRateLimiter])
+    def test_concurrency_cap(self, db_session, limiter_class):
+        """Test that in-flight slots are capped and freed on release"""
+        api_key = self._create_key(db_session, rate_limit_per_minute=0, max_concurrent_requests=2)
+        limiter = limiter_class()
+        
+        assert limiter.acquire(db_session, api_key).allowed
+        assert limiter.acquire(db_session, api_key).allowed
+        
+        decision = limiter.acquire(db_session, api_key)
+        assert not decision.allowed
+        assert decision.reason == "concurrency"
+        
+        limiter.release(db_session, api_key)
+        assert limiter.acquire(db_session, api_key).allowed
+    
+    def test_expired_lease_frees_slot(self, db_session):
+        """Test that a slot never released (worker killed mid-request) frees itself"""
+        api_key = self._create_key(db_session, rate_limit_per_minute=0, max_concurrent_requests=1)
+        
+        assert DatabaseRateLimiter().acquire(db_session, api_key).allowed
+        assert DatabaseRateLimiter().acquire(db_session, api_key).reason == "concurrency"
+        
+        # Same situation, but the abandoned lease has run out
+        crashed = DatabaseRateLimiter(lease_seconds=0)
+        limiter = DatabaseRateLimiter()
+        limiter.release(db_session, api_key)
+        assert crashed.acquire(db_session, api_key).allowed
+        decision = limiter.acquire(db_session, api_key)
+        assert decision.allowed
+        
+        limiter.release(db_session, api_key, decision.lease_id)
+        assert db_session.query(RateLimitLease).count() == 0
+    
+    def test_database_limiter_shared_between_instances(self, db_session):
+        """Test that separate limiter instances (workers) share one bucket"""
+        api_key = self._create_key(db_session, rate_limit_per_minute=60, rate_limit_burst=1, max_concurrent_requests=0)
+        
+        assert DatabaseRateLimiter().acquire(db_session, api_key).allowed
+        assert not DatabaseRateLimiter().acquire(db_session, api_key).allowed
+    
+    def test_rate_limited_request_returns_429(self, client, db_session):
+        """Test that requests over the limit get 429 with Retry-After"""
+        self._create_key(db_session, rate_limit_per_minute=1, rate_limit_burst=1)
+        headers = {"Authorization": "Bearer limited_key"}
+        
+        assert client.get("/api/v1/beaches/", headers=headers).status_code == 200
+        
+        response = client.get("/api/v1/beaches/", headers=headers)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+class TestMetrics:
+    """Test cases for the metrics registry and endpoint"""
+    
+    def test_histogram_exposition(self):
+        """Test Prometheus text rendering of a labelled histogram"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_latency_seconds", "Test latency", ["route"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        
+        text = registry.render()
+        assert "# TYPE test_latency_seconds histogram" in text
+        assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+        assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 2' in text
+        assert 'test_latency_seconds_count{route="/a"} 2' in text
+    
+    def test_cache_lookup_results_counted(self, db_session):
+        """Test that cache hits, misses and stale hits are counted per data type"""
+        beach = Beach(
+            beach_name="Test Beach",
+            town="Test Town",
+            state="NJ",
+            lat=39.345894,
+            long=-74.41759,
+            beach_angle=90.0,
+            station_id="test_station"
+        )
+        db_session.add(beach)
+        db_session.commit()
+        
+        before = {result: CACHE_LOOKUPS.value(data_type="metrics_type", result=result) for result in ("hit", "miss", "stale")}
+        
+        CacheService.get_cached_data(db_session, beach.id, "metrics_type")
+        CacheService.store_cached_data(db_session, beach.id, "metrics_type", {"test": "data"})
+        CacheService.get_cached_data(db_session, beach.id, "metrics_type")
+        db_session.query(CachedData).update({"expires_at": datetime.now(timezone.utc) - timedelta(hours=1)})
+        db_session.commit()
+        CacheService.get_cached_data(db_session, beach.id, "metrics_type")
+        
+        for result in ("hit", "miss", "stale"):
+            assert CACHE_LOOKUPS.value(data_type="metrics_type", result=result) == before[result] + 1
+    
+    def test_metrics_endpoint_reports_route_latency(self, client):
+        """Test that the metrics endpoint exposes per-route request latency"""
+        client.get("/health")
+        
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert REQUEST_LATENCY.count(method="GET", route="/health", status="200") >= 1
+        assert 'route="/health"' in response.text
+        assert "swellseeker_db_query_duration_seconds" in response.text
+
+class TestUpstreamTransport:
+    """Test cases for the record/replay upstream transport"""
+    
+    WIND_URL = "https://api.open-meteo.com/v1/forecast?longitude=-74.4&latitude=39.3&hourly=wind_speed_10m"
+    
+    def _live_response(self, payload, status_code=200):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(payload).encode()
+        response.headers["Content-Type"] = "application/json"
+        return response
+    
+    def test_normalize_url_sorts_query_and_drops_default_port(self):
+        """Test that equivalent URLs share a fixture key"""
+        assert normalize_url("HTTPS://API.Example.com:443/v1?b=2&a=1") == "https://api.example.com/v1?a=1&b=2"
+        assert normalize_url("http://localhost:9100/x") == "http://localhost:9100/x"
+    
+    def test_record_then_replay(self, tmp_path):
+        """Test that recorded responses replay without touching the network"""
+        payload = {"hourly": {"time": ["2025-01-01T00:00"], "wind_speed_10m": [10.0]}}
+        store = FixtureStore(str(tmp_path))
+        live = MagicMock()
+        live.get.return_value = self._live_response(payload)
+        
+        RecordingTransport(store, live=live).get(self.WIND_URL)
+        assert len(list(tmp_path.glob("*.json.gz"))) == 1
+        
+        # Same request with the query parameters in a different order
+        reordered = "https://api.open-meteo.com/v1/forecast?hourly=wind_speed_10m&latitude=39.3&longitude=-74.4"
+        with patch("requests.get", side_effect=AssertionError("network used")):
+            response = ReplayTransport(store).get(reordered)
+        
+        assert response.status_code == 200
+        assert response.json() == payload
+    
+    def test_replay_missing_fixture_raises_connection_error(self, tmp_path):
+        """Test that an unrecorded URL fails like an unreachable upstream"""
+        with pytest.raises(requests.exceptions.ConnectionError):
+            ReplayTransport(FixtureStore(str(tmp_path))).get(self.WIND_URL)
+    
+    def test_replay_simulated_latency(self, tmp_path):
+        """Test that replay mode can add a fixed delay"""
+        store = FixtureStore(str(tmp_path))
+        live = MagicMock()
+        live.get.return_value = self._live_response({"ok": True})
+        RecordingTransport(store, live=live).get(self.WIND_URL)
+        
+        with patch("app.services.upstream_transport.time.sleep") as mock_sleep:
+            ReplayTransport(store, latency_ms=250).get(self.WIND_URL)
+        mock_sleep.assert_called_once_with(0.25)
+    
+    def test_live_transport_times_out(self):
+        """Test that live calls are always sent with a bounded timeout"""
+        with patch("app.services.upstream_transport.requests.get") as mock_get, \
+                patch.object(settings, "UPSTREAM_TIMEOUT_SECONDS", 7.5):
+            LiveTransport().get(self.WIND_URL)
+            LiveTransport(timeout=2.0).get(self.WIND_URL)
+        assert [call.kwargs["timeout"] for call in mock_get.call_args_list] == [7.5, 2.0]
+    
+    def test_weather_service_uses_configured_transport(self, tmp_path):
+        """Test that WeatherService fetches through the process-wide transport"""
+        store = FixtureStore(str(tmp_path))
+        replay = ReplayTransport(store)
+        set_upstream_transport(replay)
+        try:
+            # Nothing recorded yet: reported as an error, never a live call
+            assert "error" in WeatherService.get_wind_data(39.3, -74.4)
+            
+            live = MagicMock()
+            live.get.side_effect = lambda url: self._live_response({"hourly": {"wind_speed_10m": [5.0]}})
+            set_upstream_transport(RecordingTransport(store, live=live))
+            WeatherService.get_wind_data(39.3, -74.4)
+            
+            set_upstream_transport(replay)
+            assert WeatherService.get_wind_data(39.3, -74.4) == {"hourly": {"wind_speed_10m": [5.0]}}
+        finally:
+            set_upstream_transport(None)
+
+class TestUpstreamAdmission:
+    """Test cases for upstream admission control and load shedding"""
+    
+    @pytest.fixture(autouse=True)
+    def restore_admission(self):
+        yield
+        set_upstream_admission(None)
+    
+    def test_queue_full_is_rejected_immediately(self):
+        """Test that calls beyond the slots and queue are refused without waiting"""
+        admission = UpstreamAdmission(max_concurrent=1, queue_size=0, queue_timeout=5.0)
+        admission.acquire()
+        
+        with pytest.raises(UpstreamOverloaded) as rejected:
+            admission.acquire()
+        assert rejected.value.reason == "queue_full"
+        assert UPSTREAM_ADMISSION_REJECTIONS.value(reason="queue_full") >= 1
+        
+        admission.release()
+        admission.acquire()
+        assert admission.in_flight == 1
+    
+    def test_queued_call_waits_for_a_slot_until_deadline(self):
+        """Test that a queued call gets a freed slot, and gives up at its deadline"""
+        admission = UpstreamAdmission(max_concurrent=1, queue_size=1, queue_timeout=5.0)
+        admission.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (admission.acquire(), acquired.set()))
+        waiter.start()
+        for _ in range(100):
+            if admission.waiting:
+                break
+            threading.Event().wait(0.01)
+        assert admission.waiting == 1
+        assert UPSTREAM_QUEUE_DEPTH.value() == 1
+        
+        admission.release()
+        waiter.join(timeout=5)
+        assert acquired.is_set()
+        assert admission.waiting == 0
+        
+        admission.queue_timeout = 0.05
+        with pytest.raises(UpstreamOverloaded) as rejected:
+            admission.acquire()
+        assert rejected.value.reason == "timeout"
+    
+    def test_shed_request_serves_stale_data_or_503(self, client, db_session, api_key):
+        """Test that a shed fetch falls back to expired cache, else fails fast with 503"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        with patch.object(CacheService, "CACHE_DURATION_HOURS", -1):
+            CacheService.store_cached_data(db_session, beach.id, "wind_data", {"hourly": {"old": True}})
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        # Every slot taken and no room to queue
+        admission = UpstreamAdmission(max_concurrent=1, queue_size=0, queue_timeout=1.0)
+        admission.acquire()
+        set_upstream_admission(admission)
+        with patch('app.services.upstream_transport.LiveTransport.get') as mock_get:
+            wind = client.get("/api/v1/surf-data/Test Beach/wind", headers=headers)
+            waves = client.get("/api/v1/surf-data/Test Beach/waves", headers=headers)
+            mock_get.assert_not_called()
+        
+        assert wind.status_code == 200
+        assert wind.json()["data"] == {"hourly": {"old": True}}
+        assert wind.json()["stale"] is True
+        assert waves.status_code == 503
+        assert waves.headers["Retry-After"] == "1"
+
+class TestInitDb:
+    """Test cases for guarded, idempotent database initialization"""
+    
+    def _write_catalog(self, path, names):
+        items = [{
+            "PutRequest": {"Item": {
+                "beach_name": {"S": name},
+                "town": {"S": "Test Town"},
+                "state": {"S": "NJ"},
+                "lat": {"N": "39.3"},
+                "long": {"N": "-74.4"},
+                "beach_angle": {"N": "90"},
+                "station_id": {"N": "8534720"}
+            }}
+        } for name in names]
+        path.write_text(json.dumps(items))
+    
+    def test_second_start_issues_no_writes(self, tmp_path):
+        """Test that workers starting against an initialized database only read"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}")
+        catalog = tmp_path / "beaches.json"
+        self._write_catalog(catalog, ["Beach A", "Beach B"])
+        
+        assert init_db(bind=engine, beaches_file=str(catalog)) is True
+        
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        assert init_db(bind=engine, beaches_file=str(catalog)) is False
+        
+        assert len(statements) == 1
+        assert statements[0].lstrip().upper().startswith("SELECT")
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT COUNT(*) FROM beaches").scalar() == 2
+    
+    def test_changed_catalog_reinitializes(self, tmp_path):
+        """Test that a new seed file is picked up on the next start"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}")
+        catalog = tmp_path / "beaches.json"
+        self._write_catalog(catalog, ["Beach A"])
+        init_db(bind=engine, beaches_file=str(catalog))
+        
+        self._write_catalog(catalog, ["Beach A", "Beach C"])
+        assert init_db(bind=engine, beaches_file=str(catalog)) is True
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT COUNT(*) FROM beaches").scalar() == 2
+
+    def test_failed_seed_import_is_retried(self, tmp_path):
+        """Test that a seed file that fails to import doesn't get marked as done"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}")
+        catalog = tmp_path / "beaches.json"
+        self._write_catalog(catalog, ["Beach A", "Beach B"])
+        content = catalog.read_text()
+        catalog.write_text(content[:len(content) // 2])
+        
+        init_db(bind=engine, beaches_file=str(catalog))
+        
+        # Same (broken) file: still not marked as done, so this start retries
+        assert init_db(bind=engine, beaches_file=str(catalog)) is True
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT COUNT(*) FROM db_markers").scalar() == 0
+    
+    def test_existing_api_keys_table_gains_rate_limit_columns(self, tmp_path):
+        """Test that a database from before per-key limits is upgraded in place"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE api_keys (id INTEGER PRIMARY KEY, key_hash VARCHAR UNIQUE NOT NULL, "
+                "name VARCHAR NOT NULL, is_active BOOLEAN, created_at DATETIME, last_used DATETIME)"
+            )
+            conn.exec_driver_sql("INSERT INTO api_keys (key_hash, name, is_active) VALUES ('hash', 'old_key', 1)")
+        
+        init_db(bind=engine, beaches_file=str(tmp_path / "missing.json"))
+        
+        with Session(bind=engine) as db:
+            api_key = db.query(APIKey).one()
+            assert api_key.name == "old_key"
+            assert api_key.rate_limit_per_minute is None
+            assert api_key.max_concurrent_requests is None
+
+class TestCatalogImporter:
+    """Test cases for the streaming bulk catalog importer"""
+    
+    def _record(self, name, angle="90", town="Test Town"):
+        return {"PutRequest": {"Item": {
+            "beach_name": {"S": name},
+            "town": {"S": town},
+            "state": {"S": "NJ"},
+            "lat": {"N": "39.3"},
+            "long": {"N": "-74.4"},
+            "beach_angle": {"N": angle},
+            "station_id": {"N": "8534720"}
+        }}}
+    
+    def test_iter_json_array_across_small_reads(self):
+        """Test that records split across read boundaries are parsed intact"""
+        records = [self._record(f"Beach {index}") for index in range(25)]
+        parsed = list(iter_json_array(io.StringIO(json.dumps(records, indent=2)), read_size=7))
+        assert parsed == records
+    
+    def test_upsert_reports_inserted_updated_unchanged(self, tmp_path):
+        """Test that re-importing updates changed beaches instead of skipping them"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+        Base.metadata.create_all(bind=engine)
+        catalog = tmp_path / "beaches.json"
+        
+        catalog.write_text(json.dumps([self._record("Beach A"), self._record("Beach B")]))
+        report = import_catalog(str(catalog), bind=engine, chunk_size=1)
+        assert (report.inserted, report.updated, report.unchanged) == (2, 0, 0)
+        
+        catalog.write_text(json.dumps([
+            self._record("Beach A"),
+            self._record("Beach B", angle="135.5"),
+            self._record("Beach C")
+        ]))
+        report = import_catalog(str(catalog), bind=engine)
+        assert (report.inserted, report.updated, report.unchanged) == (1, 1, 1)
+        
+        with engine.connect() as conn:
+            angle, updated_at = conn.exec_driver_sql(
+                "SELECT beach_angle, updated_at FROM beaches WHERE beach_name = 'Beach B'"
+            ).one()
+        assert angle == 135.5
+        assert updated_at is not None
+    
+    def test_csv_import_counts_invalid_records(self, tmp_path):
+        """Test CSV import with a record that fails validation"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+        Base.metadata.create_all(bind=engine)
+        catalog = tmp_path / "spots.csv"
+        catalog.write_text(
+            "beach_name,town,state,lat,long,beach_angle,station_id\n"
+            "Beach A,Town,NJ,39.3,-74.4,90,8534720\n"
+            "Beach B,Town,NJ,not-a-number,-74.4,90,8534720\n"
+        )
+        
+        report = import_catalog(str(catalog), bind=engine)
+        assert (report.inserted, report.invalid) == (1, 1)
+        assert report.errors[0].startswith("Beach B")
+
+class TestBatchGrading:
+    """Test cases for the offline batch grading CLI"""
+    
+    HEADER = "beach_id,time,beach_angle,wind_speed_10m,wind_direction_10m,wave_height,wave_period\n"
+    
+    def _write_history(self, path, hours=30):
+        rows = [
+            f"{1 + hour % 2},2024-06-01T{hour % 24:02d}:00,90,{4 + hour % 15},{(hour * 37) % 360},{0.5 + (hour % 6) * 0.8},{6 + hour % 8}\n"
+            for hour in range(hours)
+        ]
+        rows.append("3,2024-06-02T00:00,90,,270,3.0,12\n")
+        path.write_text(self.HEADER + "".join(rows))
+        return hours + 1
+    
+    def test_csv_to_jsonl_across_worker_processes(self, tmp_path):
+        """Test grading a CSV in several chunks on a process pool keeps input order"""
+        history = tmp_path / "history.csv"
+        rows = self._write_history(history)
+        
+        report = grade_file(str(history), str(tmp_path / "grades.jsonl"), chunk_size=7, workers=2)
+        
+        assert (report.rows, report.missing, report.chunks) == (rows, 1, 5)
+        graded = [json.loads(line) for line in (tmp_path / "grades.jsonl").read_text().splitlines()]
+        assert [row["time"] for row in graded[:2]] == ["2024-06-01T00:00:00", "2024-06-01T01:00:00"]
+        second = graded[1]
+        assert second["beach_id"] == 2
+        assert second["grade"] == GradingService.get_wave_quality(37.0, 5.0, 7.0, 90.0, 1.3)
+        assert second["score"] == GradingService.get_wave_score(37.0, 5.0, 7.0, 90.0)
+        assert graded[-1] == {"beach_id": 3, "time": "2024-06-02T00:00:00", "grade": None, "score": None}
+        assert "rows/s" in report.summary()
+    
+    def test_columnar_round_trip(self, tmp_path):
+        """Test columnar input and output use archive segments"""
+        start = int(datetime(2024, 6, 1, tzinfo=timezone.utc).timestamp())
+        (tmp_path / "history.seg").write_bytes(encode_segment(0, [start, start + 3600], {
+            "beach_id": [7.0, 7.0],
+            "beach_angle": [90.0, 90.0],
+            "wind_speed_10m": [4.0, 20.0],
+            "wind_direction_10m": [0.0, 180.0],
+            "wave_height": [5.0, 0.5],
+            "wave_period": [12.0, 6.0]
+        }))
+        
+        report = grade_file(str(tmp_path / "history.seg"), str(tmp_path / "grades.seg"), workers=1)
+        
+        assert report.rows == 2
+        (_, times, columns), = decode_segments((tmp_path / "grades.seg").read_bytes())
+        assert list(times) == [start, start + 3600]
+        assert list(columns["beach_id"]) == [7.0, 7.0]
+        # Offshore light wind on a long period is green; a half-foot wave is red
+        assert list(columns["grade"]) == [2.0, 0.0]
+        assert columns["score"][0] == 4.4
+
+class TestReadReplicas:
+    """Test cases for routing reads to a read replica"""
+    
+    def _engines(self, tmp_path):
+        primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+        for engine in (primary, replica):
+            Base.metadata.create_all(bind=engine)
+        return primary, replica
+    
+    def _add_beach(self, engine, name):
+        with Session(bind=engine) as db:
+            beach = Beach(beach_name=name, town="Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="8534720")
+            db.add(beach)
+            db.commit()
+            return beach.id
+    
+    def test_beach_lookups_read_from_replica(self, tmp_path):
+        """Test beach lookups go to the replica and plain queries to the primary"""
+        primary, replica = self._engines(tmp_path)
+        self._add_beach(primary, "Primary Beach")
+        self._add_beach(replica, "Replica Beach")
+        
+        with RoutingSession(bind=primary, replicas=[replica]) as db:
+            assert CacheService.get_beach_by_name(db, "Replica Beach") is not None
+            beaches, _ = CacheService.list_beaches(db)
+            assert [beach.beach_name for beach in beaches] == ["Replica Beach"]
+            assert db.query(Beach.beach_name).scalar() == "Primary Beach"
+    
+    def test_cache_fill_is_read_back_from_primary(self, tmp_path):
+        """Test writes go to the primary and a just-filled entry isn't read from a lagging replica"""
+        primary, replica = self._engines(tmp_path)
+        beach_id = self._add_beach(primary, "Beach A")
+        self._add_beach(replica, "Beach A")
+        set_cache_backend(None)
+        recent_writes.reset()
+        
+        with RoutingSession(bind=primary, replicas=[replica]) as db:
+            assert CacheService.get_cached_data(db, beach_id, "wind_data") is None
+            CacheService.store_cached_data(db, beach_id, "wind_data", {"hourly": {}})
+            # Same session: everything after a write is read from the primary
+            assert CacheService.get_cached_data(db, beach_id, "wind_data") is not None
+        
+        with RoutingSession(bind=primary, replicas=[replica]) as db:
+            # Next request: the key was written moments ago, so the primary is used
+            assert CacheService.get_cached_data(db, beach_id, "wind_data") is not None
+            recent_writes.reset()
+            # Once the lag window has passed the replica (which never caught up here) is used
+            assert CacheService.get_cached_data(db, beach_id, "wind_data") is None
+        
+        with Session(bind=replica) as db:
+            assert db.query(CachedData).count() == 0
@@ -7,6 +7,15 @@ from app.models.beach import Beach
 from app.models.api_key import APIKey
 from app.models.cached_data import CachedData
 from app.services.auth_service import AuthService
+from app.core.config import settings
+from app.schemas.weather import SurfDataResponse, WindData
+from app.services.subscription_service import SubscriptionBroker, get_broker
+from app.services.rate_limit_service import get_rate_limiter
+from app.api.api_v1.endpoints import surf_data as surf_data_endpoints
+from app.services.admission_service import UpstreamOverloaded
+import asyncio
+import json
+import threading
 
 class TestSurfDataEndpoints:
     """Test cases for surf data endpoints"""
@@ -263,4 +272,426 @@ class TestSurfDataEndpoints:
             )
             
             # Should call external API since cache is expired
-            mock_wind.assert_called_once() 
\ No newline at end of file
+            mock_wind.assert_called_once()
+    
+    def test_get_surf_data_server_timing(self, client, db_session, api_key):
+        """Test that surf data responses break down time per phase"""
+        key_hash = AuthService.hash_api_key(api_key)
+        db_session.add(APIKey(key_hash=key_hash, name="test_key", is_active=True))
+        test_beach = Beach(
+            beach_name="Test Beach",
+            town="Test Town",
+            state="NJ",
+            lat=39.345894,
+            long=-74.41759,
+            beach_angle=90.0,
+            station_id="test_station"
+        )
+        db_session.add(test_beach)
+        db_session.commit()
+        
+        for data_type in ("wind_data", "wave_data", "tide_data", "temp_data"):
+            db_session.add(CachedData(
+                beach_id=test_beach.id,
+                data_type=data_type,
+                data={"test": data_type},
+                expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
+            ))
+        db_session.commit()
+        
+        response = client.get(
+            "/api/v1/surf-data/Test%20Beach",
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        for phase in ("auth", "db_beach", "cache_wind_data", "cache_temp_data", "serialize", "total"):
+            assert phase in phases
+    
+    def test_slow_request_logged_with_slow_phases(self, client, db_session, api_key, caplog):
+        """Test that requests over the threshold are logged with their slow phases"""
+        key_hash = AuthService.hash_api_key(api_key)
+        db_session.add(APIKey(key_hash=key_hash, name="test_key", is_active=True))
+        db_session.commit()
+        
+        with patch.object(settings, "SLOW_REQUEST_THRESHOLD_MS", 0), \
+                patch.object(settings, "SLOW_PHASE_THRESHOLD_MS", 0), \
+                caplog.at_level("WARNING", logger="swellseeker.slow_requests"):
+            client.get(
+                "/api/v1/surf-data/Nonexistent%20Beach",
+                headers={"Authorization": f"Bearer {api_key}"}
+            )
+        
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record["event"] == "slow_request"
+        assert record["route"] == "/api/v1/surf-data/{beach_name}"
+        assert record["status"] == 404
+        assert "auth" in record["slow_phases"]
+        assert "db_beach" in record["phases"]
+
+    @patch('app.services.weather_service.WeatherService.get_wind_data')
+    @patch('app.services.weather_service.WeatherService.get_wave_data')
+    def test_get_forecast_slice(self, mock_wave, mock_wind, client, db_session, api_key):
+        """Test the columnar forecast endpoint with a time range"""
+        times = ["2025-01-01T00:00", "2025-01-01T03:00", "2025-01-01T06:00"]
+        mock_wind.return_value = {"hourly": {"time": times, "wind_speed_10m": [5.0, 6.0, 7.0], "wind_direction_10m": [270, 270, 270]}}
+        mock_wave.return_value = {"hourly": {"time": times, "wave_height": [2.0, 3.0, 4.0], "wave_direction": [90, 90, 90], "wave_period": [9.0, 10.0, 11.0]}}
+        
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=90.0, station_id="1"))
+        db_session.commit()
+        
+        response = client.get(
+            "/api/v1/surf-data/Test%20Beach/forecast",
+            params={"start": "2025-01-01T03:00"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["data_type"] == "forecast"
+        assert data["data"]["time"] == ["2025-01-01T03:00", "2025-01-01T06:00"]
+        assert data["data"]["wave_height"] == [3.0, 4.0]
+
+    @patch('app.services.weather_service.WeatherService.get_wind_data')
+    @patch('app.services.weather_service.WeatherService.get_wave_data')
+    def test_get_current_conditions(self, mock_wave, mock_wind, client, db_session, api_key):
+        """Test that current conditions come from the hour covering the requested time"""
+        times = ["2025-01-01T00:00", "2025-01-01T03:00", "2025-01-01T06:00"]
+        mock_wind.return_value = {"hourly": {"time": times, "wind_speed_10m": [5.0, 6.0, 7.0], "wind_direction_10m": [270, 270, 90]}}
+        mock_wave.return_value = {"hourly": {"time": times, "wave_height": [2.0, 3.0, 4.0], "wave_direction": [90, 90, 90], "wave_period": [9.0, 10.0, 11.0]}}
+        
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.3, long=-74.4, beach_angle=0.0, station_id="1"))
+        db_session.commit()
+        
+        response = client.get(
+            "/api/v1/surf-data/Test%20Beach/now",
+            params={"at": "2025-01-01T04:15"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["time"] == "2025-01-01T03:00:00"
+        assert data["wind_speed"] == 6.0
+        assert data["wave_height"] == 3.0
+        assert data["grade"] == "green"
+
+    def test_slow_source_reported_pending_and_refreshed_in_background(self, client, db_session, api_key):
+        """Test that a source over the latency budget is left out, finishes later and is cached"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        test_beach = Beach(
+            beach_name="Test Beach",
+            town="Test Town",
+            state="NJ",
+            lat=39.345894,
+            long=-74.41759,
+            beach_angle=90.0,
+            station_id="test_station"
+        )
+        db_session.add(test_beach)
+        db_session.commit()
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        noaa_answered = threading.Event()
+        def slow_tides(*args, **kwargs):
+            noaa_answered.wait(timeout=10)
+            return [{"time": f"{args[1]} 06:00", "height": "8.5", "type": "high"}]
+        
+        with patch.object(settings, "SURF_DATA_BUDGET_MS", 200), \
+                patch('app.services.weather_service.WeatherService.get_wind_data', return_value={"hourly": {"time": ["2025-01-01T00:00"], "wind_speed_10m": [10.0], "wind_direction_10m": [270]}}), \
+                patch('app.services.weather_service.WeatherService.get_wave_data', return_value={"hourly": {"time": ["2025-01-01T00:00"], "wave_height": [3.0], "wave_direction": [90], "wave_period": [12.0]}}), \
+                patch('app.services.weather_service.WeatherService.get_temperature_data', return_value={"water_temp": "65.0", "air_temp": "70.0"}), \
+                patch('app.services.weather_service.WeatherService.get_tide_data', side_effect=slow_tides) as mock_tide:
+            first = client.get("/api/v1/surf-data/Test%20Beach", headers=headers).json()
+            # A second request joins the refresh already running
+            second = client.get("/api/v1/surf-data/Test%20Beach", headers=headers).json()
+            
+            noaa_answered.set()
+            for _ in range(500):
+                if not surf_data_endpoints._refreshes:
+                    break
+                threading.Event().wait(0.01)
+            third = client.get("/api/v1/surf-data/Test%20Beach", headers=headers).json()
+        
+        assert first["pending"] == ["tides"]
+        assert first["tides"] is None
+        assert first["grade"] is not None
+        assert second["pending"] == ["tides"]
+        assert third["pending"] == []
+        assert third["tides"]["cached"] is True
+        mock_tide.assert_called_once()
+    
+    def test_failing_source_leaves_only_its_field_empty(self, client, db_session, api_key):
+        """Test that a source shed with nothing cached doesn't fail the other sources"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(Beach(
+            beach_name="Test Beach",
+            town="Test Town",
+            state="NJ",
+            lat=39.345894,
+            long=-74.41759,
+            beach_angle=90.0,
+            station_id="test_station"
+        ))
+        db_session.commit()
+        
+        with patch('app.services.weather_service.WeatherService.get_wind_data', return_value={"hourly": {"time": ["2025-01-01T00:00"], "wind_speed_10m": [10.0], "wind_direction_10m": [270]}}), \
+                patch('app.services.weather_service.WeatherService.get_wave_data', return_value={"hourly": {"time": ["2025-01-01T00:00"], "wave_height": [3.0], "wave_direction": [90], "wave_period": [12.0]}}), \
+                patch('app.services.weather_service.WeatherService.get_temperature_data', return_value={"water_temp": "65.0", "air_temp": "70.0"}), \
+                patch('app.services.weather_service.WeatherService.get_tide_data', side_effect=UpstreamOverloaded("queue_full", retry_after=1.0)):
+            response = client.get("/api/v1/surf-data/Test%20Beach", headers={"Authorization": f"Bearer {api_key}"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["tides"] is None
+        assert data["pending"] == []
+        assert data["wind"]["data"]["hourly"]["wind_speed_10m"] == [10.0]
+        assert data["temperature"] is not None
+        assert data["grade"] is not None
+
+class TestExportEndpoint:
+    """Test cases for the NDJSON bulk export"""
+    
+    @patch('app.services.weather_service.WeatherService.get_wind_data')
+    @patch('app.services.weather_service.WeatherService.get_wave_data')
+    @patch('app.services.weather_service.WeatherService.get_tide_data')
+    @patch('app.services.weather_service.WeatherService.get_temperature_data')
+    def test_export_streams_one_line_per_beach(self, mock_temp, mock_tide, mock_wave, mock_wind, client, db_session, api_key):
+        """Test that cached beaches stream first and misses are fetched and cached"""
+        mock_wind.return_value = {"hourly": {"wind_speed_10m": [8.0], "wind_direction_10m": [270]}}
+        mock_wave.return_value = {"hourly": {"wave_height": [4.0], "wave_period": [12.0], "wave_direction": [90]}}
+        mock_tide.return_value = [{"time": "2024-01-01 06:00", "height": "4.5", "type": "high"}]
+        mock_temp.return_value = {"station_id": "1", "water_temp": "65.0", "air_temp": "72.0"}
+        
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beaches = [
+            Beach(beach_name=f"Beach {index}", town="Test Town", state="NJ", lat=39.0, long=-74.0, beach_angle=90.0, station_id="1")
+            for index in range(5)
+        ]
+        db_session.add_all(beaches)
+        db_session.commit()
+        
+        # Beach 4 is fully cached
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        for data_type, data in (
+            ("wind_data", mock_wind.return_value),
+            ("wave_data", mock_wave.return_value),
+            ("tide_data", mock_tide.return_value),
+            ("temp_data", mock_temp.return_value),
+        ):
+            db_session.add(CachedData(beach_id=beaches[4].id, data_type=data_type, data=data, expires_at=expires_at))
+        db_session.commit()
+        
+        with patch.object(settings, "EXPORT_BATCH_SIZE", 2):
+            response = client.get("/api/v1/export/surf-data", headers={"Authorization": f"Bearer {api_key}"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(record["beach_name"] for record in records) == [f"Beach {index}" for index in range(5)]
+        
+        # Beach 4 is alone in the last batch and needs no fetches
+        assert records[-1]["beach_name"] == "Beach 4"
+        assert records[-1]["wind"]["cached"] is True
+        assert all(record["grade"] in ("red", "yellow", "green") for record in records)
+        assert mock_wind.call_count == 4
+        assert db_session.query(CachedData).filter(CachedData.data_type == "wind_data").count() == 5
+        # All the beaches share one station, whose tides are fetched once and stored for later batches
+        assert mock_tide.call_count == 1
+    
+    def test_export_filters_by_state(self, client, db_session, api_key):
+        """Test that the export honours the state filter"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.add(Beach(beach_name="Montauk", town="Montauk", state="NY", lat=41.0, long=-71.9, beach_angle=180.0, station_id="1"))
+        db_session.commit()
+        
+        response = client.get(
+            "/api/v1/export/surf-data",
+            params={"state": "NJ"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == ""
+
+    def test_export_holds_in_flight_slot_while_streaming(self, client, db_session, api_key):
+        """Test that the key's concurrency slot covers the streamed body, not just the handler"""
+        key = APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True, max_concurrent_requests=1)
+        db_session.add(key)
+        db_session.add(Beach(beach_name="Beach A", town="Test Town", state="NJ", lat=39.0, long=-74.0, beach_angle=90.0, station_id="1"))
+        db_session.commit()
+        key_id = key.id
+        
+        in_flight_during_fetch = []
+        def fetch_wind(lat, long):
+            in_flight_during_fetch.append(get_rate_limiter()._in_flight.get(key_id, 0))
+            return {"error": "upstream down"}
+        
+        with patch('app.services.weather_service.WeatherService.get_wind_data', side_effect=fetch_wind), \
+                patch('app.services.weather_service.WeatherService.get_wave_data', return_value={"error": "x"}), \
+                patch('app.services.weather_service.WeatherService.get_tide_data', return_value={"error": "x"}), \
+                patch('app.services.weather_service.WeatherService.get_temperature_data', return_value={"error": "x"}):
+            response = client.get("/api/v1/export/surf-data", headers={"Authorization": f"Bearer {api_key}"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert in_flight_during_fetch == [1]
+        # Released once the body was sent
+        assert get_rate_limiter()._in_flight.get(key_id, 0) == 0
+
+class TestSubscriptions:
+    """Test cases for Server-Sent Events subscriptions"""
+    
+    def _response(self, beach_name, wind_speed, grade="green"):
+        return SurfDataResponse(
+            beach_name=beach_name,
+            wind=WindData(beach_name=beach_name, data={"hourly": {"wind_speed_10m": [wind_speed]}}),
+            grade=grade
+        )
+    
+    def test_broker_pushes_only_changes(self):
+        """Test that identical data isn't pushed twice and other beaches aren't pushed at all"""
+        async def scenario():
+            broker = SubscriptionBroker(poll_seconds=0)
+            queue = broker.subscribe(["Beach A"])
+            
+            assert broker.publish(self._response("Beach A", 8.0)) is True
+            assert broker.publish(self._response("Beach A", 8.0)) is False
+            # Same data served from cache is not a change either
+            cached = self._response("Beach A", 8.0)
+            cached.wind.cached = True
+            assert broker.publish(cached) is False
+            # Nobody listens to Beach B, so it isn't even hashed
+            with patch("app.services.subscription_service.fingerprint") as mock_fingerprint:
+                assert broker.publish(self._response("Beach B", 3.0)) is False
+            mock_fingerprint.assert_not_called()
+            broker.publish(self._response("Beach A", 8.0, grade="yellow"))
+            
+            messages = [queue.get_nowait() for _ in range(queue.qsize())]
+            broker.unsubscribe(queue, ["Beach A"])
+            return messages, broker.subscriber_count("Beach A")
+        
+        messages, remaining = asyncio.run(scenario())
+        assert len(messages) == 2
+        assert messages[0].startswith(b"event: surf_data\ndata: ")
+        assert b'"grade":"yellow"' in messages[1]
+        assert remaining == 0
+    
+    def test_broker_publish_from_worker_thread(self):
+        """Test fan-out of a change published off the event loop, as export and poller threads do"""
+        async def scenario():
+            broker = SubscriptionBroker(poll_seconds=0)
+            queues = [broker.subscribe(["Beach A"]) for _ in range(3)]
+            thread = threading.Thread(target=broker.publish, args=(self._response("Beach A", 12.0),))
+            thread.start()
+            thread.join()
+            return [await asyncio.wait_for(queue.get(), timeout=1) for queue in queues]
+        
+        messages = asyncio.run(scenario())
+        # Serialized once, shared by every subscriber
+        assert messages[0] is messages[1] is messages[2]
+    
+    def test_new_subscriber_does_not_hide_changes_from_existing_ones(self):
+        """Test that an existing subscriber still gets a change a later subscriber connected with"""
+        async def scenario():
+            broker = SubscriptionBroker(poll_seconds=0)
+            first = broker.subscribe(["Beach A"], snapshots=[self._response("Beach A", 8.0)])
+            # The cache changed, and a second client connects before the next poll
+            second = broker.subscribe(["Beach A"], snapshots=[self._response("Beach A", 9.0)])
+            changed = broker.publish(self._response("Beach A", 9.0))
+            return changed, [queue.get_nowait() for queue in (first, second)]
+        
+        changed, messages = asyncio.run(scenario())
+        assert changed is True
+        assert all(b"[9.0]" in message for message in messages)
+    
+    def test_slow_subscriber_drops_oldest(self):
+        """Test that a full queue keeps the newest messages"""
+        async def scenario():
+            broker = SubscriptionBroker(queue_size=2, poll_seconds=0)
+            queue = broker.subscribe(["Beach A"])
+            for speed in (1.0, 2.0, 3.0):
+                broker.publish(self._response("Beach A", speed))
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+        
+        messages = asyncio.run(scenario())
+        assert len(messages) == 2
+        assert b"[2.0]" in messages[0] and b"[3.0]" in messages[1]
+    
+    def test_subscribe_sends_cached_snapshot(self, client, db_session, api_key):
+        """Test that a new subscriber immediately receives the cached state"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        beach = Beach(beach_name="Test Beach", town="Test Town", state="NJ", lat=39.0, long=-74.0, beach_angle=90.0, station_id="1")
+        db_session.add(beach)
+        db_session.commit()
+        db_session.add(CachedData(
+            beach_id=beach.id,
+            data_type="temp_data",
+            data={"station_id": "1", "water_temp": "65.0", "air_temp": "72.0"},
+            expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
+        ))
+        db_session.commit()
+        
+        # TestClient buffers whole responses, so drive the ASGI app directly and
+        # disconnect after the first event; the stream must then shut down
+        async def first_event():
+            body = b""
+            got_event = asyncio.Event()
+            request_sent = False
+            
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await got_event.wait()
+                return {"type": "http.disconnect"}
+            
+            async def send(message):
+                nonlocal body
+                if message["type"] == "http.response.start":
+                    assert message["status"] == status.HTTP_200_OK
+                elif message["type"] == "http.response.body":
+                    body += message.get("body", b"")
+                    if b"\n\n" in body:
+                        got_event.set()
+            
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": "/api/v1/subscribe/surf-data",
+                "raw_path": b"/api/v1/subscribe/surf-data",
+                "query_string": b"beach=Test+Beach",
+                "root_path": "",
+                "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {api_key}".encode())],
+                "client": ("testclient", 50000),
+                "server": ("testserver", 80)
+            }
+            await asyncio.wait_for(client.app(scope, receive, send), timeout=10)
+            return body
+        
+        body = asyncio.run(first_event())
+        event, data = body.decode().split("\n\n")[0].split("\n")
+        assert event == "event: surf_data"
+        payload = json.loads(data[len("data: "):])
+        
+        assert payload["beach_name"] == "Test Beach"
+        assert payload["temperature"]["data"]["water_temp"] == "65.0"
+        # The disconnect tore the stream down
+        assert get_broker().subscriber_count("Test Beach") == 0
+    
+    def test_subscribe_unknown_beach(self, client, db_session, api_key):
+        """Test that subscribing to a missing beach fails up front"""
+        db_session.add(APIKey(key_hash=AuthService.hash_api_key(api_key), name="test_key", is_active=True))
+        db_session.commit()
+        
+        response = client.get(
+            "/api/v1/subscribe/surf-data",
+            params={"beach": "Nowhere"},
+            headers={"Authorization": f"Bearer {api_key}"}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND